@@ -0,0 +1,171 @@
+"""
+Buffered Activity Log Writer for SmartSpace UPY
+
+Signals tidak lagi menulis ActivityLog satu per satu di dalam save/delete.
+Entry dikumpulkan per request (lihat core.middleware.ActivityLogMiddleware)
+dan ditulis sekali dengan bulk_create di akhir request. Entry yang dibuat di
+dalam transaksi baru masuk buffer setelah transaksi commit, jadi perubahan
+yang di-rollback tidak ikut tercatat.
+
+Dengan ACTIVITY_LOG_BACKGROUND_FLUSH=True, buffer diserahkan ke thread
+background yang menulis per batch sehingga INSERT keluar dari response path.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_current_context = ContextVar('activity_log_context', default=None)
+
+
+def get_client_ip(request):
+    """Get client IP from request"""
+    if request is None:
+        return None
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        ip = x_forwarded_for.split(',')[0].strip()
+    else:
+        ip = request.META.get('REMOTE_ADDR')
+    return ip
+
+
+class ActivityContext:
+    """Buffer entry + info aktor (user & IP) untuk satu request"""
+
+    def __init__(self, request=None):
+        self.request = request
+        self.entries = []
+        # True jika request sudah berjalan di dalam transaksi luar (mis. TestCase)
+        self.started_in_atomic = connection.in_atomic_block
+
+    @property
+    def user(self):
+        user = getattr(self.request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user
+        return None
+
+    @property
+    def ip_address(self):
+        return get_client_ip(self.request)
+
+
+def begin_request(request):
+    return _current_context.set(ActivityContext(request))
+
+
+def end_request(token):
+    """Tutup context request dan tulis semua entry yang terkumpul"""
+    context = _current_context.get()
+    _current_context.reset(token)
+    if context is not None and context.entries:
+        write_entries(context.entries)
+
+
+def record(action, model_name, object_id, object_repr, changes=None, user=None, ip_address=None):
+    """Catat satu entry ActivityLog (ditulis belakangan secara bulk)"""
+    from .models import ActivityLog
+
+    context = _current_context.get()
+    if context is not None:
+        user = user or context.user
+        ip_address = ip_address or context.ip_address
+
+    entry = ActivityLog(
+        user=user,
+        action=action,
+        model_name=model_name,
+        object_id=object_id,
+        object_repr=str(object_repr)[:200],
+        changes=changes or {},
+        ip_address=ip_address,
+    )
+
+    if context is not None:
+        # Di dalam transaksi: masuk buffer hanya jika transaksi commit
+        if connection.in_atomic_block and not context.started_in_atomic:
+            transaction.on_commit(lambda: context.entries.append(entry))
+        else:
+            context.entries.append(entry)
+    else:
+        # Di luar request (management command, scheduler, shell)
+        transaction.on_commit(lambda: write_entries([entry]))
+
+
+def write_entries(entries):
+    if getattr(settings, 'ACTIVITY_LOG_BACKGROUND_FLUSH', False):
+        _get_flusher().enqueue(entries)
+    else:
+        _bulk_insert(entries)
+
+
+def _bulk_insert(entries):
+    from .models import ActivityLog
+
+    try:
+        ActivityLog.objects.bulk_create(entries, batch_size=500)
+    except Exception as e:
+        # Audit log tidak boleh menggagalkan request
+        logger.error(f"Failed to write {len(entries)} activity log entries: {e}")
+
+
+# ============================================
+# BACKGROUND FLUSH (optional)
+# ============================================
+class BackgroundFlusher:
+    """Thread daemon yang menulis entry dari queue per batch"""
+
+    def __init__(self, interval, batch_size=500):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='activity-log-flusher', daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def enqueue(self, entries):
+        for entry in entries:
+            self.queue.put(entry)
+
+    def flush(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                _bulk_insert(batch)
+                batch = []
+        if batch:
+            _bulk_insert(batch)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self.queue.empty():
+                close_old_connections()
+                self.flush()
+
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _get_flusher():
+    global _flusher
+    if _flusher is None:
+        with _flusher_lock:
+            if _flusher is None:
+                _flusher = BackgroundFlusher(
+                    interval=getattr(settings, 'ACTIVITY_LOG_FLUSH_INTERVAL', 2),
+                )
+    return _flusher
@@ -7,6 +7,91 @@ from unfold.contrib.filters.admin import RangeDateFilter
 from unfold.decorators import action, display
 from .models import User, Room, Booking, RoomComment, RoomReport
 from .email_utils import send_booking_approved_email, send_booking_rejected_email
+from .pagination import EstimatedCountPaginator
+from .storage_urls import file_url
+from .admin_views import invalidate_pending_booking_count
+from . import counters, search
+
+
+class SearchAdminMixin:
+    """
+    Pencarian changelist lewat core.search (toleran typo & aksen).
+    Tanpa sort manual dari user, hasil diurutkan berdasarkan relevansi.
+    """
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search.search(queryset, search_term), False
+    
+    def get_changelist(self, request, **kwargs):
+        changelist_class = super().get_changelist(request, **kwargs)
+        
+        class SearchRankChangeList(changelist_class):
+            def get_ordering(self, request, queryset):
+                from django.contrib.admin.views.main import ORDER_VAR
+                if 'search_rank' in queryset.query.annotations and ORDER_VAR not in self.params:
+                    return ['-search_rank', '-pk']
+                return super().get_ordering(request, queryset)
+        
+        return SearchRankChangeList
+
+
+class RoomRelatedFilter(admin.RelatedFieldListFilter):
+    """Filter FK ke Room: pilihan dibaca tanpa kolom teks/foto ruangan"""
+    
+    def field_choices(self, field, request, model_admin):
+        ordering = self.field_admin_ordering(field, request, model_admin) or ('nomor_ruangan',)
+        rooms = Room.objects.only('nomor_ruangan', 'tipe_ruangan').order_by(*ordering)
+        return [(room.pk, str(room)) for room in rooms]
+
+
+class ChangelistModelAdmin(ModelAdmin):
+    """
+    Base semua ModelAdmin SmartSpace.
+    
+    Baris changelist di-load dengan list_select_related dan hanya kolom di
+    `list_only` (relasi ditulis 'user__first_name'), jadi teks panjang seperti
+    deskripsi/changes/search_document tidak ikut dibaca. FK di
+    list_select_related dan field list_editable ditambahkan otomatis.
+    `list_prefetch_related` di-prefetch untuk baris yang sama.
+    Action (export, approve) dan form edit tetap memakai queryset penuh.
+    """
+    list_only = ()
+    # Prefetch untuk baris halaman saja (relasi balik / generic, mis. uploads)
+    list_prefetch_related = ()
+    # Tanpa COUNT(*) kedua atas seluruh tabel di setiap halaman
+    show_full_result_count = False
+    
+    def get_list_only(self, request):
+        if not self.list_only:
+            return ()
+        fields = list(self.list_only)
+        if isinstance(self.list_select_related, (list, tuple)):
+            fields += self.list_select_related
+        fields += self.list_editable
+        return tuple(dict.fromkeys(fields))
+    
+    def get_changelist(self, request, **kwargs):
+        changelist_class = super().get_changelist(request, **kwargs)
+        list_only = self.get_list_only(request)
+        prefetch = self.list_prefetch_related
+        if not list_only and not prefetch:
+            return changelist_class
+        
+        class ProjectedChangeList(changelist_class):
+            def get_results(self, request):
+                # Hanya halaman yang ditampilkan; cl.get_queryset() untuk action tidak berubah
+                queryset = self.queryset
+                self.queryset = queryset.only(*list_only) if list_only else queryset
+                if prefetch:
+                    self.queryset = self.queryset.prefetch_related(*prefetch)
+                try:
+                    super().get_results(request)
+                finally:
+                    self.queryset = queryset
+        
+        return ProjectedChangeList
 
 
 # Export Action for Users
@@ -18,12 +103,14 @@ def export_users_to_excel(modeladmin, request, queryset):
 
 # Custom User Admin - Enhanced for SmartSpace UPY with Unfold
 @admin.register(User)
-class CustomUserAdmin(BaseUserAdmin, ModelAdmin):
+class CustomUserAdmin(SearchAdminMixin, BaseUserAdmin, ChangelistModelAdmin):
     list_display = ('npm_nip', 'get_full_name', 'email', 'fakultas', 'program_studi', 'angkatan', 'nomor_hp', 'role', 'is_active', 'date_joined')
+    list_only = ('username', 'first_name', 'last_name', 'npm_nip', 'email', 'fakultas', 'program_studi', 'angkatan', 'nomor_hp', 'role', 'is_active', 'date_joined')
     list_filter = ('role', 'fakultas', 'program_studi', 'angkatan', 'is_staff', 'is_active', 'date_joined')
     search_fields = ('username', 'email', 'npm_nip', 'first_name', 'last_name', 'fakultas', 'program_studi', 'nomor_hp')
     ordering = ('-date_joined',)
     list_per_page = 25
+    paginator = EstimatedCountPaginator
     actions = [export_users_to_excel]
     
     # Fieldsets for detailed view
@@ -59,24 +146,16 @@ class CustomUserAdmin(BaseUserAdmin, ModelAdmin):
     def get_full_name(self, obj):
         return obj.get_full_name() or obj.username
     get_full_name.short_description = 'Nama Lengkap'
-    
-    def get_search_results(self, request, queryset, search_term):
-        """Override to search by first_name only using 'starts with'"""
-        if not search_term:
-            return queryset, False
-        
-        # Search by first_name only starting with search term
-        queryset = queryset.filter(first_name__istartswith=search_term)
-        return queryset, False
 
 
 
 # Room Admin with Unfold
 @admin.register(Room)
-class RoomAdmin(ModelAdmin):
+class RoomAdmin(SearchAdminMixin, ChangelistModelAdmin):
     list_display = ('nomor_ruangan', 'tipe_ruangan', 'kapasitas', 'status', 'is_active', 'created_at')
-    list_filter = ('tipe_ruangan', 'status', 'is_active')
-    search_fields = ('nomor_ruangan',)
+    list_only = ('nomor_ruangan', 'tipe_ruangan', 'kapasitas', 'status', 'is_active', 'created_at')
+    list_filter = ('tipe_ruangan', 'status', 'is_active', 'facilities')
+    search_fields = ('nomor_ruangan', 'fasilitas', 'deskripsi')
     ordering = ('nomor_ruangan',)
     list_editable = ('status', 'is_active')
     
@@ -104,20 +183,21 @@ class RoomAdmin(ModelAdmin):
             'description': '✅ Hal yang Diperbolehkan: isi peraturan yang boleh dilakukan (satu per baris). ❌ Hal yang Dilarang: isi larangan yang tidak boleh dilakukan (satu per baris).'
         }),
     )
-    
-    def get_search_results(self, request, queryset, search_term):
-        """Override to search by room name using 'starts with'"""
-        if not search_term:
-            return queryset, False
-        
-        # Search by nomor_ruangan (nama ruangan) starting with search term
-        queryset = queryset.filter(nomor_ruangan__istartswith=search_term)
-        return queryset, False
 
 
 # Booking Admin Actions
+def invalidate_booking_counters(queryset):
+    """
+    queryset.update melewati signals: reset badge admin & counter Pending tiap user.
+    Panggil sebelum update, karena filter changelist bisa memakai status.
+    """
+    invalidate_pending_booking_count()
+    counters.invalidate(queryset.values_list('user_id', flat=True), 'pending_bookings')
+
+
 @admin.action(description='✅ Approve peminjaman terpilih')
 def make_approved(modeladmin, request, queryset):
+    invalidate_booking_counters(queryset)
     updated = queryset.update(status='Approved')
     # Send email notifications
     for booking in queryset:
@@ -130,6 +210,7 @@ def make_approved(modeladmin, request, queryset):
 
 @admin.action(description='❌ Reject peminjaman terpilih')
 def make_rejected(modeladmin, request, queryset):
+    invalidate_booking_counters(queryset)
     updated = queryset.update(status='Rejected')
     # Send email notifications
     for booking in queryset:
@@ -142,12 +223,14 @@ def make_rejected(modeladmin, request, queryset):
 
 @admin.action(description='⏳ Set Pending')
 def make_pending(modeladmin, request, queryset):
+    invalidate_booking_counters(queryset)
     updated = queryset.update(status='Pending')
     modeladmin.message_user(request, f'{updated} peminjaman di-set ke Pending.')
 
 
 @admin.action(description='🔄 Set On Process')
 def make_on_process(modeladmin, request, queryset):
+    invalidate_booking_counters(queryset)
     updated = queryset.update(status='On Process')
     modeladmin.message_user(request, f'{updated} peminjaman di-set ke On Process.')
 
@@ -167,13 +250,21 @@ def export_bookings_to_pdf(modeladmin, request, queryset):
 
 # Booking Admin - Enhanced with Unfold
 @admin.register(Booking)
-class BookingAdmin(ModelAdmin):
+class BookingAdmin(ChangelistModelAdmin):
     list_display = ('id', 'get_user_npm', 'get_user_name', 'get_user_fakultas', 'get_user_prodi', 'get_user_angkatan', 'room', 'jumlah_tamu', 'get_tanggal_mulai', 'get_created_at', 'get_tanggal_selesai', 'get_status_badge', 'get_document_link')
     list_filter = ('status', 'tanggal_mulai', 'room__tipe_ruangan', 'user__fakultas', 'created_at')
     search_fields = ('user__npm_nip', 'user__first_name', 'user__last_name', 'room__nomor_ruangan')
     ordering = ('-created_at',)
     date_hierarchy = 'tanggal_mulai'
     list_per_page = 25
+    list_select_related = ('user', 'room', 'series')
+    list_only = (
+        'jumlah_tamu', 'tanggal_mulai', 'tanggal_selesai', 'created_at', 'status', 'dokumen_pendukung',
+        'user__npm_nip', 'user__first_name', 'user__last_name', 'user__fakultas', 'user__program_studi', 'user__angkatan',
+        'room__nomor_ruangan', 'room__tipe_ruangan', 'series__dokumen_pendukung',
+    )
+    list_prefetch_related = ('uploads', 'series__uploads')
+    paginator = EstimatedCountPaginator
     actions = [make_approved, make_rejected, make_pending, make_on_process, export_bookings_to_excel, export_bookings_to_pdf]
     
     # Row-level quick actions (appear as dropdown on each row)
@@ -280,26 +371,72 @@ class BookingAdmin(ModelAdmin):
     get_created_at.short_description = 'Created at'
     get_created_at.admin_order_field = 'created_at'
     
+    def get_document_owner(self, obj):
+        """Booking itu sendiri, atau series-nya (dokumen peminjaman berulang diunggah sekali)"""
+        return obj.series if obj.series_id and not obj.dokumen_pendukung else obj
+    
+    def get_document_upload(self, obj):
+        """FileUpload terbaru untuk dokumen (dari prefetch; core.uploads)"""
+        uploads = [u for u in self.get_document_owner(obj).uploads.all() if u.field_name == 'dokumen_pendukung']
+        return max(uploads, key=lambda u: u.pk) if uploads else None
+    
     def get_document_link(self, obj):
         from django.utils.html import format_html
-        if obj.dokumen_pendukung:
+        upload = self.get_document_upload(obj)
+        dokumen = self.get_document_owner(obj).dokumen_pendukung
+        if dokumen:
+            # Preview & jumlah halaman dari hasil pemeriksaan; file asli tidak diunduh
+            preview = ''
+            if upload and upload.preview:
+                preview = format_html(
+                    '<img src="{}" alt="" loading="lazy" style="max-height: 48px; border-radius: 4px; margin-right: 6px;">',
+                    upload.preview_url,
+                )
+            pages = f' ({upload.page_count} hlm)' if upload and upload.page_count else ''
             return format_html(
-                '<a href="{}" target="_blank" style="color: #ec4899; text-decoration: underline;">📄 Download</a>',
-                obj.dokumen_pendukung.url
+                '<a href="{}" target="_blank" style="color: #ec4899; text-decoration: underline; '
+                'display: inline-flex; align-items: center;">{}📄 Download{}</a>',
+                file_url(dokumen), preview, pages,
             )
-        return '-'
+        if upload is None:
+            return '-'
+        if upload.status == upload.Status.REJECTED:
+            return format_html('<span title="{}">🚫 Dokumen ditolak</span>', upload.error)
+        if upload.is_pending:
+            return '⏳ Sedang diproses'
+        return '⚠️ Upload gagal' if upload.status == upload.Status.FAILED else '-'
     get_document_link.short_description = 'Dokumen'
     get_document_link.allow_tags = True
     
+    @display(description='Pemeriksaan Dokumen')
+    def get_document_check(self, obj):
+        from django.utils.html import format_html
+        upload = self.get_document_upload(obj)
+        if upload is None:
+            return '-'
+        details = format_html(
+            '{} · tipe: {} · halaman: {}',
+            upload.get_status_display(), upload.detected_type or '-', upload.page_count or '-',
+        )
+        if upload.error:
+            details = format_html('{}<br><span style="color: #dc2626;">{}</span>', details, upload.error)
+        if upload.preview:
+            details = format_html(
+                '<img src="{}" alt="Preview dokumen" style="max-width: 240px; border: 1px solid #e5e7eb; '
+                'border-radius: 6px; margin-bottom: 6px;"><br>{}',
+                upload.preview_url, details,
+            )
+        return details
+    
     fieldsets = (
         ('Peminjam', {
             'fields': ('user',),
         }),
         ('Detail Peminjaman', {
-            'fields': ('room', 'jumlah_tamu', 'tanggal_mulai', 'tanggal_selesai'),
+            'fields': ('room', 'jumlah_tamu', 'tanggal_mulai', 'tanggal_selesai', 'series'),
         }),
         ('Dokumen Pendukung', {
-            'fields': ('dokumen_pendukung',),
+            'fields': ('dokumen_pendukung', 'get_document_check'),
         }),
         ('Status', {
             'fields': ('status',),
@@ -307,27 +444,57 @@ class BookingAdmin(ModelAdmin):
     )
     
     # Read-only for dates
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'series', 'get_document_check')
     
     def get_search_results(self, request, queryset, search_term):
-        """Override to search by user's first_name using 'starts with'"""
-        if not search_term:
+        """Search by peminjam (nama/NPM) atau ruangan lewat core.search"""
+        if not search_term.strip():
             return queryset, False
         
-        # Search by user's first_name starting with search term
-        queryset = queryset.filter(user__first_name__istartswith=search_term)
+        from django.db.models import Q
+        queryset = queryset.filter(
+            Q(user__in=search.search_pks(User.objects.all(), search_term)) |
+            Q(room__in=search.search_pks(Room.objects.all(), search_term))
+        )
         return queryset, False
 
 
+# Booking Series Admin - peminjaman berulang; setiap kejadian di-approve di Booking
+from .models import BookingSeries
+
+@admin.register(BookingSeries)
+class BookingSeriesAdmin(ChangelistModelAdmin):
+    list_display = ('__str__', 'user', 'frequency', 'tanggal_mulai', 'until', 'get_booking_count', 'created_at')
+    list_filter = ('frequency', 'room__tipe_ruangan', 'created_at')
+    search_fields = ('user__npm_nip', 'user__first_name', 'room__nomor_ruangan')
+    ordering = ('-created_at',)
+    list_select_related = ('user', 'room')
+    list_only = (
+        'frequency', 'tanggal_mulai', 'until', 'created_at',
+        'user__username', 'user__role', 'room__nomor_ruangan',
+    )
+    readonly_fields = ('created_at',)
+    
+    def get_queryset(self, request):
+        from django.db.models import Count
+        return super().get_queryset(request).annotate(booking_count=Count('bookings'))
+    
+    @display(description='Jumlah Booking', ordering='booking_count')
+    def get_booking_count(self, obj):
+        return obj.booking_count
+
+
 # Wishlist Admin with Unfold
 from .models import Wishlist, Message
 
 @admin.register(Wishlist)
-class WishlistAdmin(ModelAdmin):
+class WishlistAdmin(ChangelistModelAdmin):
     list_display = ('user', 'room', 'created_at')
     list_filter = ('created_at', 'room__tipe_ruangan')
     search_fields = ('user__npm_nip', 'user__first_name', 'room__nomor_ruangan')
     ordering = ('-created_at',)
+    list_select_related = ('user', 'room')
+    list_only = ('created_at', 'user__username', 'user__role', 'room__nomor_ruangan', 'room__tipe_ruangan')
 
 
 # Message Admin removed - Using custom Chat User interface instead
@@ -338,8 +505,9 @@ class WishlistAdmin(ModelAdmin):
 from .models import Testimonial
 
 @admin.register(Testimonial)
-class TestimonialAdmin(ModelAdmin):
+class TestimonialAdmin(ChangelistModelAdmin):
     list_display = ('nama', 'role', 'rating', 'is_active', 'order', 'created_at')
+    list_only = ('nama', 'role', 'created_at')
     list_filter = ('is_active', 'rating', 'created_at')
     search_fields = ('nama', 'role', 'content')
     ordering = ('order', '-created_at')
@@ -376,8 +544,9 @@ def mark_as_unread(modeladmin, request, queryset):
     modeladmin.message_user(request, f'{updated} feedback ditandai belum dibaca.')
 
 @admin.register(Feedback)
-class FeedbackAdmin(ModelAdmin):
+class FeedbackAdmin(ChangelistModelAdmin):
     list_display = ('get_category_badge', 'subject', 'get_message_preview', 'is_read', 'created_at')
+    list_only = ('category', 'subject', 'message', 'is_read', 'created_at')
     list_filter = ('category', 'is_read', 'created_at')
     search_fields = ('subject', 'message')
     ordering = ('-created_at',)
@@ -420,13 +589,30 @@ class FeedbackAdmin(ModelAdmin):
 
 
 # Activity Log Admin - Read Only
+class ActivityLogModelFilter(admin.SimpleListFilter):
+    """Pilihan model tetap, tanpa SELECT DISTINCT ke seluruh tabel log"""
+    title = 'Model'
+    parameter_name = 'model_name'
+    
+    def lookups(self, request, model_admin):
+        return [('Room', 'Room'), ('Booking', 'Booking')]
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(model_name=self.value())
+        return queryset
+
+
 @admin.register(ActivityLog)
-class ActivityLogAdmin(ModelAdmin):
+class ActivityLogAdmin(ChangelistModelAdmin):
     list_display = ('user', 'get_action_badge', 'model_name', 'object_repr', 'ip_address', 'created_at')
-    list_filter = ('action', 'model_name', 'created_at')
+    list_only = ('action', 'model_name', 'object_repr', 'ip_address', 'created_at', 'user__username', 'user__role')
+    list_filter = ('action', ActivityLogModelFilter, 'created_at')
     search_fields = ('user__first_name', 'user__username', 'model_name', 'object_repr')
     ordering = ('-created_at',)
     list_per_page = 50
+    list_select_related = ('user',)
+    paginator = EstimatedCountPaginator
     
     def get_action_badge(self, obj):
         from django.utils.html import format_html
@@ -467,13 +653,18 @@ class ActivityLogAdmin(ModelAdmin):
 
 # Room Comment Admin - Komentar & Rating Ruangan
 @admin.register(RoomComment)
-class RoomCommentAdmin(ModelAdmin):
+class RoomCommentAdmin(ChangelistModelAdmin):
     list_display = ('get_user_name', 'room', 'rating', 'get_comment_preview', 'get_approval_badge', 'is_approved', 'created_at')
-    list_filter = ('rating', 'is_approved', 'room', 'created_at')
+    list_filter = ('rating', 'is_approved', ('room', RoomRelatedFilter), 'created_at')
     search_fields = ('user__first_name', 'user__npm_nip', 'room__nomor_ruangan', 'comment')
     ordering = ('-created_at',)
     list_editable = ('is_approved',)
     list_per_page = 25
+    list_select_related = ('user', 'room')
+    list_only = (
+        'rating', 'comment', 'created_at',
+        'user__username', 'user__first_name', 'user__last_name', 'room__nomor_ruangan', 'room__tipe_ruangan',
+    )
     
     # Approval badge with colors
     @display(description="Status", label=True)
@@ -505,13 +696,18 @@ class RoomCommentAdmin(ModelAdmin):
 
 # Room Report Admin - Laporan Ruangan
 @admin.register(RoomReport)
-class RoomReportAdmin(ModelAdmin):
+class RoomReportAdmin(ChangelistModelAdmin):
     list_display = ('room', 'get_reporter_name', 'get_keterangan_preview', 'get_resolved_badge', 'is_resolved', 'created_at')
-    list_filter = ('is_resolved', 'room', 'created_at')
+    list_filter = ('is_resolved', ('room', RoomRelatedFilter), 'created_at')
     search_fields = ('room__nomor_ruangan', 'user__first_name', 'user__npm_nip', 'keterangan')
     ordering = ('-created_at',)
     list_editable = ('is_resolved',)
     list_per_page = 25
+    list_select_related = ('user', 'room')
+    list_only = (
+        'keterangan', 'created_at',
+        'user__username', 'user__first_name', 'user__last_name', 'room__nomor_ruangan', 'room__tipe_ruangan',
+    )
     
     # Resolved badge with colors
     @display(description="Status", label=True)
@@ -1,16 +1,21 @@
 """
 Custom Admin Views for WhatsApp-style Chat Interface
 """
+from django.conf import settings
 from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render, get_object_or_404
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_protect
-from django.db.models import Q, Max, Count
+from django.db.models import Q, Max, Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.db.models.functions import TruncDate, ExtractWeekDay
 from django.utils import timezone
 from datetime import timedelta
 import json
-from .models import Message, User, PinnedConversation, Booking, Room
+from .models import Message, User, PinnedConversation, Booking, Room, ConversationReadState
+from .middleware import skip_session_refresh
+from .pagination import get_page_size, keyset_page
+from . import counters, uploads
 
 
 @staff_member_required
@@ -100,6 +105,38 @@ def admin_shortcuts_view(request):
     })
 
 
+def get_conversation_users(all_admin_ids):
+    """
+    Users yang punya percakapan dengan admin, di-annotate dengan
+    last_message_id dan unread_count dalam satu query (tanpa loop per user).
+    """
+    conversation_messages = Message.objects.filter(
+        Q(sender=OuterRef('pk'), receiver_id__in=all_admin_ids) |
+        Q(sender_id__in=all_admin_ids, receiver=OuterRef('pk'))
+    ).order_by('-created_at', '-id')
+    
+    unread_messages = Message.objects.filter(
+        sender=OuterRef('pk'),
+        receiver_id__in=all_admin_ids,
+        id__gt=OuterRef('admin_read_id')
+    ).order_by().values('sender').annotate(count=Count('id')).values('count')
+    
+    return User.objects.exclude(
+        Q(is_superuser=True) | Q(role='Admin') | Q(is_staff=True)
+    ).annotate(
+        admin_read_id=ConversationReadState.admin_watermark('pk'),
+    ).annotate(
+        last_message_id=Subquery(conversation_messages.values('id')[:1]),
+        unread_count=Coalesce(Subquery(unread_messages), 0),
+    ).filter(last_message_id__isnull=False)
+
+
+def mark_user_messages_read(chat_user, admin_ids, message_id):
+    """Majukan watermark baca sisi admin sampai message_id; counter admin di-reset"""
+    if ConversationReadState.mark_read(chat_user.id, ConversationReadState.Side.ADMIN, message_id):
+        counters.invalidate(admin_ids, 'unread_messages')
+
+
 @staff_member_required
 def chat_list_view(request):
     """Show list of conversations with users"""
@@ -112,10 +149,8 @@ def chat_list_view(request):
     ).values_list('id', flat=True))
     
     # Get all users who have messaged any admin OR been messaged by any admin
-    users_with_messages = User.objects.filter(
-        Q(sent_messages__receiver_id__in=all_admin_ids) | 
-        Q(received_messages__sender_id__in=all_admin_ids)
-    ).distinct().exclude(is_superuser=True).exclude(role='Admin').exclude(is_staff=True)
+    users_with_messages = list(get_conversation_users(all_admin_ids))
+    last_messages = Message.objects.in_bulk([user.last_message_id for user in users_with_messages])
     
     # Get pinned users for this admin
     pinned_user_ids = set(
@@ -126,18 +161,8 @@ def chat_list_view(request):
     total_unread = 0
     
     for user in users_with_messages:
-        # Get last message in conversation (with any admin)
-        last_message = Message.objects.filter(
-            Q(sender=user, receiver_id__in=all_admin_ids) |
-            Q(sender_id__in=all_admin_ids, receiver=user)
-        ).order_by('-created_at').first()
-        
-        # Count unread messages from this user (sent to any admin)
-        unread_count = Message.objects.filter(
-            sender=user,
-            receiver_id__in=all_admin_ids,
-            is_read=False
-        ).count()
+        last_message = last_messages.get(user.last_message_id)
+        unread_count = user.unread_count
         
         total_unread += unread_count
         is_pinned = user.id in pinned_user_ids
@@ -184,18 +209,16 @@ def chat_detail_view(request, user_id):
         Q(is_superuser=True) | Q(role='Admin') | Q(is_staff=True)
     ).values_list('id', flat=True))
     
-    # Get all messages between any admin and this user
-    messages_list = Message.objects.filter(
-        Q(sender=chat_user, receiver_id__in=all_admin_ids) |
-        Q(sender_id__in=all_admin_ids, receiver=chat_user)
-    ).select_related('sender', 'receiver').order_by('created_at')
+    # Hanya halaman terbaru yang dirender; pesan lama dimuat lewat chat_history_view
+    from .views import CHAT_PAGE_SIZE, get_conversation_messages
+    latest, older_cursor = keyset_page(
+        get_conversation_messages(chat_user, all_admin_ids).select_related('sender', 'receiver'),
+        limit=CHAT_PAGE_SIZE,
+    )
+    messages_list = latest[::-1]  # Oldest first for chat display
     
-    # Mark all messages from user as read (to any admin)
-    Message.objects.filter(
-        sender=chat_user,
-        receiver_id__in=all_admin_ids,
-        is_read=False
-    ).update(is_read=True)
+    # Mark messages from user as read (to any admin); pesan terbaru ada di halaman ini
+    mark_user_messages_read(chat_user, all_admin_ids, max((msg.id for msg in messages_list), default=0))
     
     # Pre-compute display values
     display_name = chat_user.get_full_name() or chat_user.username
@@ -206,10 +229,53 @@ def chat_detail_view(request, user_id):
         'user_display_name': display_name,
         'user_initial': initial,
         'messages_list': messages_list,
+        'older_cursor': older_cursor,
         'title': f'Chat dengan {display_name}'
     })
 
 
+@staff_member_required
+def chat_history_view(request, user_id):
+    """Load older messages with a specific user (keyset pagination, terbaru duluan)"""
+    from .views import CHAT_PAGE_SIZE, get_conversation_messages
+    
+    chat_user = get_object_or_404(User, pk=user_id)
+    all_admin_ids = list(User.objects.filter(
+        Q(is_superuser=True) | Q(role='Admin') | Q(is_staff=True)
+    ).values_list('id', flat=True))
+    
+    try:
+        history, next_cursor = keyset_page(
+            get_conversation_messages(chat_user, all_admin_ids),
+            cursor=request.GET.get('cursor'),
+            limit=get_page_size(request, default=CHAT_PAGE_SIZE),
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Cursor tidak valid'}, status=400)
+    
+    messages_data = []
+    for msg in history:
+        created_at = timezone.localtime(msg.created_at)
+        messages_data.append({
+            'id': msg.id,
+            'content': msg.content,
+            'is_admin': msg.sender_id in all_admin_ids,
+            'date': created_at.strftime('%Y-%m-%d'),
+            'date_label': created_at.strftime('%d %b %Y'),
+            'time': created_at.strftime('%H:%M'),
+            'attachment_url': msg.attachment_url,
+            'attachment_filename': msg.attachment_filename if msg.attachment else None,
+            'is_image': msg.is_image,
+        })
+    
+    return JsonResponse({
+        'success': True,
+        'messages': messages_data,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    })
+
+
 @staff_member_required
 @csrf_protect
 def chat_send_view(request):
@@ -230,15 +296,17 @@ def chat_send_view(request):
         
         receiver = get_object_or_404(User, pk=receiver_id)
         
-        # Create message
+        # Create message; lampiran di-upload di background jika DEFERRED_UPLOADS
+        deferred = bool(attachment) and settings.DEFERRED_UPLOADS
         message = Message.objects.create(
             sender=request.user,
             receiver=receiver,
             content=content or 'Mengirim lampiran',
             message_type='admin_to_user',
-            attachment=attachment,
-            is_read=False
+            attachment=None if deferred else attachment
         )
+        if attachment:
+            uploads.track_upload(message, 'attachment', attachment)
         
         return JsonResponse({
             'success': True,
@@ -331,6 +399,7 @@ def chat_delete_conversation_view(request):
 
 
 @staff_member_required
+@skip_session_refresh
 def chat_poll_view(request, user_id):
     """Poll for new messages - returns messages after a given timestamp"""
     from django.utils import timezone
@@ -352,17 +421,15 @@ def chat_poll_view(request, user_id):
         last_id = 0
     
     # Get messages newer than last_id (with any admin)
-    messages = Message.objects.filter(
+    messages = list(Message.objects.filter(
         Q(sender=chat_user, receiver_id__in=all_admin_ids) |
         Q(sender_id__in=all_admin_ids, receiver=chat_user)
-    ).filter(id__gt=last_id).select_related('sender').order_by('created_at')
+    ).filter(id__gt=last_id).select_related('sender').order_by('created_at'))
+    # Pesan yang lampirannya masih di-upload dikirim pada poll berikutnya
+    messages, pending_ids = uploads.hold_back_pending(messages)
     
-    # Mark incoming messages as read (to any admin)
-    Message.objects.filter(
-        sender=chat_user,
-        receiver_id__in=all_admin_ids,
-        is_read=False
-    ).update(is_read=True)
+    # Mark incoming messages as read (to any admin); tanpa pesan baru tidak ada write
+    mark_user_messages_read(chat_user, all_admin_ids, max((msg.id for msg in messages), default=0))
     
     # Build response
     messages_data = []
@@ -373,7 +440,9 @@ def chat_poll_view(request, user_id):
             'sender_id': msg.sender.id,
             'is_admin': msg.sender_id in all_admin_ids,
             'time': msg.created_at.strftime('%H:%M'),
-            'attachment_url': msg.attachment.url if msg.attachment else None,
+            'attachment_url': msg.attachment_url,
+            'attachment_pending': msg.id in pending_ids,
+            'attachment_filename': msg.attachment_filename,
             'is_image': msg.is_image if hasattr(msg, 'is_image') else False
         })
     
@@ -429,6 +498,7 @@ def chat_pin_view(request):
 
 
 @staff_member_required
+@skip_session_refresh
 def chat_conversations_poll_view(request):
     """Poll for updated conversation list - returns all conversations with latest message info"""
     admin_user = request.user
@@ -439,10 +509,8 @@ def chat_conversations_poll_view(request):
     ).values_list('id', flat=True))
     
     # Get all users who have messaged any admin OR been messaged by any admin
-    users_with_messages = User.objects.filter(
-        Q(sent_messages__receiver_id__in=all_admin_ids) | 
-        Q(received_messages__sender_id__in=all_admin_ids)
-    ).distinct().exclude(is_superuser=True).exclude(role='Admin').exclude(is_staff=True)
+    users_with_messages = list(get_conversation_users(all_admin_ids))
+    last_messages = Message.objects.in_bulk([user.last_message_id for user in users_with_messages])
     
     # Get pinned users for this admin
     pinned_user_ids = set(
@@ -452,19 +520,12 @@ def chat_conversations_poll_view(request):
     conversations = []
     total_unread = 0
     
+    from django.utils.timesince import timesince
+    now = timezone.now()
+    
     for user in users_with_messages:
-        # Get last message in conversation (with any admin)
-        last_message = Message.objects.filter(
-            Q(sender=user, receiver_id__in=all_admin_ids) |
-            Q(sender_id__in=all_admin_ids, receiver=user)
-        ).order_by('-created_at').first()
-        
-        # Count unread messages from this user (sent to any admin)
-        unread_count = Message.objects.filter(
-            sender=user,
-            receiver_id__in=all_admin_ids,
-            is_read=False
-        ).count()
+        last_message = last_messages.get(user.last_message_id)
+        unread_count = user.unread_count
         
         total_unread += unread_count
         is_pinned = user.id in pinned_user_ids
@@ -474,9 +535,7 @@ def chat_conversations_poll_view(request):
             initial = (user.first_name[0].upper() if user.first_name else user.username[0].upper())
             
             # Calculate time ago
-            from django.utils import timezone
-            from django.utils.timesince import timesince
-            time_ago = timesince(last_message.created_at, timezone.now())
+            time_ago = timesince(last_message.created_at, now)
             
             conversations.append({
                 'user_id': user.id,
@@ -633,12 +692,97 @@ def export_dashboard_pdf(request):
     return generate_dashboard_pdf(stats)
 
 
+# ============================================
+# SCHEDULE IMPORT (lihat core.schedule_import)
+# ============================================
+
+def _schedule_report_key(user_id, token):
+    return f'schedule_import_report:{user_id}:{token}'
+
+
+@staff_member_required
+def schedule_import_view(request):
+    """Import jadwal kuliah dari CSV/XLSX menjadi booking"""
+    import uuid
+    from django.contrib import messages
+    from django.core.cache import cache
+    from django.core.exceptions import PermissionDenied
+    from . import schedule_import
+    
+    if not request.user.has_perm('core.add_booking'):
+        raise PermissionDenied
+    
+    context = {
+        'title': 'Import Jadwal',
+        'columns': schedule_import.COLUMNS,
+        'statuses': Booking.Status.choices,
+        'selected_status': Booking.Status.APPROVED,
+    }
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        status = request.POST.get('status', Booking.Status.APPROVED)
+        dry_run = request.POST.get('dry_run') == 'on'
+        context['selected_status'] = status
+        if not upload:
+            messages.error(request, 'Pilih file CSV atau XLSX')
+        elif status not in Booking.Status.values:
+            messages.error(request, 'Status tidak valid')
+        else:
+            try:
+                result = schedule_import.import_schedule(
+                    upload, upload.name, status=status, dry_run=dry_run, acting_user=request.user,
+                )
+            except schedule_import.ScheduleImportError as e:
+                messages.error(request, str(e))
+            else:
+                if result.errors:
+                    token = uuid.uuid4().hex
+                    cache.set(
+                        _schedule_report_key(request.user.pk, token),
+                        schedule_import.error_report(result),
+                        settings.SCHEDULE_IMPORT_REPORT_TIMEOUT,
+                    )
+                    context['report_token'] = token
+                context.update({'result': result, 'dry_run': dry_run, 'filename': upload.name})
+    return render(request, 'admin/core/schedule_import.html', context)
+
+
+@staff_member_required
+def schedule_import_report_view(request, token):
+    """Download laporan baris yang gagal di-import (XLSX)"""
+    from django.core.cache import cache
+    from django.http import Http404, HttpResponse
+    
+    report = cache.get(_schedule_report_key(request.user.pk, token))
+    if report is None:
+        raise Http404('Laporan sudah kedaluwarsa, ulangi import')
+    response = HttpResponse(
+        report, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+    response['Content-Disposition'] = 'attachment; filename="error_import_jadwal.xlsx"'
+    return response
+
+
 # ============================================
 # ADMIN NOTIFICATION BADGE
 # ============================================
 
+PENDING_BOOKING_COUNT_CACHE_KEY = 'admin:pending_booking_count'
+
+
 def get_pending_booking_count(request):
-    """Get count of pending bookings for admin badge"""
+    """Get count of pending bookings for admin badge (cached, invalidated by signals)"""
+    from django.core.cache import cache
     from .models import Booking
-    count = Booking.objects.filter(status='Pending').count()
+    count = cache.get(PENDING_BOOKING_COUNT_CACHE_KEY)
+    if count is None:
+        count = Booking.objects.filter(status='Pending').count()
+        cache.set(PENDING_BOOKING_COUNT_CACHE_KEY, count, settings.ADMIN_BADGE_CACHE_TIMEOUT)
     return count
+
+
+def invalidate_pending_booking_count():
+    """Hapus cache badge setelah transaksi commit (agar tidak terisi ulang dengan nilai lama)"""
+    from django.core.cache import cache
+    from django.db import transaction
+    transaction.on_commit(lambda: cache.delete(PENDING_BOOKING_COUNT_CACHE_KEY))
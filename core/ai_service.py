@@ -5,6 +5,8 @@ Uses Google Gemini API for intelligent room recommendations and chat
 
 import google.generativeai as genai
 from django.conf import settings
+from .profiling import track_external
+from .metrics import GEMINI_ERRORS, GEMINI_LATENCY, observe_duration
 
 
 class GeminiChatService:
@@ -117,7 +119,8 @@ Jika ada data ruangan yang diberikan dalam format [ROOM_DATA], gunakan informasi
             enhanced_message = user_message + room_context
             
             # Get response from Gemini
-            response = chat.send_message(enhanced_message)
+            with track_external('gemini'), observe_duration(GEMINI_LATENCY):
+                response = chat.send_message(enhanced_message)
             
             return {
                 'success': True,
@@ -125,6 +128,7 @@ Jika ada data ruangan yang diberikan dalam format [ROOM_DATA], gunakan informasi
             }
             
         except Exception as e:
+            GEMINI_ERRORS.inc()
             import traceback
             print(f"AI Chat Error: {e}")
             print(traceback.format_exc())
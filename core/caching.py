@@ -0,0 +1,85 @@
+"""
+Versioned cache keys for SmartSpace UPY
+
+Fragment template dan halaman yang di-cache memuat versi per namespace
+(mis. 'rooms', 'testimonials') di dalam key-nya. Signals cukup mengganti
+versi (bump_version) sehingga entry lama tidak terpakai lagi dan
+kedaluwarsa sendiri; tidak perlu mencari & menghapus key satu per satu.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+
+def _version_key(namespace):
+    return f'cache_version:{namespace}'
+
+
+def get_versions(*namespaces):
+    """Return {namespace: versi}; satu round-trip ke cache"""
+    keys = {_version_key(ns): ns for ns in namespaces}
+    found = cache.get_many(list(keys))
+    versions = {}
+    for key, namespace in keys.items():
+        if key not in found:
+            # Timestamp, bukan 1: jika key versi ter-evict, entry lama tetap tidak cocok
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+        versions[namespace] = found[key]
+    return versions
+
+
+def bump_version(namespace):
+    """Ganti versi setelah transaksi commit (agar cache tidak terisi ulang dengan data lama)"""
+    transaction.on_commit(lambda: cache.set(_version_key(namespace), time.time_ns(), None))
+
+
+def cache_page_for_anonymous(*namespaces, timeout=None):
+    """
+    Cache seluruh response GET untuk pengunjung anonim.
+
+    Key memuat path dan versi `namespaces`, jadi halaman ikut basi saat versi
+    di-bump. User login dan request yang membawa flash message selalu dirender
+    ulang; response diberi `Vary: Cookie` karena isinya bergantung status login.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            cacheable = (
+                request.method == 'GET'
+                and not request.user.is_authenticated
+                and not messages.get_messages(request)  # len(), pesan tidak ditandai terbaca
+            )
+            if not cacheable:
+                response = view_func(request, *args, **kwargs)
+                patch_vary_headers(response, ('Cookie',))
+                return response
+
+            versions = get_versions(*namespaces)
+            path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            version_part = ':'.join(str(versions[ns]) for ns in namespaces)
+            cache_key = f'page:{view_func.__name__}:{path_hash}:{version_part}'
+
+            cached = cache.get(cache_key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(
+                        cache_key,
+                        (response.content, response['Content-Type']),
+                        timeout if timeout is not None else settings.HOME_CACHE_TIMEOUT,
+                    )
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
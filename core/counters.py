@@ -0,0 +1,89 @@
+"""
+Per-user counters for SmartSpace UPY
+
+Angka badge (pesan belum dibaca, jumlah wishlist, booking Pending) disimpan
+di cache, satu key per counter per user:
+
+- Dibaca lewat get_counters(): satu get_many; counter yang hilang dihitung
+  ulang dari database (lazy rebuild) lalu di-cache.
+- Diperbarui secara incremental oleh signals Message/Wishlist/Booking
+  (adjust) setelah transaksi commit. Jika key tidak ada, increment
+  dilewati; nilai dihitung ulang pada pembacaan berikutnya.
+- Update massal (queryset.update) dan watermark baca yang maju
+  (ConversationReadState) memanggil invalidate().
+
+Timeout USER_COUNTERS_TIMEOUT membatasi selisih jika ada perubahan yang
+melewati signals. Increment hanya sampai ke cache proses yang menulis, jadi
+tanpa cache bersama (Redis) default-nya hanya beberapa detik: worker lain
+menghitung ulang dari database setelah key-nya kedaluwarsa.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _count_unread_messages(user_id):
+    from django.db.models import Q
+    from .models import ConversationReadState, User
+    is_admin = User.objects.filter(
+        Q(is_superuser=True) | Q(role='Admin') | Q(is_staff=True), pk=user_id,
+    ).exists()
+    return ConversationReadState.unread_count(user_id, is_admin=is_admin)
+
+
+def _count_wishlist(user_id):
+    from .models import Wishlist
+    return Wishlist.objects.filter(user_id=user_id).count()
+
+
+def _count_pending_bookings(user_id):
+    from .models import Booking
+    return Booking.objects.filter(user_id=user_id, status=Booking.Status.PENDING).count()
+
+
+COUNTERS = {
+    'unread_messages': _count_unread_messages,
+    'wishlist': _count_wishlist,
+    'pending_bookings': _count_pending_bookings,
+}
+
+
+def _key(user_id, name):
+    return f'user_counter:{user_id}:{name}'
+
+
+def get_counters(user_id):
+    """Return {nama counter: nilai} untuk user; satu round-trip cache jika semua ada"""
+    keys = {_key(user_id, name): name for name in COUNTERS}
+    found = cache.get_many(list(keys))
+    counters = {name: found[key] for key, name in keys.items() if key in found}
+
+    missing = {key: name for key, name in keys.items() if key not in found}
+    if missing:
+        rebuilt = {key: COUNTERS[name](user_id) for key, name in missing.items()}
+        cache.set_many(rebuilt, settings.USER_COUNTERS_TIMEOUT)
+        counters.update({missing[key]: value for key, value in rebuilt.items()})
+    return counters
+
+
+def _apply(user_id, name, delta):
+    key = _key(user_id, name)
+    try:
+        value = cache.incr(key, delta)
+    except ValueError:
+        return  # Belum di-cache: dihitung ulang saat dibaca
+    if value < 0:
+        cache.delete(key)
+
+
+def adjust(user_id, name, delta):
+    """Tambah/kurangi counter setelah commit (rollback tidak mengubah counter)"""
+    if user_id and delta:
+        transaction.on_commit(lambda: _apply(user_id, name, delta))
+
+
+def invalidate(user_ids, *names):
+    """Hapus counter (mis. setelah queryset.update); dihitung ulang saat dibaca"""
+    keys = [_key(user_id, name) for user_id in set(user_ids) for name in (names or COUNTERS)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,232 @@
+"""
+Uploaded document inspection for SmartSpace UPY
+
+Dijalankan oleh worker upload (core.uploads), bukan di dalam request:
+
+- Tipe file dideteksi dari magic bytes, bukan ekstensi. File yang isinya
+  tidak sesuai ekstensinya (mis. HTML/EXE yang dinamai .pdf) ditolak.
+- Jumlah halaman PDF dihitung.
+- Preview halaman pertama (PDF) / thumbnail (gambar) dibuat sebagai JPEG
+  kecil agar admin bisa melihat dokumen tanpa mengunduh file aslinya.
+
+Render PDF memakai pypdfium2 jika terpasang (opsional). Tanpa pypdfium2,
+jumlah halaman dibaca dari struktur PDF dan preview PDF dilewati.
+"""
+import io
+import os
+import re
+import zipfile
+import zlib
+
+from django.conf import settings
+
+HEADER_SIZE = 16
+
+# (prefix, tipe); dicocokkan berurutan
+SIGNATURES = (
+    (b'%PDF-', 'pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'ole'),  # .doc/.xls/.ppt lama
+    (b'PK\x03\x04', 'zip'),
+    (b'MZ', 'exe'),
+    (b'\x7fELF', 'elf'),
+)
+
+# Ekstensi -> tipe hasil deteksi yang diterima
+EXPECTED_TYPES = {
+    'pdf': ('pdf',),
+    'png': ('png',),
+    'jpg': ('jpeg',),
+    'jpeg': ('jpeg',),
+    'gif': ('gif',),
+    'webp': ('webp',),
+    'doc': ('ole',),
+    'xls': ('ole',),
+    'ppt': ('ole',),
+    'docx': ('docx',),
+    'xlsx': ('xlsx',),
+    'pptx': ('pptx',),
+    'zip': ('zip', 'docx', 'xlsx', 'pptx'),
+}
+
+# Tidak pernah diterima, apa pun ekstensinya (disajikan langsung dari storage)
+BLOCKED_TYPES = ('exe', 'elf', 'html')
+
+# Folder khas di dalam arsip Office Open XML
+OOXML_FOLDERS = (('word/', 'docx'), ('xl/', 'xlsx'), ('ppt/', 'pptx'))
+
+
+def sniff_type(fileobj):
+    """Tipe file dari magic bytes ('pdf', 'png', 'docx', ...) atau '' jika tidak dikenal"""
+    fileobj.seek(0)
+    header = fileobj.read(HEADER_SIZE)
+    detected = ''
+    for prefix, file_type in SIGNATURES:
+        if header.startswith(prefix):
+            detected = file_type
+            break
+    else:
+        if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+            detected = 'webp'
+        elif header.lstrip()[:1] == b'<':
+            fileobj.seek(0)
+            if re.search(rb'<(!doctype html|html|script|svg)', fileobj.read(1024).lower()):
+                detected = 'html'
+
+    if detected == 'zip':
+        fileobj.seek(0)
+        try:
+            names = zipfile.ZipFile(fileobj).namelist()
+        except zipfile.BadZipFile:
+            names = []
+        for folder, file_type in OOXML_FOLDERS:
+            if any(name.startswith(folder) for name in names):
+                detected = file_type
+                break
+    fileobj.seek(0)
+    return detected
+
+
+def check_type(name, detected):
+    """Return pesan error jika isi file tidak sesuai ekstensinya, selain itu None"""
+    if detected in BLOCKED_TYPES:
+        return f'Tipe file tidak diizinkan (terdeteksi: {detected})'
+    extension = os.path.splitext(name)[1].lower().lstrip('.')
+    expected = EXPECTED_TYPES.get(extension)
+    if expected and detected not in expected:
+        return f'Isi file tidak sesuai ekstensi .{extension} (terdeteksi: {detected or "tidak dikenal"})'
+    return None
+
+
+# ============================================
+# PDF
+# ============================================
+_PAGES_COUNT = re.compile(rb'/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b', re.S)
+_STREAM = re.compile(rb'stream\r?\n(.*?)\r?\nendstream', re.S)
+
+# Batas untuk file yang tidak dipercaya: output inflate per stream & jumlah stream
+# yang dicoba (zip bomb), serta skala & jumlah piksel render preview
+MAX_INFLATE = 1024 * 1024
+MAX_STREAMS = 64
+MAX_RENDER_SCALE = 4
+MAX_RENDER_PIXELS = 4_000_000
+
+
+def _count_in(data):
+    counts = [int(a or b) for a, b in _PAGES_COUNT.findall(data)]
+    return max(counts) if counts else None
+
+
+def pdf_page_count(data):
+    """
+    Jumlah halaman dari bytes PDF tanpa library tambahan.
+
+    /Count pada node /Pages paling atas = total halaman; PDF 1.5+ bisa
+    menyimpannya di object stream terkompresi, jadi stream ikut di-inflate.
+    """
+    count = _count_in(data)
+    if count is None:
+        for index, match in enumerate(_STREAM.finditer(data)):
+            if index >= MAX_STREAMS:
+                break
+            try:
+                inflated = zlib.decompressobj().decompress(match.group(1), MAX_INFLATE)
+            except zlib.error:
+                continue
+            count = _count_in(inflated)
+            if count is not None:
+                break
+    return count
+
+
+def preview_scale(width, height):
+    """
+    Skala render halaman (ukuran dalam point) untuk preview selebar
+    DOCUMENT_PREVIEW_WIDTH; halaman yang sangat kecil/panjang tidak boleh
+    menghasilkan bitmap raksasa. None jika ukurannya tidak valid.
+    """
+    if not (width > 0 and height > 0):
+        return None
+    return min(
+        settings.DOCUMENT_PREVIEW_WIDTH / width,
+        MAX_RENDER_SCALE,
+        (MAX_RENDER_PIXELS / (width * height)) ** 0.5,
+    )
+
+
+def _render_pdf_first_page(data):
+    """
+    (jumlah halaman, PIL.Image halaman pertama atau None) via pypdfium2, atau
+    None jika tidak terpasang
+    """
+    try:
+        import pypdfium2
+    except ImportError:
+        return None
+    try:
+        pdf = pypdfium2.PdfDocument(data)
+    except pypdfium2.PdfiumError:
+        return None
+    try:
+        page = pdf[0]
+        scale = preview_scale(*page.get_size())
+        if scale is None:
+            return len(pdf), None
+        image = page.render(scale=scale).to_pil()
+        return len(pdf), image
+    finally:
+        pdf.close()
+
+
+# ============================================
+# PREVIEW
+# ============================================
+def _to_jpeg(image):
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'L'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+        image = background
+    image.thumbnail((settings.DOCUMENT_PREVIEW_WIDTH, settings.DOCUMENT_PREVIEW_WIDTH * 2))
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, 'JPEG', quality=80, optimize=True)
+    return buffer.getvalue()
+
+
+def inspect(fileobj, name):
+    """
+    Periksa file yang di-upload.
+
+    Return dict: detected_type, error (None jika valid), page_count,
+    preview (bytes JPEG atau None).
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    result = {'detected_type': sniff_type(fileobj), 'error': None, 'page_count': None, 'preview': None}
+    result['error'] = check_type(name, result['detected_type'])
+    if result['error']:
+        return result
+
+    if result['detected_type'] == 'pdf':
+        data = fileobj.read()
+        rendered = _render_pdf_first_page(data)
+        if rendered is not None:
+            result['page_count'], image = rendered
+            if image is not None:
+                result['preview'] = _to_jpeg(image)
+        else:
+            result['page_count'] = pdf_page_count(data)
+    elif result['detected_type'] in ('png', 'jpeg', 'gif', 'webp'):
+        try:
+            with Image.open(fileobj) as image:
+                image.load()
+                result['preview'] = _to_jpeg(image)
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+            result['error'] = f'Gambar rusak atau tidak dapat dibaca: {e}'
+    fileobj.seek(0)
+    return result
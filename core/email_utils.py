@@ -4,8 +4,11 @@ Uses Brevo (Sendinblue) API for sending emails
 """
 from django.conf import settings
 from django.utils import timezone
+import time
 import sib_api_v3_sdk
 from sib_api_v3_sdk.rest import ApiException
+from .profiling import track_external
+from .metrics import EMAIL_QUEUE_DEPTH, EMAIL_SEND_LATENCY
 
 
 # Configure Brevo API
@@ -27,6 +30,9 @@ def send_email(to_email: str, subject: str, html_content: str) -> bool:
         print(f"Email disabled (no BREVO_API_KEY). Would send to: {to_email}")
         return True  # Return True so app continues working
     
+    EMAIL_QUEUE_DEPTH.inc()
+    result = 'success'
+    start = time.perf_counter()
     try:
         # Re-configure with current API key
         configuration.api_key['api-key'] = api_key
@@ -42,15 +48,21 @@ def send_email(to_email: str, subject: str, html_content: str) -> bool:
             html_content=html_content
         )
         
-        api_response = api_instance.send_transac_email(send_smtp_email)
+        with track_external('brevo'):
+            api_response = api_instance.send_transac_email(send_smtp_email)
         print(f"Email sent successfully to {to_email}: {api_response}")
         return True
     except ApiException as e:
+        result = 'api_error'
         print(f"Brevo API error sending email to {to_email}: {e}")
         return True  # Return True so app continues working
     except Exception as e:
+        result = 'error'
         print(f"Error sending email to {to_email}: {str(e)}")
         return True  # Return True so app continues working
+    finally:
+        EMAIL_QUEUE_DEPTH.dec()
+        EMAIL_SEND_LATENCY.labels(result=result).observe(time.perf_counter() - start)
 
 
 def send_welcome_email(user) -> bool:
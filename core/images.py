@@ -0,0 +1,248 @@
+"""
+Room photo derivatives for SmartSpace UPY
+
+Setiap foto ruangan dibuatkan thumbnail WebP + JPEG pada lebar tetap
+(ROOM_THUMBNAIL_WIDTHS) dengan Pillow, disimpan di default storage
+(ruangan/thumbs/). Metadata disimpan di Room.foto_thumbnails:
+
+    {"source": "upload:ruangan/a.jpg", "width": 1600,
+     "files": {"320": {"webp": "...", "jpeg": "..."}, ...}}
+
+- Upload: dibuat sekali setelah file tersimpan (signal, on_commit).
+- URL eksternal / Google Drive: diunduh oleh job scheduler
+  (sync_room_thumbnails) agar halaman tidak lagi memuat gambar full-size
+  dari server pihak ketiga.
+
+Jika `source` tidak cocok dengan sumber foto saat ini, derivatif dianggap
+basi dan template kembali memakai get_foto_url sampai job berikutnya.
+
+Kegagalan (mis. URL mati) dicatat di key `failure`:
+
+    {"source": "url:https://...", "attempts": 2, "retry_at": "2026-01-01T10:00:00+00:00"}
+
+Job berikutnya melewati ruangan tersebut sampai retry_at (backoff
+eksponensial dari ROOM_THUMBNAIL_SYNC_MINUTES) dan berhenti mencoba setelah
+ROOM_THUMBNAIL_MAX_ATTEMPTS, sampai sumber foto diganti atau --force.
+"""
+import hashlib
+import io
+import logging
+import urllib.request
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .storage_urls import storage_url
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = 'ruangan/thumbs'
+FORMATS = (
+    # (key, format Pillow, ekstensi, opsi save)
+    ('webp', 'WEBP', 'webp', {'quality': 80, 'method': 6}),
+    ('jpeg', 'JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+
+def source_key(room):
+    """Identitas sumber foto saat ini (prioritas sama dengan get_foto_url), None jika tanpa foto"""
+    if room.foto_ruangan and room.foto_ruangan.name:
+        return f'upload:{room.foto_ruangan.name}'
+    if room.foto_url:
+        return f'url:{room.foto_url}'
+    if room.foto_drive_id:
+        return f'drive:{room.foto_drive_id}'
+    return None
+
+
+def is_stale(room):
+    return (room.foto_thumbnails or {}).get('source') != source_key(room)
+
+
+def current_files(room):
+    """{lebar: {format: nama file}} jika derivatif masih sesuai sumber foto, selain itu {}"""
+    data = room.foto_thumbnails or {}
+    if not data or is_stale(room):
+        return {}
+    return {int(width): files for width, files in data.get('files', {}).items()}
+
+
+def srcset(room, fmt):
+    """'url 320w, url 640w, ...' untuk atribut srcset"""
+    files = current_files(room)
+    return ', '.join(
+        f'{storage_url(default_storage, files[width][fmt])} {width}w' for width in sorted(files)
+    )
+
+
+def thumbnail_url(room, min_width=640):
+    """JPEG terkecil yang lebarnya >= min_width (fallback: terbesar, lalu foto asli)"""
+    files = current_files(room)
+    if not files:
+        return room.get_foto_url
+    widths = sorted(files)
+    width = next((w for w in widths if w >= min_width), widths[-1])
+    return storage_url(default_storage, files[width]['jpeg'])
+
+
+# ============================================
+# GENERATION
+# ============================================
+def _remote_url(room):
+    if room.foto_url:
+        return room.foto_url
+    # uc?export=view mengembalikan halaman HTML untuk file tertentu; download lebih konsisten
+    return f'https://drive.google.com/uc?export=download&id={room.foto_drive_id}'
+
+
+def fetch_remote_image(url):
+    """Unduh gambar eksternal; raise ValueError jika bukan gambar atau melebihi batas ukuran"""
+    max_bytes = settings.ROOM_PHOTO_MAX_DOWNLOAD_BYTES
+    request = urllib.request.Request(url, headers={'User-Agent': 'SmartSpaceUPY/1.0'})
+    with urllib.request.urlopen(request, timeout=settings.ROOM_PHOTO_DOWNLOAD_TIMEOUT) as response:
+        content_type = response.headers.get('Content-Type', '')
+        if not content_type.startswith('image/'):
+            raise ValueError(f'Bukan gambar ({content_type or "tanpa Content-Type"}): {url}')
+        data = response.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise ValueError(f'Gambar lebih dari {max_bytes} byte: {url}')
+    return data
+
+
+def render_derivatives(image_file, base_name):
+    """
+    Buat thumbnail untuk setiap lebar (tanpa upscale) dan simpan ke storage.
+
+    Return (lebar asli, {lebar: {format: nama file}}).
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(image_file) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'L'):
+            # JPEG tidak mendukung alpha: tempel di atas latar putih
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+            image = background
+        elif image.mode == 'L':
+            image = image.convert('RGB')
+
+        original_width = image.width
+        widths = [w for w in settings.ROOM_THUMBNAIL_WIDTHS if w < original_width] or [original_width]
+        files = {}
+        for width in widths:
+            height = max(1, round(image.height * width / original_width))
+            resized = image.resize((width, height), Image.LANCZOS) if width != original_width else image
+            files[width] = {}
+            for key, pil_format, extension, options in FORMATS:
+                buffer = io.BytesIO()
+                resized.save(buffer, pil_format, **options)
+                name = f'{THUMBNAIL_DIR}/{base_name}-{width}.{extension}'
+                files[width][key] = default_storage.save(name, ContentFile(buffer.getvalue()))
+    return original_width, files
+
+
+def delete_files(data):
+    for files in (data or {}).get('files', {}).values():
+        for name in files.values():
+            try:
+                default_storage.delete(name)
+            except Exception as e:
+                logger.warning(f'Gagal menghapus thumbnail {name}: {e}')
+
+
+def build_room_thumbnails(room):
+    """
+    Buat ulang derivatif jika sumber foto berubah. Return True jika ada yang dibuat.
+
+    Disimpan dengan queryset.update (bukan save) agar tidak memicu activity log;
+    updated_at ikut diperbarui dan versi cache 'rooms' di-bump.
+    """
+    from .caching import bump_version
+    from .models import Room
+
+    if not is_stale(room):
+        return False
+
+    key = source_key(room)
+    old_data = room.foto_thumbnails or {}
+    data = {}
+    if key is not None:
+        if key.startswith('upload:'):
+            with room.foto_ruangan.open('rb') as image_file:
+                image_bytes = image_file.read()
+        else:
+            image_bytes = fetch_remote_image(_remote_url(room))
+        base_name = f'room{room.pk}-{hashlib.sha1(key.encode()).hexdigest()[:10]}'
+        width, files = render_derivatives(io.BytesIO(image_bytes), base_name)
+        data = {
+            'source': key,
+            'width': width,
+            'files': {str(w): names for w, names in files.items()},
+        }
+
+    Room.objects.filter(pk=room.pk).update(foto_thumbnails=data, updated_at=timezone.now())
+    room.foto_thumbnails = data
+    bump_version('rooms')
+    delete_files(old_data)
+    return True
+
+
+def should_retry(room, now=None):
+    """False jika sumber foto saat ini baru gagal (belum retry_at) atau sudah menyerah"""
+    failure = (room.foto_thumbnails or {}).get('failure')
+    if not failure or failure.get('source') != source_key(room):
+        return True
+    if failure.get('attempts', 0) >= settings.ROOM_THUMBNAIL_MAX_ATTEMPTS:
+        return False
+    return (now or timezone.now()) >= datetime.fromisoformat(failure['retry_at'])
+
+
+def record_failure(room, data, now=None):
+    """Simpan percobaan gagal untuk sumber foto saat ini beserta jadwal retry berikutnya"""
+    from .models import Room
+
+    key = source_key(room)
+    previous = (data or {}).get('failure') or {}
+    attempts = previous.get('attempts', 0) + 1 if previous.get('source') == key else 1
+    delay = timedelta(minutes=max(settings.ROOM_THUMBNAIL_SYNC_MINUTES, 1) * 2 ** (attempts - 1))
+    failure = {
+        'source': key,
+        'attempts': attempts,
+        'retry_at': ((now or timezone.now()) + min(delay, timedelta(days=1))).isoformat(),
+    }
+    data = {**(data or {}), 'failure': failure}
+    # Tanpa updated_at / bump_version: derivatif yang tampil tidak berubah
+    Room.objects.filter(pk=room.pk).update(foto_thumbnails=data)
+    room.foto_thumbnails = data
+    return failure
+
+
+def sync_room_thumbnails(force=False):
+    """
+    Proses semua ruangan yang derivatifnya basi; return (dibuat, gagal).
+    Ruangan yang masih dalam backoff dilewati kecuali force.
+    """
+    from .models import Room
+
+    built, failed = 0, 0
+    now = timezone.now()
+    rooms = Room.objects.only('id', 'foto_ruangan', 'foto_url', 'foto_drive_id', 'foto_thumbnails')
+    for room in rooms.iterator():
+        data = room.foto_thumbnails or {}
+        if not force and (not is_stale(room) or not should_retry(room, now)):
+            continue
+        if force:
+            room.foto_thumbnails = {**data, 'source': None}
+        try:
+            built += build_room_thumbnails(room)
+        except Exception as e:
+            failed += 1
+            failure = record_failure(room, data, now)
+            logger.warning(
+                f'Thumbnail ruangan {room.pk} gagal dibuat (percobaan {failure["attempts"]}): {e}'
+            )
+    return built, failed
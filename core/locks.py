@@ -0,0 +1,42 @@
+"""
+Cross-process job locks for SmartSpace UPY
+
+APScheduler dijalankan oleh setiap worker gunicorn dan setiap proses
+manage.py (CoreConfig.ready), jadi job yang menghapus/mengunduh data
+dibungkus single_run(): hanya satu proses yang menjalankannya, proses lain
+langsung melewati job tersebut.
+
+- PostgreSQL: pg_try_advisory_lock (otomatis dilepas jika proses mati).
+- Database lain: cache.add - hanya berlaku lintas proses jika cache-nya
+  bersama (Redis); cukup untuk SQLite di development.
+"""
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection
+
+
+@contextmanager
+def single_run(name, timeout=6 * 3600):
+    """Yield True jika lock `name` didapat, False jika sedang dipegang proses lain"""
+    if connection.vendor == 'postgresql':
+        key = zlib.crc32(f'smartspace:{name}'.encode())
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [key])
+            acquired = cursor.fetchone()[0]
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_advisory_unlock(%s)', [key])
+        return
+
+    cache_key = f'job_lock:{name}'
+    acquired = cache.add(cache_key, 1, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(cache_key)
@@ -0,0 +1,126 @@
+"""
+Management command to enforce the ActivityLog retention policy.
+
+Baris yang lebih tua dari ACTIVITY_LOG_RETENTION_DAYS di-stream ke file
+NDJSON terkompresi (gzip) di ACTIVITY_LOG_ARCHIVE_DIR, lalu dihapus per
+batch agar tidak mengunci tabel terlalu lama. Jika tabel sudah dipartisi
+(lihat core.partitioning), partisi bulanan yang seluruhnya kedaluwarsa
+langsung di-DROP.
+
+Retensi opt-in: ACTIVITY_LOG_RETENTION_DAYS > 0 dan ACTIVITY_LOG_ARCHIVE_DIR
+harus menunjuk ke volume persisten (bukan disk container yang hilang saat
+redeploy); tanpa arsip tidak ada baris yang dihapus kecuali --no-archive.
+Hanya satu proses yang menjalankan retensi pada satu waktu (core.locks).
+
+Usage:
+    python manage.py archive_activity_logs
+    python manage.py archive_activity_logs --days 180 --dry-run
+    python manage.py archive_activity_logs --no-archive
+"""
+import gzip
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from core import locks, partitioning
+from core.models import ActivityLog
+
+
+ARCHIVE_FIELDS = (
+    'id', 'created_at', 'user_id', 'user__username', 'action', 'model_name',
+    'object_id', 'object_repr', 'changes', 'ip_address',
+)
+
+
+class Command(BaseCommand):
+    help = 'Archive ActivityLog rows older than the retention period to NDJSON.gz and delete them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Override ACTIVITY_LOG_RETENTION_DAYS')
+        parser.add_argument('--output-dir', help='Override ACTIVITY_LOG_ARCHIVE_DIR')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--no-archive', action='store_true', help='Hapus tanpa menulis arsip')
+        parser.add_argument('--dry-run', action='store_true', help='Hanya hitung baris yang kedaluwarsa')
+
+    def handle(self, *args, **options):
+        with locks.single_run('archive_activity_logs') as acquired:
+            if not acquired:
+                self.stdout.write(self.style.WARNING('Retensi sedang dijalankan proses lain, dilewati.'))
+                return
+            self.run(options)
+
+    def run(self, options):
+        if partitioning.is_partitioned():
+            partitioning.ensure_partitions()
+
+        days = options['days'] if options['days'] is not None else settings.ACTIVITY_LOG_RETENTION_DAYS
+        if days <= 0:
+            self.stdout.write(self.style.WARNING('Retensi dinonaktifkan (ACTIVITY_LOG_RETENTION_DAYS <= 0).'))
+            return
+        output_dir = options['output_dir'] or settings.ACTIVITY_LOG_ARCHIVE_DIR
+        if not output_dir and not options['no_archive'] and not options['dry_run']:
+            raise CommandError(
+                'ACTIVITY_LOG_ARCHIVE_DIR belum diatur; tidak ada baris yang dihapus. '
+                'Arahkan ke volume persisten atau gunakan --output-dir / --no-archive.'
+            )
+
+        batch_size = options['batch_size']
+        cutoff = timezone.now() - timedelta(days=days)
+        expired = ActivityLog.objects.filter(created_at__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f'{expired.count()} activity log lebih tua dari {cutoff:%Y-%m-%d %H:%M} (UTC).')
+            return
+
+        # Batas id agar baris yang masuk selama proses tidak ikut terhapus tanpa diarsip
+        max_id = expired.order_by('-id').values_list('id', flat=True).first()
+        if max_id is None:
+            self.stdout.write(self.style.SUCCESS('Tidak ada activity log yang kedaluwarsa.'))
+            return
+        expired = expired.filter(id__lte=max_id)
+
+        if not options['no_archive']:
+            path, count = self.write_archive(expired, output_dir, cutoff, batch_size)
+            self.stdout.write(self.style.SUCCESS(f'  [OK] {count} baris diarsip ke {path}'))
+
+        deleted = 0
+        if partitioning.is_partitioned():
+            for name in partitioning.drop_partitions_before(cutoff):
+                self.stdout.write(self.style.SUCCESS(f'  [OK] partisi {name} di-drop'))
+
+        # Sisa baris (partisi yang baru sebagian kedaluwarsa / tabel biasa) dihapus per batch
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += ActivityLog.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'\nRetensi selesai: {deleted} baris dihapus per batch.'))
+
+    def write_archive(self, queryset, output_dir, cutoff, batch_size):
+        """Stream baris ke NDJSON.gz; file di-rename setelah selesai agar tidak ada arsip setengah jadi"""
+        os.makedirs(output_dir, exist_ok=True)
+        stamp = timezone.now().strftime('%Y%m%d%H%M%S')
+        path = os.path.join(output_dir, f'activitylog-before-{cutoff:%Y%m%d}-{stamp}.ndjson.gz')
+        partial_path = f'{path}.part'
+
+        rows = queryset.order_by('created_at', 'id').values(*ARCHIVE_FIELDS).iterator(chunk_size=batch_size)
+        count = 0
+        try:
+            with gzip.open(partial_path, 'wt', encoding='utf-8') as archive:
+                for row in rows:
+                    archive.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False))
+                    archive.write('\n')
+                    count += 1
+        except Exception as e:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise CommandError(f'Gagal menulis arsip, tidak ada baris yang dihapus: {e}')
+
+        os.replace(partial_path, path)
+        return path, count
@@ -0,0 +1,136 @@
+"""
+Management command to benchmark the main endpoints with Django's test client.
+Jalankan setelah `seed_load` agar hasil mendekati kondisi produksi.
+
+Reports p50/p95 latency and queries per request for each endpoint.
+
+Usage:
+    python manage.py benchmark
+    python manage.py benchmark --requests 200 --only home room_detail
+"""
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Room, User
+
+
+class Command(BaseCommand):
+    help = 'Benchmark main endpoints (p50/p95 latency and queries per request)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Jumlah request per endpoint')
+        parser.add_argument('--warmup', type=int, default=3, help='Request pemanasan (tidak dihitung)')
+        parser.add_argument('--user', help='Username untuk endpoint user (default: user dengan pesan terbanyak)')
+        parser.add_argument('--admin', help='Username admin untuk endpoint admin (default: staff pertama)')
+        parser.add_argument('--room', type=int, help='ID ruangan (default: ruangan dengan booking terbanyak)')
+        parser.add_argument('--only', nargs='*', help='Hanya jalankan endpoint tertentu')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'], staff=False)
+        admin = self.get_user(options['admin'], staff=True)
+        room = self.get_room(options['room'])
+
+        now = timezone.localtime()
+        tomorrow = (now + timedelta(days=1)).strftime('%Y-%m-%d')
+        endpoints = [
+            ('home', None, reverse('home')),
+            ('room_detail', None, reverse('room_detail', args=[room.pk])),
+            ('calendar', None, reverse('api_calendar_bookings', args=[room.pk]) + f'?year={now.year}&month={now.month}'),
+            ('booked_slots', None, reverse('api_booked_slots', args=[room.pk, tomorrow])),
+            ('messages_poll', user, reverse('api_messages_poll') + '?last_id=0'),
+            ('check_auth', user, reverse('api_check_auth')),
+            ('admin_chat_list', admin, reverse('admin:chat_list')),
+            ('admin_chat_poll', admin, reverse('admin:chat_conversations_poll')),
+        ]
+        if options['only']:
+            endpoints = [e for e in endpoints if e[0] in options['only']]
+
+        host = next((h for h in settings.ALLOWED_HOSTS if h and h != '*'), 'localhost').lstrip('.')
+
+        # Manifest storage butuh collectstatic; static URL tidak relevan untuk benchmark
+        storages = {**settings.STORAGES, 'staticfiles': {
+            'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+        }}
+        with override_settings(STORAGES=storages):
+            rows = [
+                self.run_endpoint(name, url, login_as, host, options['requests'], options['warmup'])
+                for name, login_as, url in endpoints
+            ]
+
+        self.stdout.write('')
+        self.stdout.write(f"{'endpoint':<18}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'queries':>10}")
+        self.stdout.write('-' * 64)
+        for row in rows:
+            self.stdout.write(
+                f"{row['name']:<18}{row['n']:>6}{row['p50']:>10.1f}{row['p95']:>10.1f}"
+                f"{row['max']:>10.1f}{row['queries']:>10.1f}"
+            )
+
+    def run_endpoint(self, name, url, login_as, host, n, warmup):
+        client = Client(HTTP_HOST=host)
+        if login_as:
+            client.force_login(login_as)
+
+        for _ in range(warmup):
+            client.get(url)
+
+        timings = []
+        query_counts = []
+        for _ in range(n):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+            query_counts.append(len(ctx.captured_queries))
+            if response.status_code != 200:
+                raise CommandError(f'{name}: {url} returned {response.status_code}')
+
+        self.stdout.write(self.style.SUCCESS(f'  [OK] {name}'))
+        return {
+            'name': name,
+            'n': n,
+            'p50': statistics.median(timings),
+            'p95': statistics.quantiles(timings, n=20, method='inclusive')[-1] if n > 1 else timings[0],
+            'max': max(timings),
+            'queries': statistics.mean(query_counts),
+        }
+
+    def get_user(self, username, staff):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" tidak ditemukan')
+        if staff:
+            user = User.objects.filter(is_staff=True).order_by('pk').first()
+        else:
+            user = (
+                User.objects.filter(is_staff=False)
+                .annotate(total=Count('received_messages'))
+                .order_by('-total')
+                .first()
+            )
+        if not user:
+            raise CommandError('Tidak ada user untuk benchmark, jalankan `seed_load` dulu')
+        return user
+
+    def get_room(self, room_id):
+        if room_id:
+            try:
+                return Room.objects.get(pk=room_id)
+            except Room.DoesNotExist:
+                raise CommandError(f'Ruangan {room_id} tidak ditemukan')
+        room = Room.objects.annotate(total=Count('bookings')).order_by('-total').first()
+        if not room:
+            raise CommandError('Tidak ada ruangan untuk benchmark, jalankan `seed_load` dulu')
+        return room
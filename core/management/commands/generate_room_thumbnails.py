@@ -0,0 +1,28 @@
+"""
+Management command to build WebP/JPEG thumbnails for room photos.
+Foto dari URL eksternal / Google Drive diunduh dan disimpan di storage.
+
+Usage:
+    python manage.py generate_room_thumbnails           # hanya yang basi / belum ada
+    python manage.py generate_room_thumbnails --force   # buat ulang semua, termasuk yang gagal
+"""
+from django.core.management.base import BaseCommand
+
+from core import images, locks
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnails for room photos (uploads, external URLs and Google Drive)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Buat ulang meskipun thumbnail masih sesuai')
+
+    def handle(self, *args, **options):
+        with locks.single_run('room_thumbnail_sync') as acquired:
+            if not acquired:
+                self.stdout.write(self.style.WARNING('Sinkronisasi thumbnail sedang dijalankan proses lain, dilewati.'))
+                return
+            built, failed = images.sync_room_thumbnails(force=options['force'])
+        self.stdout.write(self.style.SUCCESS(f'  [OK] {built} ruangan diproses'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'  [!] {failed} ruangan gagal, lihat log'))
@@ -0,0 +1,58 @@
+"""
+Management command to import a semester timetable (CSV/XLSX) as bookings.
+Kolom & aturan validasi: lihat core.schedule_import.
+
+Usage:
+    python manage.py import_schedule jadwal.xlsx
+    python manage.py import_schedule jadwal.csv --status Pending --report error.xlsx
+    python manage.py import_schedule jadwal.xlsx --dry-run    # validasi saja
+"""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import schedule_import
+from core.models import Booking
+
+
+class Command(BaseCommand):
+    help = 'Import class schedules from CSV/XLSX as bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File CSV atau XLSX')
+        parser.add_argument(
+            '--status', default=Booking.Status.APPROVED, choices=Booking.Status.values,
+            help='Status booking hasil import (default: Approved)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Validasi tanpa menyimpan')
+        parser.add_argument('--report', help='Tulis baris yang gagal ke file ini (.csv atau .xlsx)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, 'rb') as fileobj:
+                result = schedule_import.import_schedule(
+                    fileobj, path, status=options['status'], dry_run=options['dry_run'],
+                )
+        except OSError as e:
+            raise CommandError(f'Tidak bisa membuka {path}: {e}')
+        except schedule_import.ScheduleImportError as e:
+            raise CommandError(str(e))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'  [OK] {result.valid}/{result.total} baris valid (dry run)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'  [OK] {result.created}/{result.total} booking dibuat'))
+
+        if result.errors:
+            self.stdout.write(self.style.WARNING(f'  [!] {len(result.errors)} baris gagal'))
+            for row_number, _, message in result.errors[:20]:
+                self.stdout.write(f'      baris {row_number}: {message}')
+            if len(result.errors) > 20:
+                self.stdout.write(f'      ... dan {len(result.errors) - 20} lainnya')
+
+        if options['report'] and result.errors:
+            fmt = 'csv' if os.path.splitext(options['report'])[1].lower() == '.csv' else 'xlsx'
+            with open(options['report'], 'wb') as report:
+                report.write(schedule_import.error_report(result, fmt))
+            self.stdout.write(self.style.SUCCESS(f'  [OK] Laporan error ditulis ke {options["report"]}'))
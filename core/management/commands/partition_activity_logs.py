@@ -0,0 +1,35 @@
+"""
+Management command to manage monthly partitions of core_activitylog (PostgreSQL only).
+
+Usage:
+    python manage.py partition_activity_logs --convert   # sekali, saat traffic rendah
+    python manage.py partition_activity_logs             # buat partisi bulan-bulan berikutnya
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core import partitioning
+
+
+class Command(BaseCommand):
+    help = 'Convert ActivityLog to monthly range partitions and create upcoming partitions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help='Konversi tabel biasa menjadi tabel partisi')
+        parser.add_argument('--months-ahead', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if not partitioning.is_supported():
+            raise CommandError('Partitioning hanya didukung di PostgreSQL.')
+
+        if partitioning.is_partitioned():
+            if options['convert']:
+                self.stdout.write(self.style.WARNING('Tabel sudah dipartisi, konversi dilewati.'))
+        elif options['convert']:
+            self.stdout.write('Mengkonversi core_activitylog menjadi tabel partisi...')
+            partitioning.convert_to_partitioned(options['months_ahead'])
+            self.stdout.write(self.style.SUCCESS('  [OK] konversi selesai'))
+        else:
+            raise CommandError('Tabel belum dipartisi, jalankan dengan --convert terlebih dulu.')
+
+        for name in partitioning.ensure_partitions(options['months_ahead']):
+            self.stdout.write(self.style.SUCCESS(f'  [OK] {name}'))
@@ -0,0 +1,28 @@
+"""
+Management command to rebuild search documents (and the SQLite FTS5 index).
+Jalankan setelah import massal / bulk_create yang melewati save().
+
+Usage:
+    python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core import search
+from core.models import Room, User
+
+
+class Command(BaseCommand):
+    help = 'Rebuild search_document for rooms and users and refresh the search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            search.create_search_schema(connection)
+            for model in (Room, User):
+                total = search.rebuild_documents(model, batch_size=options['batch_size'])
+                self.stdout.write(self.style.SUCCESS(f'  [OK] {total} {model._meta.verbose_name_plural}'))
+
+        self.stdout.write(self.style.SUCCESS('\nSearch index berhasil dibangun ulang!'))
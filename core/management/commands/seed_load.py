@@ -0,0 +1,276 @@
+"""
+Management command to generate production-scale synthetic data for load testing.
+Data ditambahkan (tidak menghapus data lama) dan ditulis dengan bulk_create per batch.
+
+Usage:
+    python manage.py seed_load
+    python manage.py seed_load --users 5000 --rooms 200 --bookings 100000 --messages 50000
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core import search
+from core.models import (
+    ActivityLog, Booking, ConversationReadState, Message, Room, RoomComment, User, sync_room_facilities,
+)
+
+
+PREFIX = 'load'
+
+FASILITAS_POOL = [
+    'AC', 'Proyektor', 'WiFi', 'Whiteboard', 'Sound System', 'Mic Wireless',
+    'Smart TV', 'Komputer', 'Printer', 'Podium', 'Kursi Lipat', 'Stop Kontak',
+]
+
+# Distribusi status booking yang mendekati data produksi
+STATUS_WEIGHTS = [
+    (Booking.Status.APPROVED, 55),
+    (Booking.Status.PENDING, 15),
+    (Booking.Status.REJECTED, 15),
+    (Booking.Status.CANCELLED, 10),
+    (Booking.Status.ON_PROCESS, 5),
+]
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users, rooms, bookings, messages, comments and activity logs for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--rooms', type=int, default=50)
+        parser.add_argument('--bookings', type=int, default=20000)
+        parser.add_argument('--messages', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--logs', type=int, default=20000)
+        parser.add_argument('--days', type=int, default=180, help='Rentang hari (ke belakang & ke depan) untuk tanggal booking')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=None, help='Random seed agar data bisa direproduksi')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+        days = options['days']
+
+        with transaction.atomic():
+            admins = self.ensure_admin()
+            users = self.create_users(options['users'])
+            rooms = self.create_rooms(options['rooms'])
+            if not users or not rooms:
+                self.stdout.write(self.style.WARNING('Butuh minimal 1 user dan 1 ruangan.'))
+                return
+            self.create_bookings(options['bookings'], users, rooms, days)
+            self.create_messages(options['messages'], users, admins, days)
+            self.create_comments(options['comments'], users, rooms, days)
+            self.create_activity_logs(options['logs'], admins, rooms, days)
+            # bulk_create melewati save(), jadi dokumen pencarian dibangun terpisah
+            for model in (Room, User):
+                search.rebuild_documents(model, batch_size=self.batch_size)
+
+        self.stdout.write(self.style.SUCCESS('\nData load test berhasil dibuat!'))
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def bulk_create(self, model, objs):
+        """bulk_create per batch lalu kembalikan objek (dengan pk)"""
+        created = []
+        for i in range(0, len(objs), self.batch_size):
+            created.extend(model.objects.bulk_create(objs[i:i + self.batch_size]))
+        self.stdout.write(self.style.SUCCESS(f'  [OK] {len(created)} {model._meta.verbose_name_plural}'))
+        return created
+
+    def backdate(self, model, objs, field='created_at'):
+        """auto_now_add mengabaikan nilai di bulk_create, jadi tanggal disebar lewat bulk_update"""
+        for i in range(0, len(objs), self.batch_size):
+            model.objects.bulk_update(objs[i:i + self.batch_size], [field])
+
+    def random_past(self, days):
+        return self.now - timedelta(seconds=self.rng.randint(0, days * 86400))
+
+    def weighted_picker(self, items, alpha=1.2):
+        """Popularitas Zipf-like: sedikit item sangat populer, sisanya jarang"""
+        weights = [1 / (rank ** alpha) for rank in range(1, len(items) + 1)]
+        shuffled = list(items)
+        self.rng.shuffle(shuffled)
+        return lambda k: self.rng.choices(shuffled, weights=weights, k=k)
+
+    # ------------------------------------------------------------------
+    # Generators
+    # ------------------------------------------------------------------
+    def ensure_admin(self):
+        admins = list(User.objects.filter(is_staff=True))
+        if admins:
+            return admins
+        admin = User.objects.create(
+            username=f'{PREFIX}-admin',
+            npm_nip=f'{PREFIX.upper()}-ADMIN',
+            first_name='Load',
+            last_name='Admin',
+            role=User.Role.ADMIN,
+            is_staff=True,
+            is_superuser=True,
+            password=make_password('loadtest123'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'  [OK] admin {admin.username}'))
+        return [admin]
+
+    def create_users(self, count):
+        self.stdout.write(f'Membuat {count} user...')
+        start = User.objects.filter(username__startswith=f'{PREFIX}-user-').count()
+        password = make_password('loadtest123')  # hash sekali, dipakai semua user
+        roles = [User.Role.MAHASISWA] * 8 + [User.Role.DOSEN, User.Role.STAFF]
+        fakultas = [choice for choice, _ in User.Fakultas.choices]
+        users = []
+        for i in range(start, start + count):
+            users.append(User(
+                username=f'{PREFIX}-user-{i}',
+                npm_nip=f'{PREFIX.upper()}{i:07d}',
+                email=f'{PREFIX}.user{i}@example.com',
+                first_name=f'User{i}',
+                last_name='Load',
+                fakultas=self.rng.choice(fakultas),
+                program_studi='Informatika',
+                angkatan=str(self.rng.randint(2019, 2025)),
+                role=self.rng.choice(roles),
+                password=password,
+            ))
+        return self.bulk_create(User, users)
+
+    def create_rooms(self, count):
+        self.stdout.write(f'Membuat {count} ruangan...')
+        start = Room.objects.filter(nomor_ruangan__startswith='Load Ruang ').count()
+        tipe = [choice for choice, _ in Room.TipeRuangan.choices]
+        rooms = []
+        for i in range(start, start + count):
+            fasilitas = self.rng.sample(FASILITAS_POOL, self.rng.randint(2, 7))
+            rooms.append(Room(
+                nomor_ruangan=f'Load Ruang {i}',
+                tipe_ruangan=self.rng.choice(tipe),
+                kapasitas=self.rng.choice([20, 30, 40, 60, 100, 200, 500]),
+                fasilitas='\n'.join(fasilitas),
+                fasilitas_items=fasilitas,
+                deskripsi='Ruangan hasil generator load test.',
+                status=self.rng.choices(
+                    [Room.RoomStatus.AVAILABLE, Room.RoomStatus.MAINTENANCE, Room.RoomStatus.UNAVAILABLE],
+                    weights=[90, 7, 3],
+                )[0],
+            ))
+        rooms = self.bulk_create(Room, rooms)
+        for i in range(0, len(rooms), self.batch_size):
+            sync_room_facilities(rooms[i:i + self.batch_size])
+        return rooms
+
+    def create_bookings(self, count, users, rooms, days):
+        self.stdout.write(f'Membuat {count} booking...')
+        pick_rooms = self.weighted_picker(rooms)
+        pick_users = self.weighted_picker(users, alpha=0.8)
+        statuses, weights = zip(*STATUS_WEIGHTS)
+        bookings = []
+        for room, user in zip(pick_rooms(count), pick_users(count)):
+            # Jam kerja 07:00-17:00, durasi 1-4 jam, hari kerja lebih padat
+            day = timezone.localtime(self.now) + timedelta(days=self.rng.randint(-days, days))
+            if day.weekday() >= 5 and self.rng.random() < 0.7:
+                day -= timedelta(days=day.weekday() - 4)
+            start = day.replace(
+                hour=self.rng.randint(7, 16), minute=self.rng.choice([0, 30]), second=0, microsecond=0
+            )
+            bookings.append(Booking(
+                user=user,
+                room=room,
+                tanggal_mulai=start,
+                tanggal_selesai=start + timedelta(hours=self.rng.choice([1, 1, 2, 2, 2, 3, 4])),
+                jumlah_tamu=self.rng.randint(1, max(1, room.kapasitas)),
+                status=self.rng.choices(statuses, weights=weights)[0],
+                keperluan=self.rng.choice(['Kuliah pengganti', 'Rapat organisasi', 'Seminar', 'Praktikum', 'Ujian']),
+            ))
+        bookings = self.bulk_create(Booking, bookings)
+        for booking in bookings:
+            booking.created_at = min(booking.tanggal_mulai, self.now) - timedelta(days=self.rng.randint(1, 14))
+        self.backdate(Booking, bookings)
+
+    def create_messages(self, count, users, admins, days):
+        self.stdout.write(f'Membuat {count} pesan...')
+        # Sebagian kecil user sangat aktif chatting (heavy-tailed)
+        pick_users = self.weighted_picker(users, alpha=1.1)
+        messages = []
+        created_at_values = []
+        for user in pick_users(count):
+            admin = self.rng.choice(admins)
+            from_user = self.rng.random() < 0.55
+            created_at = self.random_past(days)
+            messages.append(Message(
+                sender=user if from_user else admin,
+                receiver=admin if from_user else user,
+                content='Pesan load test',
+                message_type='user_to_admin' if from_user else 'admin_to_user',
+            ))
+            created_at_values.append(created_at)
+        messages = self.bulk_create(Message, messages)
+        # Pesan lama sudah dibaca: watermark kedua sisi = pesan terakhir > 2 hari lalu
+        watermarks = {}
+        for message, created_at in zip(messages, created_at_values):
+            message.created_at = created_at
+            user_id = message.sender_id if message.message_type == 'user_to_admin' else message.receiver_id
+            watermarks.setdefault(user_id, 0)
+            if (self.now - created_at).days > 2:
+                watermarks[user_id] = max(watermarks[user_id], message.pk)
+        self.backdate(Message, messages)
+        ConversationReadState.objects.bulk_create([
+            ConversationReadState(user_id=user_id, side=side, last_read_message_id=message_id)
+            for user_id, message_id in watermarks.items()
+            for side in ConversationReadState.Side.values
+        ], batch_size=self.batch_size, ignore_conflicts=True)
+
+    def create_comments(self, count, users, rooms, days):
+        self.stdout.write(f'Membuat {count} komentar...')
+        existing = set(RoomComment.objects.values_list('user_id', 'room_id'))
+        pick_rooms = self.weighted_picker(rooms)
+        comments = []
+        attempts = 0
+        while len(comments) < count and attempts < count * 5:
+            attempts += 1
+            user = self.rng.choice(users)
+            room = pick_rooms(1)[0]
+            if (user.pk, room.pk) in existing:
+                continue
+            existing.add((user.pk, room.pk))
+            comments.append(RoomComment(
+                user=user,
+                room=room,
+                rating=self.rng.choices([1, 2, 3, 4, 5], weights=[3, 5, 15, 40, 37])[0],
+                comment='Komentar load test',
+                is_approved=self.rng.random() < 0.9,
+            ))
+        comments = self.bulk_create(RoomComment, comments)
+        for comment in comments:
+            comment.created_at = self.random_past(days)
+        self.backdate(RoomComment, comments)
+
+        # Rating ruangan dihitung ulang sekali per ruangan (bukan per komentar)
+        for room in {comment.room for comment in comments}:
+            room.update_average_rating()
+
+    def create_activity_logs(self, count, admins, rooms, days):
+        self.stdout.write(f'Membuat {count} activity log...')
+        actions = [choice for choice, _ in ActivityLog.ActionType.choices]
+        logs = []
+        for _ in range(count):
+            room = self.rng.choice(rooms)
+            logs.append(ActivityLog(
+                user=self.rng.choice(admins + [None]),
+                action=self.rng.choices(actions, weights=[30, 40, 5, 15, 10])[0],
+                model_name=self.rng.choice(['Room', 'Booking']),
+                object_id=room.pk,
+                object_repr=str(room)[:200],
+                ip_address=f'10.0.{self.rng.randint(0, 255)}.{self.rng.randint(1, 254)}',
+            ))
+        logs = self.bulk_create(ActivityLog, logs)
+        for log in logs:
+            log.created_at = self.random_past(days)
+        self.backdate(ActivityLog, logs)
@@ -0,0 +1,120 @@
+"""
+Prometheus Metrics for SmartSpace UPY
+
+Registry metrik in-process untuk hot path aplikasi. Jika environment
+PROMETHEUS_MULTIPROC_DIR di-set (wajib untuk gunicorn dengan banyak worker),
+prometheus_client menyimpan nilai metrik di file mmap dalam direktori tersebut
+sehingga endpoint /metrics mengagregasi semua worker.
+"""
+import hmac
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+)
+from prometheus_client import multiprocess
+
+
+# ============================================
+# METRICS
+# ============================================
+REQUEST_LATENCY = Histogram(
+    'smartspace_request_duration_seconds',
+    'Request latency per URL name',
+    ['view', 'method'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+POLL_REQUESTS = Counter(
+    'smartspace_poll_requests_total',
+    'Polling requests (messages, admin chat, check-auth)',
+    ['view'],
+)
+BOOKINGS_CREATED = Counter(
+    'smartspace_bookings_created_total',
+    'Bookings created',
+    ['source'],
+)
+BOOKING_CONFLICTS = Counter(
+    'smartspace_booking_conflicts_total',
+    'Booking conflicts detected',
+    ['source'],
+)
+EMAIL_QUEUE_DEPTH = Gauge(
+    'smartspace_email_queue_depth',
+    'Emails currently waiting on the Brevo API',
+    multiprocess_mode='livesum',
+)
+EMAIL_SEND_LATENCY = Histogram(
+    'smartspace_email_send_duration_seconds',
+    'Brevo send latency',
+    ['result'],
+)
+GEMINI_LATENCY = Histogram(
+    'smartspace_gemini_request_duration_seconds',
+    'Gemini chat call latency',
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 30),
+)
+GEMINI_ERRORS = Counter(
+    'smartspace_gemini_errors_total',
+    'Gemini chat call errors',
+)
+SCHEDULER_JOB_DURATION = Histogram(
+    'smartspace_scheduler_job_duration_seconds',
+    'Background scheduler job duration',
+    ['job'],
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300),
+)
+
+# URL name yang dipanggil berkala oleh halaman (setiap 3 detik per tab)
+POLL_VIEWS = {
+    'api_messages_poll',
+    'api_messages_count',
+    'api_check_auth',
+    'admin:chat_poll',
+    'admin:chat_conversations_poll',
+}
+
+
+@contextmanager
+def observe_duration(histogram, **labels):
+    """Catat durasi blok ke histogram, contoh: with observe_duration(SCHEDULER_JOB_DURATION, job='x'):"""
+    metric = histogram.labels(**labels) if labels else histogram
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric.observe(time.perf_counter() - start)
+
+
+# ============================================
+# /metrics ENDPOINT
+# ============================================
+def _has_metrics_access(request):
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        return False
+    # Hanya header Authorization: query string ikut tercatat di access log / proxy
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+    if not auth_header.startswith('Bearer '):
+        return False
+    return hmac.compare_digest(auth_header[7:].encode(), token.encode())
+
+
+def metrics_view(request):
+    """Expose metrik dalam format teks Prometheus (staff atau METRICS_TOKEN)"""
+    if not _has_metrics_access(request):
+        return HttpResponseForbidden('Forbidden')
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -1,8 +1,20 @@
 """
 Custom Middleware for SmartSpace UPY
 """
+import cProfile
+import json
+import logging
+import os
+import random
+import time
+
 from django.shortcuts import redirect
 from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+profiling_logger = logging.getLogger('core.profiling')
 
 
 class AdminAccessMiddleware:
@@ -25,3 +37,180 @@ class AdminAccessMiddleware:
                 return redirect('home')
         
         return self.get_response(request)
+
+
+class RequestProfilingMiddleware:
+    """
+    Opt-in instrumentation per request (aktif jika PROFILING_ENABLED=True).
+    
+    Mencatat wall time, jumlah & durasi query DB, waktu render template dan
+    waktu API eksternal (Gemini, Brevo) sebagai structured log (JSON) ke
+    logger 'core.profiling'. Sebagian request (PROFILING_SAMPLE_RATE) dijalankan
+    di bawah cProfile; jika melewati PROFILING_SLOW_MS, hasilnya di-dump ke
+    PROFILING_DUMP_DIR sebagai file .prof.
+    """
+    
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        
+        from .profiling import patch_template_render
+        patch_template_render()
+        
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'PROFILING_SLOW_MS', 500)
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.1)
+        self.dump_dir = getattr(settings, 'PROFILING_DUMP_DIR', None)
+    
+    def __call__(self, request):
+        from .profiling import db_execute_wrapper, start_request, end_request
+        
+        stats, token = start_request()
+        profiler = self._start_profiler()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(db_execute_wrapper):
+                response = self.get_response(request)
+        finally:
+            wall_ms = (time.perf_counter() - start) * 1000
+            if profiler:
+                profiler.disable()
+            end_request(token)
+        
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            'status': response.status_code,
+            'wall_ms': round(wall_ms, 2),
+            'db_queries': stats.db_queries,
+            'db_ms': round(stats.db_time * 1000, 2),
+            'template_ms': round(stats.template_time * 1000, 2),
+            'external': {
+                service: {'calls': data['calls'], 'ms': round(data['time'] * 1000, 2)}
+                for service, data in stats.external.items()
+            },
+        }
+        if wall_ms >= self.slow_ms:
+            record['slow'] = True
+            if profiler:
+                record['profile'] = self._dump_profile(profiler, request)
+            profiling_logger.warning(json.dumps(record))
+        else:
+            profiling_logger.info(json.dumps(record))
+        
+        return response
+    
+    def _start_profiler(self):
+        if not self.dump_dir or random.random() >= self.sample_rate:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Profiler lain sedang aktif (mis. request paralel di thread lain)
+            return None
+        return profiler
+    
+    def _dump_profile(self, profiler, request):
+        os.makedirs(self.dump_dir, exist_ok=True)
+        slug = request.path.strip('/').replace('/', '_') or 'root'
+        filename = os.path.join(self.dump_dir, f"{int(time.time() * 1000)}_{request.method}_{slug[:80]}.prof")
+        profiler.dump_stats(filename)
+        return filename
+
+
+class MetricsMiddleware:
+    """
+    Record request latency per URL name and poll request counts
+    for the Prometheus /metrics endpoint (lihat core.metrics).
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        from .metrics import REQUEST_LATENCY, POLL_REQUESTS, POLL_VIEWS
+        
+        start = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+        
+        # Gunakan URL name (bukan path) agar cardinality label tetap kecil
+        view_name = getattr(request.resolver_match, 'view_name', None) or 'unresolved'
+        REQUEST_LATENCY.labels(view=view_name, method=request.method).observe(elapsed)
+        if view_name in POLL_VIEWS:
+            POLL_REQUESTS.labels(view=view_name).inc()
+        
+        return response
+
+
+class ActivityLogMiddleware:
+    """
+    Buffer ActivityLog entries for the duration of a request and write them
+    with one bulk_create at the end (lihat core.activity_log).
+    
+    Juga memberi signals akses ke user yang sedang login dan IP-nya.
+    Harus diletakkan setelah AuthenticationMiddleware.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        from .activity_log import begin_request, end_request
+        
+        token = begin_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            end_request(token)
+
+
+# ============================================
+# THROTTLED SESSION REFRESH
+# ============================================
+SESSION_REFRESHED_KEY = '_refreshed_at'
+
+
+def skip_session_refresh(view_func):
+    """
+    Endpoint polling tidak memperpanjang session.
+
+    Perubahan session yang eksplisit (login, logout, dll.) tetap disimpan.
+    """
+    from functools import wraps
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        request.skip_session_refresh = True
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+class ThrottledSessionMiddleware(SessionMiddleware):
+    """
+    Pengganti SessionMiddleware + SESSION_SAVE_EVERY_REQUEST.
+
+    Session yang tidak berubah hanya disimpan ulang (expiry diperpanjang, cookie
+    dikirim ulang) jika penyegaran terakhir lebih lama dari
+    SESSION_REFRESH_INTERVAL detik. Dengan engine cached_db (jika REDIS_URL), baca session
+    dilayani dari cache, sehingga jumlah UPDATE django_session per user
+    dibatasi oleh interval, bukan oleh frekuensi polling.
+    """
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if (
+            session is not None
+            and session.session_key
+            and not session.modified
+            and not getattr(request, 'skip_session_refresh', False)
+            and response.status_code != 500
+        ):
+            now = int(time.time())
+            refreshed_at = session.get(SESSION_REFRESHED_KEY, 0)
+            if now - refreshed_at >= settings.SESSION_REFRESH_INTERVAL:
+                # Menandai session modified: SessionMiddleware menyimpan & mengirim cookie baru
+                session[SESSION_REFRESHED_KEY] = now
+        return super().process_response(request, response)
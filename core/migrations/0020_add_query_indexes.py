@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_add_room_status_fields'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='room',
+            name='tipe_ruangan',
+            field=models.CharField(choices=[('Kelas', 'Kelas'), ('Lab', 'Laboratorium'), ('Aula', 'Aula'), ('Studio', 'Studio'), ('Meeting', 'Ruang Meeting'), ('Perpustakaan', 'Perpustakaan'), ('Kantor', 'Kantor'), ('Lapangan', 'Lapangan'), ('Co-Working', 'Co-Working Space')], default='Kelas', max_length=20, verbose_name='Tipe Ruangan'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['-created_at'], name='activitylog_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['room', 'status', 'tanggal_mulai', 'tanggal_selesai'], name='booking_room_status_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-created_at'], name='booking_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'Pending')), fields=['-created_at'], name='booking_pending_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['receiver'], name='message_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'receiver', 'created_at'], name='message_conversation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roomcomment',
+            index=models.Index(condition=models.Q(('is_approved', True)), fields=['room', '-created_at'], name='roomcomment_approved_idx'),
+        ),
+    ]
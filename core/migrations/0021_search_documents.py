@@ -0,0 +1,122 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:36
+
+import unicodedata
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+# Salinan dari core.search saat migration ini dibuat: migration tidak boleh ikut berubah
+# jika field/normalisasi di core.search diubah kemudian (rebuild_search_index untuk itu)
+SEARCH_FIELDS = {
+    'Room': (('nomor_ruangan',), ('tipe_ruangan', 'fasilitas', 'deskripsi')),
+    'User': (('first_name', 'last_name', 'username'), ('npm_nip', 'email')),
+}
+FTS_TABLE = 'core_search_fts'
+FTS_VOCAB_TABLE = 'core_search_fts_vocab'
+BATCH_SIZE = 1000
+
+
+def normalize_text(text):
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.lower().split())
+
+
+def field_text(obj, field_name):
+    display = getattr(obj, f'get_{field_name}_display', None)
+    value = getattr(obj, field_name, '') or ''
+    if display is not None and display() != value:
+        return f'{value} {display()}'
+    return str(value)
+
+
+def document_parts(obj, name_fields, body_fields):
+    name = normalize_text(' '.join(field_text(obj, f) for f in name_fields))
+    body = normalize_text(' '.join(field_text(obj, f) for f in body_fields))
+    return name, body
+
+
+def flush_documents(model, batch, connection, label):
+    model.objects.using(connection.alias).bulk_update([obj for obj, _ in batch], ['search_document'])
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (model, object_id, name, body) VALUES (%s, %s, %s, %s)',
+                [(label, obj.pk, *parts) for obj, parts in batch],
+            )
+
+
+def create_search_schema(apps, schema_editor):
+    """Index pg_trgm/tsvector (PostgreSQL) atau tabel FTS5 (SQLite), lalu isi dokumen"""
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for table in ('core_room', 'core_user'):
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {table}_search_trgm_idx ON {table} '
+                    f'USING gin (search_document gin_trgm_ops)'
+                )
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {table}_search_tsv_idx ON {table} '
+                    f"USING gin (to_tsvector('simple'::regconfig, COALESCE(search_document, '')))"
+                )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+                f'model UNINDEXED, object_id UNINDEXED, name, body, '
+                f"tokenize = 'unicode61 remove_diacritics 2')"
+            )
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_VOCAB_TABLE} USING fts5vocab({FTS_TABLE}, row)'
+            )
+
+    for model_name, (name_fields, body_fields) in SEARCH_FIELDS.items():
+        model = apps.get_model('core', model_name)
+        label = f'core.{model_name.lower()}'
+        batch = []
+        rows = model.objects.using(connection.alias).only(*name_fields, *body_fields).order_by('pk')
+        for obj in rows.iterator(chunk_size=BATCH_SIZE):
+            parts = document_parts(obj, name_fields, body_fields)
+            obj.search_document = ' '.join(part for part in parts if part)
+            batch.append((obj, parts))
+            if len(batch) >= BATCH_SIZE:
+                flush_documents(model, batch, connection, label)
+                batch = []
+        if batch:
+            flush_documents(model, batch, connection, label)
+
+
+def drop_search_schema(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for table in ('core_room', 'core_user'):
+                cursor.execute(f'DROP INDEX IF EXISTS {table}_search_trgm_idx')
+                cursor.execute(f'DROP INDEX IF EXISTS {table}_search_tsv_idx')
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_VOCAB_TABLE}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_add_query_indexes'),
+    ]
+
+    operations = [
+        # No-op selain di PostgreSQL
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='room',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(create_search_schema, drop_search_schema),
+    ]
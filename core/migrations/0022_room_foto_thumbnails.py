@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_search_documents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='foto_thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
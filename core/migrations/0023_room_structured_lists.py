@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:46
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+# Salinan dari core.models saat migration ini dibuat: migration tidak boleh ikut berubah
+# jika helper di core.models diubah kemudian
+def split_lines(text):
+    return [line.strip() for line in (text or '').split('\n') if line.strip()]
+
+
+def sync_room_facilities(rooms, Facility, RoomFacility):
+    names, room_slugs = {}, {}
+    for room in rooms:
+        slugs = set()
+        for name in room.fasilitas_items:
+            slug = slugify(name)[:100]
+            if slug:
+                names.setdefault(slug, name[:100])
+                slugs.add(slug)
+        room_slugs[room.pk] = slugs
+
+    Facility.objects.bulk_create(
+        [Facility(slug=slug, name=name) for slug, name in names.items()],
+        ignore_conflicts=True,
+    )
+    facility_ids = dict(Facility.objects.filter(slug__in=names).values_list('slug', 'id'))
+    RoomFacility.objects.filter(room_id__in=room_slugs).delete()
+    RoomFacility.objects.bulk_create([
+        RoomFacility(room_id=room_id, facility_id=facility_ids[slug])
+        for room_id, slugs in room_slugs.items()
+        for slug in slugs
+    ])
+
+
+def populate_lists(apps, schema_editor):
+    """Isi *_items dan tabel tag fasilitas untuk ruangan yang sudah ada"""
+    Room = apps.get_model('core', 'Room')
+    Facility = apps.get_model('core', 'Facility')
+    rooms = list(Room.objects.only('fasilitas', 'peraturan', 'larangan'))
+    for room in rooms:
+        room.fasilitas_items = split_lines(room.fasilitas)
+        room.peraturan_items = split_lines(room.peraturan)
+        room.larangan_items = split_lines(room.larangan)
+    Room.objects.bulk_update(rooms, ['fasilitas_items', 'peraturan_items', 'larangan_items'], batch_size=500)
+    for i in range(0, len(rooms), 500):
+        sync_room_facilities(rooms[i:i + 500], Facility, Room.facilities.through)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_room_foto_thumbnails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Facility',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Nama Fasilitas')),
+                ('slug', models.SlugField(max_length=100, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Fasilitas',
+                'verbose_name_plural': 'Fasilitas',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='fasilitas_items',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='larangan_items',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='peraturan_items',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='facilities',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='rooms', to='core.facility'),
+        ),
+        migrations.RunPython(populate_lists, migrations.RunPython.noop),
+    ]
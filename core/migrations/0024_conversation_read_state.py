@@ -0,0 +1,107 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min, Q
+
+
+ADMIN_Q = Q(is_superuser=True) | Q(role='Admin') | Q(is_staff=True)
+
+
+def populate_watermarks(apps, schema_editor):
+    """
+    Watermark = id sebelum pesan masuk belum-dibaca pertama (atau pesan masuk
+    terakhir jika semua sudah dibaca), jadi tidak ada pesan belum-dibaca yang hilang.
+    """
+    User = apps.get_model('core', 'User')
+    Message = apps.get_model('core', 'Message')
+    ConversationReadState = apps.get_model('core', 'ConversationReadState')
+
+    admin_ids = list(User.objects.filter(ADMIN_Q).values_list('id', flat=True))
+    conversation_users = set(
+        Message.objects.exclude(sender_id__in=admin_ids).values_list('sender_id', flat=True).distinct()
+    ) | set(
+        Message.objects.exclude(receiver_id__in=admin_ids).values_list('receiver_id', flat=True).distinct()
+    )
+    watermarks = {}
+    incoming = {
+        # sisi: (pesan masuk, field user pemilik percakapan)
+        'user': (Message.objects.exclude(receiver_id__in=admin_ids), 'receiver'),
+        'admin': (Message.objects.filter(receiver_id__in=admin_ids).exclude(sender_id__in=admin_ids), 'sender'),
+    }
+    for side, (messages, user_field) in incoming.items():
+        rows = messages.order_by().values(user_field).annotate(
+            first_unread=Min('id', filter=Q(is_read=False)),
+            last=Max('id'),
+        )
+        for row in rows:
+            watermark = row['first_unread'] - 1 if row['first_unread'] else row['last']
+            watermarks[row[user_field], side] = watermark
+    # Kedua sisi selalu punya baris agar mark_read cukup satu UPDATE
+    ConversationReadState.objects.bulk_create([
+        ConversationReadState(
+            user_id=user_id, side=side, last_read_message_id=watermarks.get((user_id, side), 0),
+        )
+        for user_id in conversation_users
+        for side in ('user', 'admin')
+    ], batch_size=1000)
+
+
+def restore_is_read(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    Message = apps.get_model('core', 'Message')
+    ConversationReadState = apps.get_model('core', 'ConversationReadState')
+
+    admin_ids = list(User.objects.filter(ADMIN_Q).values_list('id', flat=True))
+    for state in ConversationReadState.objects.all():
+        if state.side == 'user':
+            messages = Message.objects.filter(receiver_id=state.user_id)
+        else:
+            messages = Message.objects.filter(sender_id=state.user_id, receiver_id__in=admin_ids)
+        messages.filter(id__lte=state.last_read_message_id).update(is_read=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_room_structured_lists'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('side', models.CharField(choices=[('user', 'User'), ('admin', 'Admin')], max_length=10, verbose_name='Sisi')),
+                ('last_read_message_id', models.PositiveBigIntegerField(default=0, verbose_name='Pesan Terakhir Dibaca')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Status Baca Percakapan',
+                'verbose_name_plural': 'Status Baca Percakapan',
+            },
+        ),
+        migrations.AddField(
+            model_name='conversationreadstate',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_read_states', to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='conversationreadstate',
+            unique_together={('user', 'side')},
+        ),
+        migrations.RunPython(populate_watermarks, restore_is_read),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='message_unread_idx',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['receiver', 'id'], name='message_receiver_id_idx'),
+        ),
+    ]
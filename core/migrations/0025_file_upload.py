@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('core', '0024_conversation_read_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('field_name', models.CharField(max_length=50)),
+                ('staged_name', models.CharField(max_length=255, verbose_name='File Staging')),
+                ('original_name', models.CharField(max_length=255, verbose_name='Nama File')),
+                ('size', models.PositiveBigIntegerField(default=0, verbose_name='Ukuran (byte)')),
+                ('status', models.CharField(choices=[('pending', 'Menunggu'), ('done', 'Selesai'), ('failed', 'Gagal')], default='pending', max_length=10, verbose_name='Status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Upload File',
+                'verbose_name_plural': 'Upload File',
+                'indexes': [models.Index(fields=['content_type', 'object_id'], name='fileupload_object_idx'), models.Index(condition=models.Q(('status', 'pending')), fields=['created_at'], name='fileupload_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_file_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='detected_type',
+            field=models.CharField(blank=True, max_length=10, verbose_name='Tipe Terdeteksi'),
+        ),
+        migrations.AddField(
+            model_name='fileupload',
+            name='page_count',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Jumlah Halaman'),
+        ),
+        migrations.AddField(
+            model_name='fileupload',
+            name='preview',
+            field=models.ImageField(blank=True, upload_to='upload_previews/', verbose_name='Preview'),
+        ),
+        migrations.AlterField(
+            model_name='fileupload',
+            name='staged_name',
+            field=models.CharField(blank=True, max_length=255, verbose_name='File Staging'),
+        ),
+        migrations.AlterField(
+            model_name='fileupload',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Menunggu'), ('done', 'Selesai'), ('failed', 'Gagal'), ('rejected', 'Ditolak')], default='pending', max_length=10, verbose_name='Status'),
+        ),
+    ]
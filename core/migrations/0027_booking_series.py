@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_file_upload_inspection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(choices=[('weekly', 'Setiap Minggu'), ('biweekly', 'Setiap 2 Minggu')], default='weekly', max_length=10, verbose_name='Pengulangan')),
+                ('tanggal_mulai', models.DateTimeField(verbose_name='Mulai (Kejadian Pertama)')),
+                ('tanggal_selesai', models.DateTimeField(verbose_name='Selesai (Kejadian Pertama)')),
+                ('until', models.DateField(verbose_name='Berulang Sampai')),
+                ('exceptions', models.JSONField(blank=True, default=list, help_text='Daftar tanggal (YYYY-MM-DD) yang dilewati, mis. libur', verbose_name='Tanggal Dikecualikan')),
+                ('jumlah_tamu', models.PositiveIntegerField(default=1, verbose_name='Jumlah Tamu')),
+                ('dokumen_pendukung', models.FileField(blank=True, null=True, upload_to='dokumen_booking/', verbose_name='Dokumen Pendukung')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_series', to='core.room', verbose_name='Ruangan')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_series', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Peminjaman Berulang',
+                'verbose_name_plural': 'Peminjaman Berulang',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bookings', to='core.bookingseries', verbose_name='Peminjaman Berulang'),
+        ),
+    ]
@@ -1,5 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
+from django.contrib.contenttypes.models import ContentType
+from django.utils.text import slugify
+from .storage_urls import file_url
 import os
 
 
@@ -12,7 +16,63 @@ def get_document_storage():
     return None
 
 
-class User(AbstractUser):
+class DirtyFieldsMixin:
+    """
+    Field-level change tracking tanpa query tambahan.
+    
+    Nilai field yang dimuat dari database disimpan di from_db, lalu dibandingkan
+    dengan nilai saat ini lewat get_dirty_fields(). Snapshot diperbarui setelah
+    save berhasil, jadi post_save masih melihat nilai lama.
+    """
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+    
+    def get_dirty_fields(self):
+        """Return {attname: (old, new)} untuk field yang berubah sejak dimuat/disimpan"""
+        loaded = getattr(self, '_loaded_values', None)
+        if not loaded:
+            return {}
+        dirty = {}
+        for attname, old_value in loaded.items():
+            if attname not in self.__dict__:
+                continue
+            new_value = getattr(self, attname)
+            if old_value != new_value:
+                dirty[attname] = (old_value, new_value)
+        return dirty
+
+
+class SearchDocumentMixin:
+    """
+    Menjaga kolom search_document (teks ternormalisasi, lihat core.search)
+    tetap sinkron dengan field sumbernya setiap kali save.
+    """
+    
+    def save(self, *args, **kwargs):
+        from .search import SEARCH_FIELDS, build_document
+        
+        self.search_document = build_document(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            name_fields, body_fields = SEARCH_FIELDS[self._meta.label_lower]
+            if set(update_fields) & {*name_fields, *body_fields}:
+                kwargs['update_fields'] = {*update_fields, 'search_document'}
+        super().save(*args, **kwargs)
+
+
+class User(SearchDocumentMixin, AbstractUser):
     """Custom User model extending AbstractUser"""
     
     class Role(models.TextChoices):
@@ -44,6 +104,7 @@ class User(AbstractUser):
         default=Role.MAHASISWA,
         verbose_name='Role'
     )
+    search_document = models.TextField(blank=True, default='', editable=False)
     
     class Meta:
         verbose_name = 'User'
@@ -51,9 +112,65 @@ class User(AbstractUser):
     
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
+    
+    @property
+    def is_chat_admin(self):
+        """Sisi admin di chat (sama dengan filter all_admin_ids di views)"""
+        return self.is_superuser or self.is_staff or self.role == self.Role.ADMIN
+
+
+def split_lines(text):
+    """'AC\n Proyektor \n\n' -> ['AC', 'Proyektor']"""
+    return [line.strip() for line in (text or '').split('\n') if line.strip()]
 
 
-class Room(models.Model):
+def facility_slug(name):
+    return slugify(name)[:100]
+
+
+def sync_room_facilities(rooms):
+    """Sinkronkan tabel tag fasilitas untuk banyak ruangan sekaligus (jumlah query tetap)"""
+    through_model = Room.facilities.through
+    
+    names, room_slugs = {}, {}
+    for room in rooms:
+        slugs = set()
+        for name in room.fasilitas_items:
+            slug = facility_slug(name)
+            if slug:
+                names.setdefault(slug, name[:100])
+                slugs.add(slug)
+        room_slugs[room.pk] = slugs
+    
+    Facility.objects.bulk_create(
+        [Facility(slug=slug, name=name) for slug, name in names.items()],
+        ignore_conflicts=True,
+    )
+    facility_ids = dict(Facility.objects.filter(slug__in=names).values_list('slug', 'id'))
+    through_model.objects.filter(room_id__in=room_slugs).delete()
+    through_model.objects.bulk_create([
+        through_model(room_id=room_id, facility_id=facility_ids[slug])
+        for room_id, slugs in room_slugs.items()
+        for slug in slugs
+    ])
+
+
+class Facility(models.Model):
+    """Tag fasilitas ruangan, diturunkan dari Room.fasilitas untuk filter ber-index"""
+    
+    name = models.CharField(max_length=100, verbose_name='Nama Fasilitas')
+    slug = models.SlugField(max_length=100, unique=True)
+    
+    class Meta:
+        verbose_name = 'Fasilitas'
+        verbose_name_plural = 'Fasilitas'
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
+class Room(SearchDocumentMixin, DirtyFieldsMixin, models.Model):
     """Model untuk Ruangan"""
     
     class TipeRuangan(models.TextChoices):
@@ -72,6 +189,18 @@ class Room(models.Model):
         MAINTENANCE = 'maintenance', 'Dalam Perbaikan'
         UNAVAILABLE = 'unavailable', 'Tidak Tersedia'
     
+    STATUS_DISPLAY = {
+        'available': {'label': 'Tersedia', 'color': 'green', 'icon': '✓'},
+        'maintenance': {'label': 'Dalam Perbaikan', 'color': 'yellow', 'icon': '🔧'},
+        'unavailable': {'label': 'Tidak Tersedia', 'color': 'red', 'icon': '✕'},
+    }
+    # field teks (satu item per baris) -> field JSON list
+    LIST_FIELDS = {
+        'fasilitas': 'fasilitas_items',
+        'peraturan': 'peraturan_items',
+        'larangan': 'larangan_items',
+    }
+    
     nomor_ruangan = models.CharField(max_length=50, unique=True, verbose_name='Nama Ruangan')
     tipe_ruangan = models.CharField(
         max_length=20,
@@ -99,6 +228,8 @@ class Room(models.Model):
         verbose_name='Google Drive ID',
         help_text='Alternatif: masukkan ID file dari Google Drive (contoh: 1aBcDeFgHiJkLmNoPqRs)'
     )
+    # Thumbnail WebP/JPEG yang dibuat dari foto di atas (lihat core.images)
+    foto_thumbnails = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True, verbose_name='Aktif')
     
     # Room Status Fields
@@ -137,6 +268,12 @@ class Room(models.Model):
         help_text='Hal-hal yang TIDAK BOLEH dilakukan di ruangan ini (pisahkan dengan baris baru)'
     )
     
+    # Versi list dari field teks di atas, dihitung ulang setiap save (lihat LIST_FIELDS)
+    fasilitas_items = models.JSONField(default=list, blank=True, editable=False)
+    peraturan_items = models.JSONField(default=list, blank=True, editable=False)
+    larangan_items = models.JSONField(default=list, blank=True, editable=False)
+    facilities = models.ManyToManyField(Facility, blank=True, related_name='rooms', editable=False)
+    
     # Rating fields (auto-calculated from comments)
     average_rating = models.DecimalField(
         max_digits=2,
@@ -148,6 +285,7 @@ class Room(models.Model):
         default=0,
         verbose_name='Jumlah Review'
     )
+    search_document = models.TextField(blank=True, default='', editable=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -166,7 +304,7 @@ class Room(models.Model):
         # Check uploaded file first (must have a name/path)
         if self.foto_ruangan and self.foto_ruangan.name:
             try:
-                return self.foto_ruangan.url
+                return file_url(self.foto_ruangan)
             except Exception:
                 pass  # Fall through to other options
         
@@ -180,26 +318,36 @@ class Room(models.Model):
         
         return None
     
+    @property
+    def foto_thumbnail_url(self):
+        """Thumbnail JPEG untuk kartu ruangan; fallback ke get_foto_url jika belum dibuat"""
+        from .images import thumbnail_url
+        return thumbnail_url(self)
+    
+    @property
+    def foto_srcset_webp(self):
+        from .images import srcset
+        return srcset(self, 'webp')
+    
+    @property
+    def foto_srcset_jpeg(self):
+        from .images import srcset
+        return srcset(self, 'jpeg')
+    
     @property
     def fasilitas_list(self):
-        """Return fasilitas as a list, splitting by newlines"""
-        if self.fasilitas:
-            return [f.strip() for f in self.fasilitas.split('\n') if f.strip()]
-        return []
+        """Fasilitas sebagai list (dihitung saat save)"""
+        return self.fasilitas_items
     
     @property
     def peraturan_list(self):
-        """Return peraturan (allowed rules) as a list, splitting by newlines"""
-        if self.peraturan:
-            return [p.strip() for p in self.peraturan.split('\n') if p.strip()]
-        return []
+        """Peraturan (allowed rules) sebagai list (dihitung saat save)"""
+        return self.peraturan_items
     
     @property
     def larangan_list(self):
-        """Return larangan (prohibited rules) as a list, splitting by newlines"""
-        if self.larangan:
-            return [l.strip() for l in self.larangan.split('\n') if l.strip()]
-        return []
+        """Larangan (prohibited rules) sebagai list (dihitung saat save)"""
+        return self.larangan_items
     
     @property
     def is_available(self):
@@ -213,13 +361,26 @@ class Room(models.Model):
     
     @property
     def status_display_info(self):
-        """Returns dict with label, color, icon for templates"""
-        status_map = {
-            'available': {'label': 'Tersedia', 'color': 'green', 'icon': '✓'},
-            'maintenance': {'label': 'Dalam Perbaikan', 'color': 'yellow', 'icon': '🔧'},
-            'unavailable': {'label': 'Tidak Tersedia', 'color': 'red', 'icon': '✕'},
-        }
-        return status_map.get(self.status, status_map['unavailable'])
+        """Returns dict with label, color, icon for templates (shared, jangan diubah)"""
+        return self.STATUS_DISPLAY.get(self.status, self.STATUS_DISPLAY['unavailable'])
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        deferred = self.get_deferred_fields()
+        changed_lists = set()
+        for source, target in self.LIST_FIELDS.items():
+            if source not in deferred and (update_fields is None or source in update_fields):
+                setattr(self, target, split_lines(getattr(self, source)))
+                changed_lists.add(target)
+        if update_fields is not None and changed_lists:
+            kwargs['update_fields'] = {*update_fields, *changed_lists}
+        # Snapshot dirty fields diperbarui oleh super().save, jadi cek sebelumnya
+        sync_facilities = 'fasilitas_items' in changed_lists and (
+            self._state.adding or 'fasilitas' in self.get_dirty_fields()
+        )
+        super().save(*args, **kwargs)
+        if sync_facilities:
+            sync_room_facilities([self])
     
     def update_average_rating(self):
         """Update average rating based on approved comments"""
@@ -230,10 +391,37 @@ class Room(models.Model):
         )
         self.average_rating = round(result['avg_rating'] or 0, 1)
         self.total_reviews = result['count'] or 0
-        self.save(update_fields=['average_rating', 'total_reviews'])
+        # updated_at ikut disimpan agar ETag /api/rooms/ berubah
+        self.save(update_fields=['average_rating', 'total_reviews', 'updated_at'])
 
 
-class Booking(models.Model):
+def sweep_conflicts(intervals, bookings):
+    """
+    Cocokkan interval [(mulai, selesai)] dengan booking di satu ruangan
+    (urut tanggal_mulai) tanpa query. Interval diproses urut mulai; booking
+    yang sudah selesai dibuang dari heap aktif. Return {index interval:
+    booking bentrok paling awal}.
+    """
+    import heapq
+    
+    conflicts = {}
+    active = []  # heap (tanggal_selesai, urutan, booking)
+    next_booking = 0
+    for index in sorted(range(len(intervals)), key=lambda i: intervals[i][0]):
+        start, end = intervals[index]
+        while next_booking < len(bookings) and bookings[next_booking].tanggal_mulai < end:
+            booking = bookings[next_booking]
+            heapq.heappush(active, (booking.tanggal_selesai, next_booking, booking))
+            next_booking += 1
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        overlapping = [booking for _, _, booking in active if booking.tanggal_mulai < end]
+        if overlapping:
+            conflicts[index] = min(overlapping, key=lambda b: (b.tanggal_mulai, b.pk))
+    return conflicts
+
+
+class Booking(DirtyFieldsMixin, models.Model):
     """Model untuk Peminjaman Ruangan"""
     
     class Status(models.TextChoices):
@@ -277,6 +465,15 @@ class Booking(models.Model):
         verbose_name='Dokumen Pendukung',
         help_text='Upload dokumen pendukung (hanya PDF)'
     )
+    uploads = GenericRelation('FileUpload')
+    series = models.ForeignKey(
+        'BookingSeries',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='bookings',
+        verbose_name='Peminjaman Berulang'
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -285,6 +482,21 @@ class Booking(models.Model):
         verbose_name = 'Peminjaman'
         verbose_name_plural = 'Peminjaman'
         ordering = ['-created_at']
+        indexes = [
+            # Conflict check, calendar & booked-slots: room + status + time range
+            models.Index(
+                fields=['room', 'status', 'tanggal_mulai', 'tanggal_selesai'],
+                name='booking_room_status_time_idx',
+            ),
+            # Dashboard user: booking milik user, terbaru duluan
+            models.Index(fields=['user', '-created_at'], name='booking_user_created_idx'),
+            # Antrian admin & badge: hanya booking Pending (partial index)
+            models.Index(
+                fields=['-created_at'],
+                condition=models.Q(status='Pending'),
+                name='booking_pending_created_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"Booking {self.room.nomor_ruangan} by {self.user.username} - {self.get_status_display()}"
@@ -295,20 +507,35 @@ class Booking(models.Model):
         Check if proposed booking conflicts with existing approved OR pending bookings.
         Returns conflicting booking if found, None otherwise.
         """
-        from django.db.models import Q
-        
         # Check for conflicts with APPROVED or PENDING bookings
         conflicts = cls.objects.filter(
             room=room,
+            status__in=[cls.Status.APPROVED, cls.Status.PENDING],
             tanggal_mulai__lt=end_time,
             tanggal_selesai__gt=start_time
-        ).filter(
-            Q(status=cls.Status.APPROVED) | Q(status=cls.Status.PENDING)
         )
         if exclude_booking_id:
             conflicts = conflicts.exclude(pk=exclude_booking_id)
         return conflicts.first()
     
+    @classmethod
+    def find_conflicts(cls, room, intervals):
+        """
+        check_conflict untuk banyak interval sekaligus (mis. kejadian booking berulang).
+        
+        Satu query rentang untuk seluruh interval, lalu sweep_conflicts di
+        memori. Return {index interval: booking bentrok paling awal}.
+        """
+        if not intervals:
+            return {}
+        existing = cls.objects.filter(
+            room=room,
+            status__in=[cls.Status.APPROVED, cls.Status.PENDING],
+            tanggal_mulai__lt=max(end for _, end in intervals),
+            tanggal_selesai__gt=min(start for start, _ in intervals),
+        ).only('id', 'tanggal_mulai', 'tanggal_selesai').order_by('tanggal_mulai', 'id')
+        return sweep_conflicts(intervals, list(existing))
+    
     @classmethod
     def get_approved_bookings_for_room(cls, room, year, month):
         """
@@ -338,6 +565,141 @@ class Booking(models.Model):
         ).order_by('tanggal_mulai')
 
 
+class BookingSeries(models.Model):
+    """
+    Peminjaman berulang (mis. kuliah mingguan satu semester).
+    
+    Setiap kejadian disimpan sebagai Booking biasa (Booking.series), jadi
+    approval, kalender dan conflict check tetap per kejadian. Dokumen
+    pendukung diunggah sekali untuk seluruh series.
+    """
+    
+    class Frequency(models.TextChoices):
+        WEEKLY = 'weekly', 'Setiap Minggu'
+        BIWEEKLY = 'biweekly', 'Setiap 2 Minggu'
+    
+    INTERVAL_WEEKS = {Frequency.WEEKLY: 1, Frequency.BIWEEKLY: 2}
+    
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='booking_series',
+        verbose_name='User'
+    )
+    room = models.ForeignKey(
+        Room,
+        on_delete=models.CASCADE,
+        related_name='booking_series',
+        verbose_name='Ruangan'
+    )
+    frequency = models.CharField(
+        max_length=10,
+        choices=Frequency.choices,
+        default=Frequency.WEEKLY,
+        verbose_name='Pengulangan'
+    )
+    # Jadwal kejadian pertama; kejadian berikutnya memakai jam yang sama
+    tanggal_mulai = models.DateTimeField(verbose_name='Mulai (Kejadian Pertama)')
+    tanggal_selesai = models.DateTimeField(verbose_name='Selesai (Kejadian Pertama)')
+    until = models.DateField(verbose_name='Berulang Sampai')
+    exceptions = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name='Tanggal Dikecualikan',
+        help_text='Daftar tanggal (YYYY-MM-DD) yang dilewati, mis. libur'
+    )
+    jumlah_tamu = models.PositiveIntegerField(default=1, verbose_name='Jumlah Tamu')
+    dokumen_pendukung = models.FileField(
+        upload_to='dokumen_booking/',
+        storage=get_document_storage(),
+        blank=True,
+        null=True,
+        verbose_name='Dokumen Pendukung'
+    )
+    uploads = GenericRelation('FileUpload')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Peminjaman Berulang'
+        verbose_name_plural = 'Peminjaman Berulang'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.room.nomor_ruangan} {self.get_frequency_display().lower()} s/d {self.until:%d %b %Y}"
+    
+    def occurrences(self):
+        """[(mulai, selesai)] setiap kejadian sampai `until`, tanpa tanggal pengecualian"""
+        from datetime import datetime, timedelta
+        from django.utils import timezone
+        
+        first = timezone.localtime(self.tanggal_mulai)
+        duration = self.tanggal_selesai - self.tanggal_mulai
+        step = timedelta(weeks=self.INTERVAL_WEEKS[self.frequency])
+        skipped = set(self.exceptions or ())
+        
+        result = []
+        day = first.date()
+        while day <= self.until:
+            if day.isoformat() not in skipped:
+                # Jam dinding yang sama setiap kejadian (aman jika zona waktu punya DST)
+                start = timezone.make_aware(datetime.combine(day, first.time().replace(tzinfo=None)))
+                result.append((start, start + duration))
+            day += step
+        return result
+    
+    def create_bookings(self, skip_conflicts=False):
+        """
+        Simpan series dan semua kejadiannya (status Pending) dalam satu transaksi.
+        
+        Semua kejadian dicek sekaligus (Booking.find_conflicts). Return
+        (booking yang dibuat, [(mulai, selesai, booking bentrok)]). Jika ada
+        bentrok dan skip_conflicts=False tidak ada yang disimpan; jika True,
+        kejadian yang bentrok dilewati.
+        
+        bulk_create tidak memicu signals, jadi activity log, badge Pending
+        dan counter user diperbarui di sini (sekali per series).
+        """
+        from django.db import transaction
+        from . import counters
+        from .activity_log import record
+        from .admin_views import invalidate_pending_booking_count
+        
+        with transaction.atomic():
+            # Serialisasi pengajuan untuk ruangan yang sama sampai commit (no-op di SQLite)
+            Room.objects.select_for_update().only('pk').get(pk=self.room_id)
+            occurrences = self.occurrences()
+            conflicts = Booking.find_conflicts(self.room, occurrences)
+            report = [(*occurrences[i], booking) for i, booking in sorted(conflicts.items())]
+            if (conflicts and not skip_conflicts) or len(conflicts) == len(occurrences):
+                return [], report
+            
+            self.save()
+            bookings = Booking.objects.bulk_create([
+                Booking(
+                    user_id=self.user_id,
+                    room_id=self.room_id,
+                    series=self,
+                    tanggal_mulai=start,
+                    tanggal_selesai=end,
+                    jumlah_tamu=self.jumlah_tamu,
+                    status=Booking.Status.PENDING,
+                )
+                for i, (start, end) in enumerate(occurrences) if i not in conflicts
+            ])
+            
+            counters.adjust(self.user_id, 'pending_bookings', len(bookings))
+            invalidate_pending_booking_count()
+            record(
+                action='create',
+                model_name='BookingSeries',
+                object_id=self.pk,
+                object_repr=str(self),
+                changes={'bookings': len(bookings), 'skipped': [start.date().isoformat() for start, _, _ in report]},
+            )
+        return bookings, report
+
+
 class Wishlist(models.Model):
     """Model untuk Wishlist/Favorit Ruangan"""
     
@@ -365,6 +727,13 @@ class Wishlist(models.Model):
         return f"{self.user.username} - {self.room.nomor_ruangan}"
 
 
+IMAGE_EXTENSIONS = ('jpg', 'jpeg', 'png', 'gif', 'webp')
+
+
+def is_image_name(name):
+    return name.lower().rsplit('.', 1)[-1] in IMAGE_EXTENSIONS
+
+
 class Message(models.Model):
     """Model untuk Pesan dua arah antara User dan Admin"""
     
@@ -404,7 +773,8 @@ class Message(models.Model):
         verbose_name='Lampiran',
         help_text='File lampiran (gambar, dokumen, dll)'
     )
-    is_read = models.BooleanField(default=False, verbose_name='Sudah Dibaca')
+    uploads = GenericRelation('FileUpload')
+    # Status dibaca tidak disimpan per pesan; lihat ConversationReadState
     
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -412,6 +782,12 @@ class Message(models.Model):
         verbose_name = 'Pesan'
         verbose_name_plural = 'Pesan'
         ordering = ['created_at']  # Oldest first for chat display
+        indexes = [
+            # Unread badge: pesan dengan id > watermark per receiver
+            models.Index(fields=['receiver', 'id'], name='message_receiver_id_idx'),
+            # Conversation history & polling
+            models.Index(fields=['sender', 'receiver', 'created_at'], name='message_conversation_idx'),
+        ]
     
     def __str__(self):
         return f"Dari {self.sender.username} ke {self.receiver.username}: {self.content[:30]}"
@@ -420,8 +796,7 @@ class Message(models.Model):
     def is_image(self):
         """Check if attachment is an image"""
         if self.attachment:
-            ext = self.attachment.name.lower().split('.')[-1]
-            return ext in ['jpg', 'jpeg', 'png', 'gif', 'webp']
+            return is_image_name(self.attachment.name)
         return False
     
     @property
@@ -430,6 +805,11 @@ class Message(models.Model):
         if self.attachment:
             return self.attachment.name.split('/')[-1]
         return None
+    
+    @property
+    def attachment_url(self):
+        """URL lampiran (di-memo, lihat core.storage_urls)"""
+        return file_url(self.attachment)
 
 
 class PinnedConversation(models.Model):
@@ -458,6 +838,96 @@ class PinnedConversation(models.Model):
         return f"{self.admin.username} pinned {self.user.username}"
 
 
+class ConversationReadState(models.Model):
+    """
+    Watermark baca percakapan user <-> admin.
+
+    Satu percakapan per user (non-admin), dibaca dari dua sisi: user dan tim
+    admin (bersama, seperti sebelumnya: dibuka satu admin = terbaca semua admin).
+    Pesan masuk dengan id <= last_read_message_id dianggap sudah dibaca, jadi
+    menandai terbaca cukup satu UPDATE bersyarat, bukan update per pesan.
+    Baris kedua sisi dibuat saat pesan pertama percakapan (signal).
+    """
+    
+    class Side(models.TextChoices):
+        USER = 'user', 'User'
+        ADMIN = 'admin', 'Admin'
+    
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='conversation_read_states',
+        verbose_name='User'
+    )
+    side = models.CharField(max_length=10, choices=Side.choices, verbose_name='Sisi')
+    last_read_message_id = models.PositiveBigIntegerField(default=0, verbose_name='Pesan Terakhir Dibaca')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Status Baca Percakapan'
+        verbose_name_plural = 'Status Baca Percakapan'
+        unique_together = ('user', 'side')
+    
+    def __str__(self):
+        return f"{self.user.username} ({self.side}): {self.last_read_message_id}"
+    
+    @classmethod
+    def watermarks(cls, user_id):
+        """{sisi: last_read_message_id} untuk percakapan user (default 0)"""
+        found = dict(cls.objects.filter(user_id=user_id).values_list('side', 'last_read_message_id'))
+        return {side: found.get(side, 0) for side in cls.Side.values}
+    
+    @classmethod
+    def ensure(cls, user_id):
+        """Buat baris kedua sisi jika belum ada (satu INSERT, konflik diabaikan)"""
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, side=side) for side in cls.Side.values],
+            ignore_conflicts=True,
+        )
+    
+    @classmethod
+    def mark_read(cls, user_id, side, message_id):
+        """Majukan watermark ke message_id; return True jika berubah"""
+        from django.utils import timezone
+        
+        if not message_id:
+            return False
+        # Tidak menulis apa pun jika watermark sudah >= message_id
+        return cls.objects.filter(
+            user_id=user_id, side=side, last_read_message_id__lt=message_id,
+        ).update(last_read_message_id=message_id, updated_at=timezone.now()) > 0
+    
+    @classmethod
+    def admin_watermark(cls, user_ref='sender'):
+        """Subquery watermark sisi admin untuk percakapan `user_ref` (OuterRef), default 0"""
+        from django.db.models.functions import Coalesce
+        
+        return Coalesce(models.Subquery(
+            cls.objects.filter(user=models.OuterRef(user_ref), side=cls.Side.ADMIN)
+            .values('last_read_message_id')[:1]
+        ), 0)
+    
+    @classmethod
+    def unread_count(cls, receiver_id, is_admin=False):
+        """Jumlah pesan masuk yang belum dibaca oleh receiver"""
+        received = Message.objects.filter(receiver_id=receiver_id)
+        if is_admin:
+            # Watermark tergantung percakapan (pengirim) masing-masing pesan
+            received = received.filter(id__gt=cls.admin_watermark('sender'))
+        else:
+            received = received.filter(id__gt=cls.watermarks(receiver_id)[cls.Side.USER])
+        return received.count()
+    
+    @classmethod
+    def annotate_is_read(cls, messages, user_id):
+        """Set msg.is_read untuk pesan di percakapan user (dilihat dari penerimanya)"""
+        watermarks = cls.watermarks(user_id)
+        for msg in messages:
+            side = cls.Side.USER if msg.receiver_id == user_id else cls.Side.ADMIN
+            msg.is_read = msg.id <= watermarks[side]
+        return messages
+
+
 class Testimonial(models.Model):
     """Model untuk Testimoni yang tampil di Homepage"""
     
@@ -505,6 +975,10 @@ class Testimonial(models.Model):
     def __str__(self):
         return f"{self.nama} - {self.role}"
     
+    @property
+    def get_foto_url(self):
+        return file_url(self.foto)
+    
     def save(self, *args, **kwargs):
         # Ensure rating is between 1 and 5
         if self.rating < 1:
@@ -589,6 +1063,9 @@ class ActivityLog(models.Model):
         verbose_name = 'Activity Log'
         verbose_name_plural = 'Activity Logs'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='activitylog_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user} - {self.get_action_display()} {self.model_name} ({self.object_repr})"
@@ -677,6 +1154,14 @@ class RoomComment(models.Model):
         verbose_name_plural = 'Komentar Ruangan'
         ordering = ['-created_at']
         unique_together = ['user', 'room']  # 1 user hanya bisa 1 komentar per ruangan
+        indexes = [
+            # Komentar approved per ruangan, terbaru duluan (partial index)
+            models.Index(
+                fields=['room', '-created_at'],
+                condition=models.Q(is_approved=True),
+                name='roomcomment_approved_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.room.nomor_ruangan} ({self.rating}⭐)"
@@ -729,3 +1214,67 @@ class RoomReport(models.Model):
     def __str__(self):
         user_name = self.user.get_full_name() if self.user else 'Anonim'
         return f"Laporan {self.room.nomor_ruangan} oleh {user_name}"
+
+
+class FileUpload(models.Model):
+    """
+    File yang di-upload ke Booking/Message dan diproses di background (lihat core.uploads).
+    
+    Dengan DEFERRED_UPLOADS, file di-stage di disk lokal saat request, record
+    langsung disimpan dengan field file kosong, lalu worker meng-upload ke
+    storage field tersebut dan mengisi field-nya. Worker juga memeriksa isi
+    file (core.documents) dan menyimpan hasilnya di sini: tipe terdeteksi,
+    jumlah halaman, dan preview kecil untuk admin.
+    """
+    
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Menunggu'
+        DONE = 'done', 'Selesai'
+        FAILED = 'failed', 'Gagal'
+        REJECTED = 'rejected', 'Ditolak'
+    
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+    field_name = models.CharField(max_length=50)
+    
+    staged_name = models.CharField(max_length=255, blank=True, verbose_name='File Staging')  # Kosong: sudah di storage
+    original_name = models.CharField(max_length=255, verbose_name='Nama File')
+    size = models.PositiveBigIntegerField(default=0, verbose_name='Ukuran (byte)')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING, verbose_name='Status')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    
+    # Hasil pemeriksaan isi file (core.documents)
+    detected_type = models.CharField(max_length=10, blank=True, verbose_name='Tipe Terdeteksi')
+    page_count = models.PositiveIntegerField(null=True, blank=True, verbose_name='Jumlah Halaman')
+    preview = models.ImageField(upload_to='upload_previews/', blank=True, verbose_name='Preview')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Upload File'
+        verbose_name_plural = 'Upload File'
+        indexes = [
+            models.Index(fields=['content_type', 'object_id'], name='fileupload_object_idx'),
+            # Sweep upload yang belum selesai (restart worker, storage error)
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(status='pending'),
+                name='fileupload_pending_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.original_name} ({self.get_status_display()})"
+    
+    @property
+    def is_pending(self):
+        return self.status == self.Status.PENDING
+    
+    @property
+    def preview_url(self):
+        from .storage_urls import file_url
+        return file_url(self.preview)
@@ -0,0 +1,117 @@
+"""
+Pagination helpers for SmartSpace UPY
+
+- Keyset (cursor) pagination untuk API: halaman diambil dengan
+  WHERE (created_at, id) < cursor + LIMIT, bukan OFFSET, sehingga biaya query
+  dan ukuran payload tetap konstan berapa pun panjang riwayat user. Cursor
+  adalah string opaque (base64) berisi created_at & id item terakhir.
+- EstimatedCountPaginator untuk changelist admin: di PostgreSQL, tabel besar
+  memakai estimasi planner alih-alih COUNT(*) exact.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(obj):
+    raw = f'{obj.created_at.isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """Return (created_at, id); raise ValueError untuk cursor yang tidak valid"""
+    padded = value + '=' * (-len(value) % 4)
+    try:
+        created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f'Invalid cursor: {e}')
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        limit = int(request.GET.get('limit', default))
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, maximum))
+
+
+def keyset_page(queryset, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Ambil satu halaman, terbaru duluan, sebelum `cursor`.
+
+    Return (items, next_cursor); next_cursor None jika tidak ada halaman lagi.
+    Raise ValueError jika cursor tidak valid.
+    """
+    queryset = queryset.order_by('-created_at', '-pk')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+        )
+
+    # Ambil satu baris ekstra untuk tahu apakah masih ada halaman berikutnya
+    items = list(queryset[:limit + 1])
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = encode_cursor(items[-1]) if has_more else None
+    return items, next_cursor
+
+
+# ============================================
+# ESTIMATED COUNT (admin changelist)
+# ============================================
+def estimate_count(queryset):
+    """
+    Estimasi jumlah baris dari planner PostgreSQL.
+
+    Tanpa filter: pg_class.reltuples (statistik ANALYZE). Dengan filter:
+    "Plan Rows" dari EXPLAIN. Return None jika estimasi tidak tersedia.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    if not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples = -1 jika tabel belum pernah di-ANALYZE
+        return row[0] if row and row[0] >= 0 else None
+
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator admin yang tidak menjalankan COUNT(*) exact untuk tabel besar.
+
+    Jika estimasi planner di atas ADMIN_ESTIMATED_COUNT_THRESHOLD, jumlah
+    baris (dan jumlah halaman) memakai estimasi; di bawahnya, atau di
+    database selain PostgreSQL, tetap COUNT(*) biasa.
+    """
+
+    @cached_property
+    def count(self):
+        threshold = getattr(settings, 'ADMIN_ESTIMATED_COUNT_THRESHOLD', 10000)
+        try:
+            estimate = estimate_count(self.object_list)
+        except Exception:
+            estimate = None
+        if estimate is not None and estimate >= threshold:
+            return estimate
+        return super().count
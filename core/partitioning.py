@@ -0,0 +1,173 @@
+"""
+Monthly range partitioning for ActivityLog (PostgreSQL only, opt-in)
+
+Tabel core_activitylog dapat dikonversi menjadi tabel partisi
+`PARTITION BY RANGE (created_at)` dengan satu partisi per bulan
+(core_activitylog_pYYYYMM) plus partisi default. Changelist admin yang
+memfilter/mengurutkan created_at hanya menyentuh partisi terbaru, dan
+retensi cukup men-DROP partisi lama alih-alih DELETE jutaan baris.
+
+Catatan: di level database primary key menjadi (id, created_at) karena
+PostgreSQL mewajibkan partition key ada di setiap unique constraint.
+Nilai id tetap unik karena diambil dari satu sequence.
+
+Usage: lihat `python manage.py partition_activity_logs --help`.
+"""
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+
+TABLE = 'core_activitylog'
+SEQUENCE = f'{TABLE}_partitioned_id_seq'
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITION_RE = re.compile(rf'^{TABLE}_p(\d{{4}})(\d{{2}})$')
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(value, months):
+    month_index = value.year * 12 + value.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month.year:04d}{month.month:02d}'
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned():
+    """True jika core_activitylog sudah berupa tabel partisi"""
+    if not is_supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+            """,
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """Return [(nama_partisi, awal_bulan)] untuk partisi bulanan, urut dari yang terlama"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits i
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            JOIN pg_class child ON child.oid = i.inhrelid
+            WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)
+            """,
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = PARTITION_RE.match(name)
+        if match:
+            month = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=dt_timezone.utc)
+            partitions.append((name, month))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def create_partition(cursor, month):
+    name = partition_name(month)
+    # DDL tidak menerima parameter bind, batas partisi ditulis sebagai literal
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{TABLE}" '
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}+00') TO ('{add_months(month, 1):%Y-%m-%d}+00')"
+    )
+    return name
+
+
+def ensure_partitions(months_ahead=3, now=None):
+    """Buat partisi bulan ini s/d `months_ahead` bulan ke depan (idempotent)"""
+    current = month_start(now or datetime.now(dt_timezone.utc))
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            created.append(create_partition(cursor, add_months(current, offset)))
+    return created
+
+
+def drop_partitions_before(cutoff):
+    """DETACH + DROP partisi yang seluruh isinya lebih tua dari cutoff"""
+    dropped = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for name, month in list_partitions():
+            if add_months(month, 1) > cutoff:
+                continue
+            cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+            cursor.execute(f'DROP TABLE "{name}"')
+            dropped.append(name)
+    return dropped
+
+
+def convert_to_partitioned(months_ahead=3):
+    """
+    Konversi core_activitylog menjadi tabel partisi bulanan.
+
+    Berjalan dalam satu transaksi dengan ACCESS EXCLUSIVE lock; data lama
+    disalin ke partisi yang sesuai lalu tabel lama di-drop. Jalankan saat
+    traffic rendah karena durasinya sebanding dengan jumlah baris.
+    """
+    legacy = f'{TABLE}_legacy'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE "{TABLE}" IN ACCESS EXCLUSIVE MODE')
+
+        # Simpan definisi index (selain primary key) untuk dibuat ulang di tabel partisi
+        cursor.execute(
+            """
+            SELECT indexdef FROM pg_indexes
+            WHERE tablename = %s AND indexname NOT IN (
+                SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'
+            )
+            """,
+            [TABLE, TABLE],
+        )
+        index_defs = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f'SELECT MIN(created_at), COALESCE(MAX(id), 0) FROM "{TABLE}"')
+        oldest, max_id = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{legacy}"')
+        cursor.execute(
+            f'CREATE TABLE "{TABLE}" (LIKE "{legacy}" INCLUDING DEFAULTS, '
+            f'PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at)'
+        )
+        # Identity column belum didukung di tabel partisi (< PG 17), pakai sequence biasa
+        cursor.execute(f'CREATE SEQUENCE "{SEQUENCE}" OWNED BY "{TABLE}".id')
+        cursor.execute('SELECT setval(%s, %s, false)', [SEQUENCE, max_id + 1])
+        cursor.execute(f'ALTER TABLE "{TABLE}" ALTER COLUMN id SET DEFAULT nextval(\'"{SEQUENCE}"\')')
+        cursor.execute(
+            f'ALTER TABLE "{TABLE}" ADD FOREIGN KEY (user_id) REFERENCES "core_user" (id) '
+            f'DEFERRABLE INITIALLY DEFERRED'
+        )
+
+        cursor.execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT')
+        current = month_start(datetime.now(dt_timezone.utc))
+        month = month_start(oldest) if oldest else current
+        while month <= add_months(current, months_ahead):
+            create_partition(cursor, month)
+            month = add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{legacy}"')
+        cursor.execute(f'DROP TABLE "{legacy}" CASCADE')
+
+        # Index dibuat di parent, PostgreSQL meneruskannya ke setiap partisi
+        for index_def in index_defs:
+            cursor.execute(re.sub(
+                rf'\bON (ONLY )?(\S+\.)?"?{TABLE}"? ',
+                f'ON "{TABLE}" ',
+                index_def,
+            ))
@@ -0,0 +1,93 @@
+"""
+Request profiling helpers for SmartSpace UPY
+
+Dipakai oleh core.middleware.RequestProfilingMiddleware untuk mengumpulkan
+waktu DB, render template, dan panggilan API eksternal (Gemini, Brevo)
+per request. Di luar request yang diprofiling semua helper ini no-op.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_current_stats = ContextVar('request_profile_stats', default=None)
+
+
+class RequestStats:
+    """Kumpulan metrik untuk satu request"""
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.external = {}  # service -> {'calls': n, 'time': seconds}
+        self._template_depth = 0
+
+    def add_external(self, service, elapsed):
+        entry = self.external.setdefault(service, {'calls': 0, 'time': 0.0})
+        entry['calls'] += 1
+        entry['time'] += elapsed
+
+
+def start_request():
+    stats = RequestStats()
+    token = _current_stats.set(stats)
+    return stats, token
+
+
+def end_request(token):
+    _current_stats.reset(token)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper: hitung jumlah & durasi query"""
+    stats = _current_stats.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if stats is not None:
+            stats.db_queries += 1
+            stats.db_time += time.perf_counter() - start
+
+
+@contextmanager
+def track_external(service):
+    """Catat durasi panggilan API eksternal, contoh: with track_external('gemini'): ..."""
+    stats = _current_stats.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.add_external(service, time.perf_counter() - start)
+
+
+_template_patched = False
+
+
+def patch_template_render():
+    """Bungkus Template.render agar waktu render (template terluar saja) tercatat"""
+    global _template_patched
+    if _template_patched:
+        return
+    from django.template.base import Template
+
+    original_render = Template.render
+
+    def render(self, context):
+        stats = _current_stats.get()
+        if stats is None:
+            return original_render(self, context)
+        # Include/extends memanggil render lagi; hanya hitung yang terluar
+        stats._template_depth += 1
+        start = time.perf_counter()
+        try:
+            return original_render(self, context)
+        finally:
+            stats._template_depth -= 1
+            if stats._template_depth == 0:
+                stats.template_time += time.perf_counter() - start
+
+    Template.render = render
+    _template_patched = True
@@ -0,0 +1,362 @@
+"""
+Bulk schedule import for SmartSpace UPY
+
+Jadwal kuliah satu semester (ratusan booking) dimuat dari CSV/XLSX lewat
+command `import_schedule` atau halaman admin Import Jadwal. Kolom (baris
+pertama, urutan bebas):
+
+    ruangan, npm_nip, tanggal, jam_mulai, jam_selesai[, jumlah_tamu, keperluan]
+
+Alur:
+
+1. Baris dibaca bertahap (csv.reader / openpyxl read_only) dan
+   di-parse menjadi kandidat booking.
+2. Ruangan & user di-resolve lewat dict cache: satu query untuk semua
+   ruangan, user per SCHEDULE_IMPORT_BATCH_SIZE NPM/NIP.
+3. Bentrok dicek dengan sort-and-sweep: antar baris di file (per ruangan,
+   urut jam mulai) dan terhadap booking Approved/Pending di database (satu
+   query rentang untuk semua ruangan, lalu models.sweep_conflicts).
+4. Baris valid di-bulk_create per batch dalam satu transaksi; baris yang
+   gagal dikumpulkan sebagai laporan error (CSV/XLSX).
+"""
+import csv
+import io
+import os
+from collections import defaultdict
+from datetime import date, datetime, time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+COLUMNS = ('ruangan', 'npm_nip', 'tanggal', 'jam_mulai', 'jam_selesai', 'jumlah_tamu', 'keperluan')
+REQUIRED_COLUMNS = COLUMNS[:5]
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+TIME_FORMATS = ('%H:%M', '%H:%M:%S')
+
+
+class ScheduleImportError(Exception):
+    """File tidak bisa dibaca sama sekali (format, header)"""
+
+
+class ScheduleImportResult:
+    """Ringkasan import: jumlah baris, booking dibuat, dan baris error"""
+
+    def __init__(self):
+        self.total = 0
+        self.valid = 0
+        self.created = 0
+        self.errors = []  # (nomor baris, {kolom: nilai asli}, pesan)
+
+    def add_error(self, row_number, values, message):
+        self.errors.append((row_number, values, message))
+
+
+# ============================================
+# READING
+# ============================================
+def _normalize_header(value):
+    return str(value or '').strip().lower().replace(' ', '_')
+
+
+def _check_header(header):
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ScheduleImportError(f'Kolom wajib tidak ada: {", ".join(missing)}')
+
+
+def read_rows(fileobj, filename):
+    """Yield (nomor baris, {kolom: nilai}) dari CSV atau XLSX tanpa memuat seluruh file"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+        try:
+            reader = csv.reader(text)
+            header = [_normalize_header(h) for h in next(reader, [])]
+            _check_header(header)
+            for row_number, row in enumerate(reader, start=2):
+                if any(cell.strip() for cell in row):
+                    yield row_number, dict(zip(header, row))
+        except UnicodeDecodeError:
+            # Excel sering mengekspor CSV sebagai cp1252
+            raise ScheduleImportError('File CSV harus UTF-8 (di Excel: Save As "CSV UTF-8")')
+        except csv.Error as e:
+            raise ScheduleImportError(f'File CSV tidak valid: {e}')
+        finally:
+            text.detach()  # Jangan tutup file upload milik pemanggil
+    elif extension == '.xlsx':
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+        from zipfile import BadZipFile
+
+        try:
+            workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        except (InvalidFileException, BadZipFile) as e:
+            raise ScheduleImportError(f'File XLSX tidak valid: {e}')
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [_normalize_header(h) for h in next(rows, ())]
+            _check_header(header)
+            for row_number, row in enumerate(rows, start=2):
+                if any(cell not in (None, '') for cell in row):
+                    yield row_number, dict(zip(header, row))
+        finally:
+            workbook.close()
+    else:
+        raise ScheduleImportError('Format file harus CSV atau XLSX')
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f'Tanggal tidak valid: {value!r}')
+
+
+def _parse_time(value):
+    if isinstance(value, datetime):
+        return value.time()
+    if isinstance(value, time):
+        return value
+    text = str(value or '').strip().replace('.', ':')
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).time()
+        except ValueError:
+            continue
+    raise ValueError(f'Jam tidak valid: {value!r}')
+
+
+def _text(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # NPM/NIP numerik dari Excel
+    return str(value if value is not None else '').strip()
+
+
+def _parse_row(values):
+    """Return dict kandidat booking dari satu baris; raise ValueError jika tidak valid"""
+    missing = [column for column in REQUIRED_COLUMNS if not _text(values.get(column))]
+    if missing:
+        raise ValueError(f'Kolom kosong: {", ".join(missing)}')
+    day = _parse_date(values['tanggal'])
+    start = timezone.make_aware(datetime.combine(day, _parse_time(values['jam_mulai'])))
+    end = timezone.make_aware(datetime.combine(day, _parse_time(values['jam_selesai'])))
+    if end <= start:
+        raise ValueError('Jam selesai harus setelah jam mulai')
+    jumlah_tamu = _text(values.get('jumlah_tamu')) or '1'
+    try:
+        jumlah_tamu = int(float(jumlah_tamu))
+    except ValueError:
+        raise ValueError(f'Jumlah tamu tidak valid: {jumlah_tamu!r}')
+    if jumlah_tamu < 1:
+        raise ValueError('Jumlah tamu minimal 1')
+    return {
+        'ruangan': _text(values['ruangan']),
+        'npm_nip': _text(values['npm_nip']),
+        'start': start,
+        'end': end,
+        'jumlah_tamu': jumlah_tamu,
+        'keperluan': _text(values.get('keperluan')),
+    }
+
+
+# ============================================
+# LOOKUPS
+# ============================================
+def _resolve_rooms(names):
+    """{nama ruangan (lowercase): Room} untuk semua ruangan di file; satu query"""
+    from .models import Room
+
+    wanted = {name.lower() for name in names}
+    rooms = Room.objects.only('id', 'nomor_ruangan', 'kapasitas', 'is_active')
+    return {room.nomor_ruangan.lower(): room for room in rooms if room.nomor_ruangan.lower() in wanted}
+
+
+def _resolve_users(npm_nips):
+    """{npm_nip: user_id}; satu query per SCHEDULE_IMPORT_BATCH_SIZE"""
+    from .models import User
+
+    npm_nips = sorted(set(npm_nips))
+    batch_size = settings.SCHEDULE_IMPORT_BATCH_SIZE
+    users = {}
+    for i in range(0, len(npm_nips), batch_size):
+        users.update(
+            User.objects.filter(npm_nip__in=npm_nips[i:i + batch_size]).values_list('npm_nip', 'id')
+        )
+    return users
+
+
+# ============================================
+# IMPORT
+# ============================================
+def _find_overlaps(candidates):
+    """
+    Sort-and-sweep per ruangan. Return {index kandidat: pesan error}.
+
+    Antar baris: kandidat yang diterima dalam satu ruangan tidak saling
+    tumpang tindih, jadi cukup dibandingkan dengan kandidat diterima
+    terakhir. Database: satu query rentang untuk semua ruangan.
+    """
+    from .models import Booking, sweep_conflicts
+
+    errors = {}
+    by_room = defaultdict(list)
+    for index, candidate in enumerate(candidates):
+        by_room[candidate['room'].pk].append(index)
+
+    for indexes in by_room.values():
+        indexes.sort(key=lambda i: (candidates[i]['start'], candidates[i]['row_number']))
+        previous = None
+        for index in indexes:
+            if previous is not None and candidates[index]['start'] < candidates[previous]['end']:
+                errors[index] = f'Bentrok dengan baris {candidates[previous]["row_number"]} di file'
+            else:
+                previous = index
+
+    remaining = [i for i in range(len(candidates)) if i not in errors]
+    if not remaining:
+        return errors
+    existing = defaultdict(list)
+    for booking in Booking.objects.filter(
+        room_id__in=by_room,
+        status__in=[Booking.Status.APPROVED, Booking.Status.PENDING],
+        tanggal_mulai__lt=max(candidates[i]['end'] for i in remaining),
+        tanggal_selesai__gt=min(candidates[i]['start'] for i in remaining),
+    ).only('id', 'room_id', 'tanggal_mulai', 'tanggal_selesai').order_by('tanggal_mulai', 'id'):
+        existing[booking.room_id].append(booking)
+
+    for room_id, indexes in by_room.items():
+        indexes = [i for i in indexes if i not in errors]
+        intervals = [(candidates[i]['start'], candidates[i]['end']) for i in indexes]
+        for position, booking in sweep_conflicts(intervals, existing[room_id]).items():
+            local_start = timezone.localtime(booking.tanggal_mulai)
+            local_end = timezone.localtime(booking.tanggal_selesai)
+            errors[indexes[position]] = (
+                f'Bentrok dengan booking #{booking.pk} '
+                f'({local_start:%d %b %Y %H:%M}-{local_end:%H:%M})'
+            )
+    return errors
+
+
+def import_schedule(fileobj, filename, status='Approved', dry_run=False, acting_user=None):
+    """
+    Import jadwal dari CSV/XLSX. Return ScheduleImportResult.
+
+    Raise ScheduleImportError jika file tidak bisa dibaca. Dengan dry_run hanya
+    validasi; tidak ada yang disimpan.
+    """
+    from . import counters
+    from .activity_log import record
+    from .admin_views import invalidate_pending_booking_count
+    from .models import Booking, Room
+
+    result = ScheduleImportResult()
+    parsed = []  # (nomor baris, nilai asli, kandidat)
+    for row_number, values in read_rows(fileobj, filename):
+        result.total += 1
+        try:
+            parsed.append((row_number, values, _parse_row(values)))
+        except ValueError as e:
+            result.add_error(row_number, values, str(e))
+
+    rooms = _resolve_rooms(candidate['ruangan'] for _, _, candidate in parsed)
+    users = _resolve_users(candidate['npm_nip'] for _, _, candidate in parsed)
+    candidates = []
+    for row_number, values, candidate in parsed:
+        room = rooms.get(candidate['ruangan'].lower())
+        if room is None:
+            result.add_error(row_number, values, f'Ruangan tidak ditemukan: {candidate["ruangan"]}')
+        elif not room.is_active:
+            result.add_error(row_number, values, f'Ruangan tidak aktif: {room.nomor_ruangan}')
+        elif candidate['npm_nip'] not in users:
+            result.add_error(row_number, values, f'User dengan NPM/NIP {candidate["npm_nip"]} tidak ditemukan')
+        elif candidate['jumlah_tamu'] > room.kapasitas:
+            result.add_error(row_number, values, f'Jumlah tamu melebihi kapasitas ({room.kapasitas} orang)')
+        else:
+            candidates.append({
+                **candidate, 'room': room, 'user_id': users[candidate['npm_nip']],
+                'row_number': row_number, 'values': values,
+            })
+
+    with transaction.atomic():
+        if not dry_run:
+            # Sama seperti BookingSeries.create_bookings: kunci ruangan yang terdampak (urut pk
+            # agar tidak deadlock) supaya booking lain tidak masuk di antara cek bentrok & insert
+            room_ids = sorted({candidate['room'].pk for candidate in candidates})
+            list(Room.objects.select_for_update().filter(pk__in=room_ids).order_by('pk').values_list('pk', flat=True))
+        overlaps = _find_overlaps(candidates)
+        for index, message in overlaps.items():
+            result.add_error(candidates[index]['row_number'], candidates[index]['values'], message)
+        valid = [candidate for index, candidate in enumerate(candidates) if index not in overlaps]
+        result.errors.sort(key=lambda error: error[0])
+        result.valid = len(valid)
+        if dry_run or not valid:
+            return result
+
+        bookings = Booking.objects.bulk_create(
+            [
+                Booking(
+                    user_id=candidate['user_id'],
+                    room=candidate['room'],
+                    tanggal_mulai=candidate['start'],
+                    tanggal_selesai=candidate['end'],
+                    jumlah_tamu=candidate['jumlah_tamu'],
+                    keperluan=candidate['keperluan'],
+                    status=status,
+                )
+                for candidate in sorted(valid, key=lambda c: c['row_number'])
+            ],
+            batch_size=settings.SCHEDULE_IMPORT_BATCH_SIZE,
+        )
+        result.created = len(bookings)
+        # bulk_create melewati signals: badge & counter diperbarui sekali per import
+        if status == Booking.Status.PENDING:
+            counters.invalidate({candidate['user_id'] for candidate in valid}, 'pending_bookings')
+            invalidate_pending_booking_count()
+        record(
+            action='create',
+            model_name='Booking',
+            object_id=bookings[0].pk,
+            object_repr=f'Import jadwal {os.path.basename(filename)} ({result.created} booking)',
+            changes={'imported': result.created, 'errors': len(result.errors), 'status': status},
+            user=acting_user,
+        )
+    return result
+
+
+# ============================================
+# ERROR REPORT
+# ============================================
+def error_report(result, fmt='xlsx'):
+    """Laporan baris gagal (kolom asli + pesan error) sebagai bytes CSV atau XLSX"""
+    headers = ['baris', *COLUMNS, 'error']
+    rows = [
+        [row_number, *[_text(values.get(column)) for column in COLUMNS], message]
+        for row_number, values, message in result.errors
+    ]
+    if fmt == 'csv':
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(headers)
+        writer.writerows(rows)
+        return output.getvalue().encode('utf-8-sig')
+
+    from openpyxl import Workbook
+    from .export_utils import style_excel_header
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = 'Error Import'
+    style_excel_header(sheet, headers)
+    for row in rows:
+        sheet.append(row)
+    sheet.column_dimensions['I'].width = 60
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
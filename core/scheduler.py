@@ -4,9 +4,14 @@ Runs scheduled tasks automatically when Django starts
 
 Tasks:
 - Daily H-1 booking reminder at 07:00 AM
+- Daily ActivityLog retention (archive + delete) at 02:30 AM, only when
+  ACTIVITY_LOG_RETENTION_DAYS > 0 and ACTIVITY_LOG_ARCHIVE_DIR is set
+- Room photo thumbnails for external/Drive photos every ROOM_THUMBNAIL_SYNC_MINUTES
+- Retry uploads left pending every UPLOAD_RETRY_MINUTES
 """
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from django.conf import settings
 import logging
 
@@ -18,6 +23,14 @@ scheduler = None
 
 def send_daily_reminders():
     """Job function to send H-1 reminder emails"""
+    from core.metrics import SCHEDULER_JOB_DURATION, observe_duration
+    
+    with observe_duration(SCHEDULER_JOB_DURATION, job='daily_reminder'):
+        _send_daily_reminders()
+
+
+def _send_daily_reminders():
+    """Send H-1 reminders for approved bookings happening tomorrow"""
     from django.utils import timezone
     from datetime import timedelta
     from core.models import Booking
@@ -55,6 +68,43 @@ def send_daily_reminders():
     logger.info(f"Daily reminder job completed. Sent: {success_count}/{bookings.count()}")
 
 
+def run_activity_log_retention():
+    """Job function to archive & delete expired ActivityLog rows (single process, see core.locks)"""
+    from django.core.management import call_command
+    from core.metrics import SCHEDULER_JOB_DURATION, observe_duration
+    
+    with observe_duration(SCHEDULER_JOB_DURATION, job='activity_log_retention'):
+        try:
+            call_command('archive_activity_logs')
+        except Exception as e:
+            logger.error(f"Activity log retention job failed: {e}")
+
+
+def run_room_thumbnail_sync():
+    """Job function to download external/Drive room photos and build thumbnails (single process)"""
+    from core import images, locks
+    from core.metrics import SCHEDULER_JOB_DURATION, observe_duration
+    
+    with locks.single_run('room_thumbnail_sync') as acquired:
+        if not acquired:
+            return
+        with observe_duration(SCHEDULER_JOB_DURATION, job='room_thumbnail_sync'):
+            built, failed = images.sync_room_thumbnails()
+            if built or failed:
+                logger.info(f"Room thumbnail sync: {built} dibuat, {failed} gagal")
+
+
+def run_pending_upload_retry():
+    """Job function to finish uploads whose worker died or failed"""
+    from core import uploads
+    from core.metrics import SCHEDULER_JOB_DURATION, observe_duration
+    
+    with observe_duration(SCHEDULER_JOB_DURATION, job='pending_upload_retry'):
+        done, failed = uploads.retry_pending_uploads()
+        if done or failed:
+            logger.info(f"Pending upload retry: {done} selesai, {failed} gagal")
+
+
 def start_scheduler():
     """Start the background scheduler"""
     global scheduler
@@ -74,6 +124,33 @@ def start_scheduler():
         replace_existing=True
     )
     
+    if getattr(settings, 'ACTIVITY_LOG_RETENTION_DAYS', 0) > 0 and getattr(settings, 'ACTIVITY_LOG_ARCHIVE_DIR', ''):
+        scheduler.add_job(
+            run_activity_log_retention,
+            trigger=CronTrigger(hour=2, minute=30),
+            id='activity_log_retention',
+            name='Archive and delete expired activity logs',
+            replace_existing=True
+        )
+    
+    if getattr(settings, 'ROOM_THUMBNAIL_SYNC_MINUTES', 0) > 0:
+        scheduler.add_job(
+            run_room_thumbnail_sync,
+            trigger=IntervalTrigger(minutes=settings.ROOM_THUMBNAIL_SYNC_MINUTES),
+            id='room_thumbnail_sync',
+            name='Build thumbnails for external room photos',
+            replace_existing=True
+        )
+    
+    if getattr(settings, 'UPLOAD_RETRY_MINUTES', 0) > 0:
+        scheduler.add_job(
+            run_pending_upload_retry,
+            trigger=IntervalTrigger(minutes=settings.UPLOAD_RETRY_MINUTES),
+            id='pending_upload_retry',
+            name='Retry pending uploads',
+            replace_existing=True
+        )
+    
     scheduler.start()
     logger.info("✅ Background scheduler started! H-1 reminders will be sent daily at 07:00 AM")
     print("✅ Background scheduler started! H-1 reminders will be sent daily at 07:00 AM")
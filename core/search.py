@@ -0,0 +1,305 @@
+"""
+Search subsystem for SmartSpace UPY
+
+Room dan User menyimpan kolom `search_document`: teks gabungan yang sudah
+dinormalisasi (lowercase, tanpa aksen) dan diperbarui setiap save.
+Backend dipilih berdasarkan database:
+
+- PostgreSQL: index GIN pg_trgm + index GIN tsvector atas search_document.
+  Match = full-text (prefix) ATAU trigram word similarity (toleran typo),
+  diurutkan dengan ts_rank + similarity.
+- SQLite: tabel virtual FTS5 (core_search_fts) dengan bm25, nama ruangan/user
+  diberi bobot lebih tinggi. Typo ditangani dengan memperluas setiap kata
+  ke term terdekat dari kosakata index (fts5vocab + difflib).
+- Lainnya: icontains atas search_document (tanpa ranking).
+
+Semua backend mengembalikan queryset yang di-annotate `search_rank`.
+"""
+import difflib
+import re
+import unicodedata
+
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+
+
+# Field yang diindex per model: (field nama -> bobot tinggi, field isi)
+SEARCH_FIELDS = {
+    'core.room': (('nomor_ruangan',), ('tipe_ruangan', 'fasilitas', 'deskripsi')),
+    'core.user': (('first_name', 'last_name', 'username'), ('npm_nip', 'email')),
+}
+
+FTS_TABLE = 'core_search_fts'
+FTS_VOCAB_TABLE = 'core_search_fts_vocab'
+SQLITE_RESULT_LIMIT = 500
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize_text(text):
+    """Lowercase + hapus aksen: 'Ruang Séminar' -> 'ruang seminar'"""
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.lower().split())
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(normalize_text(text))
+
+
+def _field_text(obj, field_name):
+    display = getattr(obj, f'get_{field_name}_display', None)
+    value = getattr(obj, field_name, '') or ''
+    if display is not None and display() != value:
+        return f'{value} {display()}'
+    return str(value)
+
+
+def document_parts(obj):
+    """Return (nama, isi) ternormalisasi untuk instance Room/User"""
+    name_fields, body_fields = SEARCH_FIELDS[obj._meta.label_lower]
+    name = normalize_text(' '.join(_field_text(obj, f) for f in name_fields))
+    body = normalize_text(' '.join(_field_text(obj, f) for f in body_fields))
+    return name, body
+
+
+def build_document(obj):
+    return ' '.join(part for part in document_parts(obj) if part)
+
+
+# ============================================
+# BACKENDS
+# ============================================
+def _no_results(queryset):
+    return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+class SimpleBackend:
+    """Fallback: semua kata harus muncul di search_document"""
+
+    def __init__(self, using='default'):
+        self.using = using
+
+    @property
+    def connection(self):
+        # connections[...] thread-local; jangan simpan objek connection di backend yang di-cache
+        return connections[self.using]
+
+    def search(self, queryset, term):
+        for token in tokenize(term):
+            queryset = queryset.filter(search_document__icontains=token)
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    def index_instance(self, obj):
+        pass
+
+    def remove_instance(self, obj):
+        pass
+
+
+class PostgresBackend(SimpleBackend):
+    """pg_trgm (typo) + tsvector (prefix full-text), lihat migration 0021"""
+
+    def search(self, queryset, term):
+        from django.contrib.postgres.search import (
+            SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity,
+        )
+
+        tokens = tokenize(term)
+        if not tokens:
+            return _no_results(queryset)
+        normalized = ' '.join(tokens)
+        # Prefix match agar hasil muncul saat user masih mengetik: 'lab & komp:*'
+        query = SearchQuery(
+            ' & '.join(f'{token}:*' for token in tokens), config='simple', search_type='raw',
+        )
+        # Harus sama persis dengan ekspresi index core_search_tsv_idx
+        vector = SearchVector('search_document', config='simple')
+        return (
+            queryset
+            .annotate(
+                search_vector=vector,
+                search_similarity=TrigramWordSimilarity(normalized, 'search_document'),
+            )
+            .filter(Q(search_vector=query) | Q(search_document__trigram_word_similar=normalized))
+            .annotate(search_rank=SearchRank(vector, query) + F('search_similarity'))
+        )
+
+
+class SqliteFtsBackend(SimpleBackend):
+    """FTS5 + bm25; kata yang typo diperluas ke term terdekat di kosakata index"""
+
+    def _vocabulary(self, cursor, token):
+        # Kandidat hanya dari huruf awal yang sama agar kosakata yang dibaca tetap kecil
+        cursor.execute(
+            f'SELECT term FROM {FTS_VOCAB_TABLE} WHERE term >= %s AND term < %s',
+            [token[0], token[0] + '\uffff'],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def _match_expression(self, cursor, tokens):
+        groups = []
+        for token in tokens:
+            alternatives = [f'"{token}"*']
+            if len(token) >= 4:
+                close = difflib.get_close_matches(token, self._vocabulary(cursor, token), n=3, cutoff=0.75)
+                alternatives += [f'"{term}"' for term in close if term != token]
+            groups.append('(' + ' OR '.join(alternatives) + ')')
+        return ' AND '.join(groups)
+
+    def search(self, queryset, term):
+        tokens = tokenize(term)
+        if not tokens:
+            return _no_results(queryset)
+
+        with self.connection.cursor() as cursor:
+            match = self._match_expression(cursor, tokens)
+            # bm25: makin kecil makin relevan; kolom nama berbobot 10x
+            cursor.execute(
+                f'SELECT object_id, bm25({FTS_TABLE}, 0, 0, 10.0, 1.0) AS score FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND model = %s ORDER BY score LIMIT %s',
+                [match, queryset.model._meta.label_lower, SQLITE_RESULT_LIMIT],
+            )
+            scores = {int(object_id): -score for object_id, score in cursor.fetchall()}
+
+        if not scores:
+            return _no_results(queryset)
+        return queryset.filter(pk__in=scores).annotate(search_rank=Case(
+            *[When(pk=pk, then=Value(score)) for pk, score in scores.items()],
+            default=Value(0.0),
+            output_field=FloatField(),
+        ))
+
+    def index_instance(self, obj):
+        name, body = document_parts(obj)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE model = %s AND object_id = %s',
+                [obj._meta.label_lower, obj.pk],
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (model, object_id, name, body) VALUES (%s, %s, %s, %s)',
+                [obj._meta.label_lower, obj.pk, name, body],
+            )
+
+    def remove_instance(self, obj):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE model = %s AND object_id = %s',
+                [obj._meta.label_lower, obj.pk],
+            )
+
+
+def fts_table_exists(connection):
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+_backends = {}
+
+
+def get_backend(using='default'):
+    connection = connections[using]
+    if using not in _backends:
+        if connection.vendor == 'postgresql':
+            _backends[using] = PostgresBackend(using)
+        elif connection.vendor == 'sqlite' and fts_table_exists(connection):
+            _backends[using] = SqliteFtsBackend(using)
+        else:
+            return SimpleBackend(using)  # Belum dimigrasi; jangan di-cache
+    return _backends[using]
+
+
+# ============================================
+# PUBLIC API
+# ============================================
+def search(queryset, term):
+    """Filter queryset Room/User dengan `term`, annotate & urutkan `search_rank`"""
+    return get_backend(queryset.db).search(queryset, term).order_by('-search_rank', 'pk')
+
+
+def search_pks(queryset, term):
+    """Primary key hasil pencarian, untuk filter relasi (mis. booking__user__in)"""
+    return get_backend(queryset.db).search(queryset, term).order_by().values('pk')
+
+
+def index_instance(obj):
+    get_backend(obj._state.db or 'default').index_instance(obj)
+
+
+def remove_instance(obj):
+    get_backend(obj._state.db or 'default').remove_instance(obj)
+
+
+# ============================================
+# SCHEMA (dipanggil dari migration 0021 & rebuild_search_index)
+# ============================================
+def create_search_schema(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for table in ('core_room', 'core_user'):
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {table}_search_trgm_idx ON {table} '
+                    f'USING gin (search_document gin_trgm_ops)'
+                )
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {table}_search_tsv_idx ON {table} '
+                    f"USING gin (to_tsvector('simple'::regconfig, COALESCE(search_document, '')))"
+                )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+                f'model UNINDEXED, object_id UNINDEXED, name, body, '
+                f"tokenize = 'unicode61 remove_diacritics 2')"
+            )
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_VOCAB_TABLE} USING fts5vocab({FTS_TABLE}, row)'
+            )
+
+
+def drop_search_schema(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for table in ('core_room', 'core_user'):
+                cursor.execute(f'DROP INDEX IF EXISTS {table}_search_trgm_idx')
+                cursor.execute(f'DROP INDEX IF EXISTS {table}_search_tsv_idx')
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_VOCAB_TABLE}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    _backends.pop(connection.alias, None)
+
+
+def rebuild_documents(model, using='default', batch_size=1000):
+    """Hitung ulang search_document (dan isi FTS di SQLite) untuk semua baris model"""
+    connection = connections[using]
+    use_fts = connection.vendor == 'sqlite' and fts_table_exists(connection)
+    label = model._meta.label_lower
+    name_fields, body_fields = SEARCH_FIELDS[label]
+    fields = ['pk', *name_fields, *body_fields]
+
+    if use_fts:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE model = %s', [label])
+
+    total = 0
+    batch = []
+    for obj in model.objects.using(using).only(*fields[1:]).order_by('pk').iterator(chunk_size=batch_size):
+        obj.search_document = build_document(obj)
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            total += _flush_documents(model, batch, connection, use_fts)
+            batch = []
+    if batch:
+        total += _flush_documents(model, batch, connection, use_fts)
+    return total
+
+
+def _flush_documents(model, batch, connection, use_fts):
+    model.objects.using(connection.alias).bulk_update(batch, ['search_document'])
+    if use_fts:
+        label = model._meta.label_lower
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (model, object_id, name, body) VALUES (%s, %s, %s, %s)',
+                [(label, obj.pk, *document_parts(obj)) for obj in batch],
+            )
+    return len(batch)
@@ -3,52 +3,38 @@ Django Signals for Activity Logging
 
 Auto-logs create, update, delete actions for tracked models.
 """
-from django.db.models.signals import post_save, post_delete, pre_save
+import logging
+
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.admin.models import LogEntry
-from .models import Room, Booking, Testimonial, Feedback, ActivityLog
-
-
-def get_client_ip(request):
-    """Get client IP from request"""
-    if request is None:
-        return None
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
-
-
-def log_activity(user, action, model_name, object_id, object_repr, changes=None, ip_address=None):
-    """Create an activity log entry"""
-    ActivityLog.objects.create(
-        user=user,
+from .models import (
+    Room, Booking, Testimonial, Feedback, ActivityLog, User, Message, Wishlist, ConversationReadState, FileUpload,
+)
+from . import counters
+from . import search
+from .caching import bump_version
+from .activity_log import record
+
+logger = logging.getLogger(__name__)
+
+
+def log_activity(action, model_name, object_id, object_repr, changes=None, user=None, ip_address=None):
+    """
+    Queue an activity log entry.
+    Acting user & IP diambil dari request aktif (ActivityLogMiddleware) jika tidak diberikan.
+    """
+    record(
         action=action,
         model_name=model_name,
         object_id=object_id,
-        object_repr=str(object_repr)[:200],
-        changes=changes or {},
+        object_repr=object_repr,
+        changes=changes,
+        user=user,
         ip_address=ip_address
     )
 
 
-# Store pre-save state for detecting changes
-_pre_save_instances = {}
-
-@receiver(pre_save, sender=Room)
-@receiver(pre_save, sender=Booking)
-@receiver(pre_save, sender=Testimonial)
-def store_pre_save_instance(sender, instance, **kwargs):
-    """Store instance before save to detect changes"""
-    if instance.pk:
-        try:
-            _pre_save_instances[f"{sender.__name__}_{instance.pk}"] = sender.objects.get(pk=instance.pk)
-        except sender.DoesNotExist:
-            pass
-
-
 @receiver(post_save, sender=Room)
 def log_room_save(sender, instance, created, **kwargs):
     """Log Room create/update"""
@@ -56,19 +42,13 @@ def log_room_save(sender, instance, created, **kwargs):
     changes = {}
     
     if not created:
-        key = f"Room_{instance.pk}"
-        old_instance = _pre_save_instances.pop(key, None)
-        if old_instance:
-            for field in ['nomor_ruangan', 'tipe_ruangan', 'kapasitas', 'is_active']:
-                old_val = getattr(old_instance, field, None)
-                new_val = getattr(instance, field, None)
-                if old_val != new_val:
-                    changes[field] = {'old': str(old_val), 'new': str(new_val)}
+        dirty = instance.get_dirty_fields()
+        for field in ['nomor_ruangan', 'tipe_ruangan', 'kapasitas', 'is_active']:
+            if field in dirty:
+                old_val, new_val = dirty[field]
+                changes[field] = {'old': str(old_val), 'new': str(new_val)}
     
-    # Note: user tracking requires middleware or explicit passing
-    # For now, we log without user (will be enhanced with admin override)
     log_activity(
-        user=None,
         action=action,
         model_name='Room',
         object_id=instance.pk,
@@ -84,21 +64,17 @@ def log_booking_save(sender, instance, created, **kwargs):
     changes = {}
     
     if not created:
-        key = f"Booking_{instance.pk}"
-        old_instance = _pre_save_instances.pop(key, None)
-        if old_instance:
-            old_status = old_instance.status
-            new_status = instance.status
-            if old_status != new_status:
-                changes['status'] = {'old': old_status, 'new': new_status}
-                # Detect approve/reject actions
-                if new_status == 'Approved' and old_status != 'Approved':
-                    action = 'approve'
-                elif new_status == 'Rejected' and old_status != 'Rejected':
-                    action = 'reject'
+        dirty = instance.get_dirty_fields()
+        if 'status' in dirty:
+            old_status, new_status = dirty['status']
+            changes['status'] = {'old': old_status, 'new': new_status}
+            # Detect approve/reject actions
+            if new_status == 'Approved':
+                action = 'approve'
+            elif new_status == 'Rejected':
+                action = 'reject'
     
     log_activity(
-        user=None,
         action=action,
         model_name='Booking',
         object_id=instance.pk,
@@ -111,7 +87,6 @@ def log_booking_save(sender, instance, created, **kwargs):
 def log_room_delete(sender, instance, **kwargs):
     """Log Room delete"""
     log_activity(
-        user=None,
         action='delete',
         model_name='Room',
         object_id=instance.pk,
@@ -123,9 +98,148 @@ def log_room_delete(sender, instance, **kwargs):
 def log_booking_delete(sender, instance, **kwargs):
     """Log Booking delete"""
     log_activity(
-        user=None,
         action='delete',
         model_name='Booking',
         object_id=instance.pk,
         object_repr=str(instance),
     )
+
+
+@receiver(post_save, sender=Booking)
+def invalidate_booking_badge_on_save(sender, instance, created, **kwargs):
+    """Reset cache badge Pending jika booking baru atau status berubah"""
+    if created or 'status' in instance.get_dirty_fields():
+        from .admin_views import invalidate_pending_booking_count
+        invalidate_pending_booking_count()
+
+
+@receiver(post_delete, sender=Booking)
+def invalidate_booking_badge_on_delete(sender, instance, **kwargs):
+    """Reset cache badge Pending saat booking dihapus"""
+    from .admin_views import invalidate_pending_booking_count
+    invalidate_pending_booking_count()
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=User)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """Sinkronkan index FTS (SQLite); di PostgreSQL index mengikuti kolom search_document"""
+    # Mis. update last_login saat login: dokumen tidak berubah
+    if update_fields is not None and 'search_document' not in update_fields:
+        return
+    search.index_instance(instance)
+
+
+@receiver(post_delete, sender=Room)
+@receiver(post_delete, sender=User)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_instance(instance)
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def bump_rooms_cache_version(sender, instance, **kwargs):
+    """Fragment ruangan & halaman beranda yang di-cache jadi basi"""
+    bump_version('rooms')
+
+
+@receiver(post_save, sender=Testimonial)
+@receiver(post_delete, sender=Testimonial)
+def bump_testimonials_cache_version(sender, instance, **kwargs):
+    bump_version('testimonials')
+
+
+@receiver(post_save, sender=Room)
+def build_uploaded_photo_thumbnails(sender, instance, **kwargs):
+    """Thumbnail foto upload dibuat sekali setelah commit; URL/Drive diproses job scheduler"""
+    from django.db import transaction
+    from . import images
+    
+    key = images.source_key(instance)
+    if not images.is_stale(instance) or (key is not None and not key.startswith('upload:')):
+        return
+    
+    def build():
+        try:
+            images.build_room_thumbnails(instance)
+        except Exception as e:
+            logger.warning(f'Thumbnail ruangan {instance.pk} gagal dibuat: {e}')
+    transaction.on_commit(build)
+
+
+@receiver(post_delete, sender=Room)
+def delete_photo_thumbnails(sender, instance, **kwargs):
+    from . import images
+    images.delete_files(instance.foto_thumbnails)
+
+
+# ============================================
+# USER COUNTERS (badge navbar, lihat core.counters)
+# ============================================
+@receiver(post_save, sender=Message)
+def ensure_conversation_read_states(sender, instance, created, **kwargs):
+    """Watermark baca percakapan harus ada sebelum pesan bisa ditandai terbaca"""
+    if created:
+        user = instance.receiver if instance.sender.is_chat_admin else instance.sender
+        ConversationReadState.ensure(user.pk)
+
+
+@receiver(post_save, sender=Message)
+def count_message_save(sender, instance, created, **kwargs):
+    # Pesan baru selalu di atas watermark baca penerima
+    if created:
+        counters.adjust(instance.receiver_id, 'unread_messages', 1)
+
+
+@receiver(post_delete, sender=Message)
+def count_message_delete(sender, instance, **kwargs):
+    # Tidak diketahui apakah sudah dibaca tanpa membaca watermark: hitung ulang
+    counters.invalidate([instance.receiver_id], 'unread_messages')
+
+
+@receiver(post_save, sender=Wishlist)
+def count_wishlist_save(sender, instance, created, **kwargs):
+    if created:
+        counters.adjust(instance.user_id, 'wishlist', 1)
+
+
+@receiver(post_delete, sender=Wishlist)
+def count_wishlist_delete(sender, instance, **kwargs):
+    counters.adjust(instance.user_id, 'wishlist', -1)
+
+
+@receiver(post_save, sender=Booking)
+def count_booking_save(sender, instance, created, **kwargs):
+    pending = Booking.Status.PENDING
+    if created:
+        delta = 1 if instance.status == pending else 0
+    else:
+        dirty = instance.get_dirty_fields()
+        if 'status' not in dirty:
+            return
+        old_status, new_status = dirty['status']
+        delta = (new_status == pending) - (old_status == pending)
+    counters.adjust(instance.user_id, 'pending_bookings', delta)
+
+
+@receiver(post_delete, sender=Booking)
+def count_booking_delete(sender, instance, **kwargs):
+    if instance.status == Booking.Status.PENDING:
+        counters.adjust(instance.user_id, 'pending_bookings', -1)
+
+
+# ============================================
+# DEFERRED UPLOADS (lihat core.uploads)
+# ============================================
+@receiver(post_delete, sender=FileUpload)
+def delete_staged_upload(sender, instance, **kwargs):
+    """Buang preview dan file staging yang belum sempat di-upload"""
+    if instance.preview:
+        instance.preview.delete(save=False)
+    if not instance.staged_name or instance.status in (FileUpload.Status.DONE, FileUpload.Status.REJECTED):
+        return
+    from . import uploads
+    try:
+        uploads.staging_storage().delete(instance.staged_name)
+    except Exception as e:
+        logger.warning(f'Gagal menghapus file staging {instance.staged_name}: {e}')
@@ -0,0 +1,65 @@
+"""
+Memoized storage URLs for SmartSpace UPY
+
+Storage.url() di Cloudinary membangun (dan menandatangani) URL di Python
+untuk setiap pemanggilan; polling chat, kartu ruangan dan changelist admin
+memanggilnya per baris setiap beberapa detik. Hasilnya disimpan di memori
+proses dengan key (storage, nama file, versi):
+
+- nama file berubah setiap upload baru, jadi entry lama tidak pernah salah;
+- STORAGE_URL_CACHE_VERSION di-bump jika konfigurasi storage berubah
+  (cloud name, domain CDN, dsb.);
+- STORAGE_URL_CACHE_TIMEOUT membatasi umur entry (harus lebih pendek dari
+  masa berlaku URL bertanda tangan, jika dipakai).
+
+Per proses, bukan cache Django: round-trip ke Redis per baris sama mahalnya
+dengan menghitung URL itu sendiri.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+_urls = OrderedDict()
+_lock = threading.Lock()
+
+
+def _storage_key(storage):
+    # default_storage adalah LazyObject; pakai objek aslinya
+    storage = getattr(storage, '_wrapped', storage)
+    cls = type(storage)
+    return f'{cls.__module__}.{cls.__qualname__}:{getattr(storage, "base_url", "")}'
+
+
+def storage_url(storage, name):
+    """storage.url(name), di-memo per proses selama STORAGE_URL_CACHE_TIMEOUT"""
+    if not name:
+        return None
+    key = (_storage_key(storage), name, settings.STORAGE_URL_CACHE_VERSION)
+    now = time.monotonic()
+    with _lock:
+        entry = _urls.get(key)
+        if entry is not None and entry[1] > now:
+            _urls.move_to_end(key)
+            return entry[0]
+
+    url = storage.url(name)
+    with _lock:
+        _urls[key] = (url, now + settings.STORAGE_URL_CACHE_TIMEOUT)
+        _urls.move_to_end(key)
+        while len(_urls) > settings.STORAGE_URL_CACHE_SIZE:
+            _urls.popitem(last=False)
+    return url
+
+
+def file_url(field_file):
+    """URL FieldFile (FileField/ImageField) atau None jika kosong"""
+    if not field_file or not field_file.name:
+        return None
+    return storage_url(field_file.storage, field_file.name)
+
+
+def clear():
+    with _lock:
+        _urls.clear()
@@ -0,0 +1,129 @@
+"""
+Free-slot suggestions for SmartSpace UPY
+
+Jika jadwal yang diminta bentrok, pengguna diberi k jendela kosong
+terdekat dengan durasi yang sama:
+
+- ruangan yang sama pada hari yang sama / BOOKING_SUGGESTION_DAYS hari
+  sebelum-sesudahnya;
+- ruangan lain bertipe sama yang aktif, tersedia, dan kapasitasnya cukup.
+
+Semua booking Approved/Pending untuk ruangan kandidat diambil dengan satu
+query rentang; per ruangan per hari, interval terisi di-sweep (urut mulai)
+untuk mendapatkan celah kosong dalam jam operasional (BOOKING_OPEN_TIME -
+BOOKING_CLOSE_TIME). Dari setiap celah diambil jendela yang paling dekat
+dengan jam yang diminta; jendela diurutkan berdasarkan selisih waktu,
+ruangan yang sama didahulukan jika selisihnya sama.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def _clock(value):
+    hours, minutes = value.split(':')
+    return time(int(hours), int(minutes))
+
+
+def _free_gaps(busy, open_at, close_at):
+    """Celah kosong [(mulai, selesai)] di [open_at, close_at]; busy urut mulai"""
+    gaps = []
+    cursor = open_at
+    for start, end in busy:
+        if end <= cursor:
+            continue
+        if start >= close_at:
+            break
+        if start > cursor:
+            gaps.append((cursor, start))
+        cursor = max(cursor, end)
+    if cursor < close_at:
+        gaps.append((cursor, close_at))
+    return gaps
+
+
+def suggest_slots(room, start, end, jumlah_tamu=1, k=None):
+    """
+    k jendela kosong terdekat untuk durasi end - start.
+
+    Return list dict: room (Room), start, end (aware datetime), distance
+    (timedelta dari jam yang diminta).
+    """
+    from .models import Booking, Room
+
+    k = settings.BOOKING_SUGGESTION_COUNT if k is None else k
+    duration = end - start
+    if k <= 0 or duration <= timedelta(0):
+        return []
+
+    local_start = timezone.localtime(start)
+    span = settings.BOOKING_SUGGESTION_DAYS
+    days = [local_start.date() + timedelta(days=offset) for offset in range(-span, span + 1)]
+    open_time, close_time = _clock(settings.BOOKING_OPEN_TIME), _clock(settings.BOOKING_CLOSE_TIME)
+    earliest = timezone.now()
+
+    rooms = {room.pk: room}
+    alternatives = Room.objects.filter(
+        is_active=True,
+        status=Room.RoomStatus.AVAILABLE,
+        tipe_ruangan=room.tipe_ruangan,
+        kapasitas__gte=max(jumlah_tamu or 1, 1),
+    ).exclude(pk=room.pk).only('id', 'nomor_ruangan', 'tipe_ruangan', 'kapasitas')
+    rooms.update((alternative.pk, alternative) for alternative in alternatives)
+
+    window_start = timezone.make_aware(datetime.combine(days[0], open_time))
+    window_end = timezone.make_aware(datetime.combine(days[-1], close_time))
+    busy = defaultdict(list)
+    for room_id, busy_start, busy_end in Booking.objects.filter(
+        room_id__in=rooms,
+        status__in=[Booking.Status.APPROVED, Booking.Status.PENDING],
+        tanggal_mulai__lt=window_end,
+        tanggal_selesai__gt=window_start,
+    ).order_by('tanggal_mulai').values_list('room_id', 'tanggal_mulai', 'tanggal_selesai'):
+        busy[room_id].append((busy_start, busy_end))
+
+    candidates = []
+    for room_id, candidate_room in rooms.items():
+        for day in days:
+            open_at = max(timezone.make_aware(datetime.combine(day, open_time)), earliest)
+            close_at = timezone.make_aware(datetime.combine(day, close_time))
+            target = timezone.make_aware(datetime.combine(day, local_start.time()))
+            for gap_start, gap_end in _free_gaps(busy[room_id], open_at, close_at):
+                if gap_end - gap_start < duration:
+                    continue
+                # Jendela dalam celah yang paling dekat dengan jam yang diminta
+                slot_start = min(max(target, gap_start), gap_end - duration)
+                distance = abs(slot_start - start)
+                candidates.append((distance, room_id != room.pk, candidate_room.nomor_ruangan, slot_start, room_id))
+
+    candidates.sort(key=lambda c: c[:4])
+    return [
+        {
+            'room': rooms[room_id],
+            'start': slot_start,
+            'end': slot_start + duration,
+            'distance': distance,
+        }
+        for distance, _, _, slot_start, room_id in candidates[:k]
+    ]
+
+
+def serialize(suggestions, requested_room):
+    """Bentuk JSON/template untuk hasil suggest_slots"""
+    result = []
+    for suggestion in suggestions:
+        local_start = timezone.localtime(suggestion['start'])
+        local_end = timezone.localtime(suggestion['end'])
+        result.append({
+            'room_id': suggestion['room'].pk,
+            'room': suggestion['room'].nomor_ruangan,
+            'same_room': suggestion['room'].pk == requested_room.pk,
+            'start': local_start.strftime('%Y-%m-%dT%H:%M'),
+            'end': local_end.strftime('%Y-%m-%dT%H:%M'),
+            'date': local_start.strftime('%d %b %Y'),
+            'start_time': local_start.strftime('%H:%M'),
+            'end_time': local_end.strftime('%H:%M'),
+        })
+    return result
@@ -1,3 +1,1600 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+import zipfile
+import zlib
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import InMemoryStorage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .admin_views import get_pending_booking_count
+from .models import (
+    ActivityLog, Booking, BookingSeries, ConversationReadState, Facility, Feedback, FileUpload, Message, Room,
+    RoomComment, RoomReport, Testimonial, User, Wishlist,
+)
+from . import counters, documents, images, locks, schedule_import, search, storage_urls, suggestions, uploads
+from .pagination import EstimatedCountPaginator
+
+
+class QueryIndexTests(TestCase):
+    """Pastikan query utama memakai index dari migration 0020 (SQLite & PostgreSQL)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='mahasiswa', npm_nip='1001')
+        cls.admin = User.objects.create(username='admin', npm_nip='9001', is_staff=True)
+        cls.room = Room.objects.create(nomor_ruangan='Lab Komputer', kapasitas=40)
+        start = timezone.now() + timedelta(days=1)
+        for i in range(5):
+            Booking.objects.create(
+                user=cls.user,
+                room=cls.room,
+                tanggal_mulai=start + timedelta(hours=i),
+                tanggal_selesai=start + timedelta(hours=i + 1),
+            )
+        Message.objects.create(sender=cls.admin, receiver=cls.user, content='Halo')
+        RoomComment.objects.create(user=cls.user, room=cls.room, rating=5, comment='Bagus')
+
+    def assertUsesIndex(self, queryset, index_name):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Tabel test kecil, paksa planner memilih index
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        self.assertIn(index_name, plan, f'Index {index_name} tidak dipakai:\n{plan}')
+
+    def test_booking_conflict_check(self):
+        now = timezone.now()
+        qs = Booking.objects.filter(
+            room=self.room,
+            status__in=[Booking.Status.APPROVED, Booking.Status.PENDING],
+            tanggal_mulai__lt=now + timedelta(days=2),
+            tanggal_selesai__gt=now,
+        )
+        self.assertUsesIndex(qs, 'booking_room_status_time_idx')
+
+    def test_booking_calendar(self):
+        now = timezone.now()
+        qs = Booking.get_approved_bookings_for_room(self.room, now.year, now.month)
+        self.assertUsesIndex(qs, 'booking_room_status_time_idx')
+
+    def test_booking_user_dashboard(self):
+        qs = Booking.objects.filter(user=self.user).order_by('-created_at')
+        self.assertUsesIndex(qs, 'booking_user_created_idx')
+
+    def test_booking_pending_queue(self):
+        qs = Booking.objects.filter(status=Booking.Status.PENDING).order_by('-created_at')
+        self.assertUsesIndex(qs, 'booking_pending_created_idx')
+
+    def test_message_unread_count(self):
+        qs = Message.objects.filter(receiver=self.user, id__gt=1)
+        self.assertUsesIndex(qs, 'message_receiver_id_idx')
+
+    def test_message_conversation(self):
+        qs = Message.objects.filter(sender=self.admin, receiver=self.user).order_by('created_at')
+        self.assertUsesIndex(qs, 'message_conversation_idx')
+
+    def test_room_comments(self):
+        qs = self.room.comments.filter(is_approved=True).order_by('-created_at')
+        self.assertUsesIndex(qs, 'roomcomment_approved_idx')
+
+    def test_activity_log_changelist(self):
+        qs = ActivityLog.objects.order_by('-created_at')[:50]
+        self.assertUsesIndex(qs, 'activitylog_created_idx')
+
+
+# Manifest storage butuh collectstatic; test pakai storage biasa
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class QueryCountTests(TestCase):
+    """
+    Jumlah query per endpoint harus konstan terhadap ukuran data.
+    Setiap endpoint diukur pada beberapa ukuran fixture; jika jumlah query
+    bertambah seiring data (N+1), test gagal.
+    """
+
+    SIZES = (1, 5, 20)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            username='admin', npm_nip='9001', first_name='Admin',
+            role=User.Role.ADMIN, is_staff=True, is_superuser=True,
+        )
+        cls.user = User.objects.create(username='mahasiswa', npm_nip='1001', first_name='Budi')
+        cls.room = Room.objects.create(nomor_ruangan='Aula Utama', tipe_ruangan='Aula', kapasitas=200)
+        cls.seeded = 0
+
+    def seed(self, size):
+        """Tambah data sampai total `size` baris per model"""
+        start = timezone.localtime().replace(day=1, hour=8, minute=0, second=0, microsecond=0)
+        for i in range(self.seeded, size):
+            other = User.objects.create(username=f'user{i}', npm_nip=f'2{i:04d}', first_name=f'User{i}')
+            room = Room.objects.create(nomor_ruangan=f'Kelas {i}', kapasitas=30, fasilitas='AC\nProyektor')
+            Booking.objects.create(
+                user=self.user,
+                room=self.room,
+                tanggal_mulai=start + timedelta(hours=i),
+                tanggal_selesai=start + timedelta(hours=i, minutes=30),
+                status=Booking.Status.APPROVED,
+                keperluan=f'Kegiatan {i}',
+            )
+            Booking.objects.create(
+                user=other, room=room,
+                tanggal_mulai=start + timedelta(days=1),
+                tanggal_selesai=start + timedelta(days=1, hours=1),
+            )
+            Wishlist.objects.create(user=self.user, room=room)
+            Message.objects.create(sender=self.admin, receiver=self.user, content=f'Balasan {i}')
+            Message.objects.create(sender=self.user, receiver=self.admin, content=f'Pertanyaan {i}')
+            Message.objects.create(sender=other, receiver=self.admin, content=f'Halo {i}')
+            RoomComment.objects.create(user=other, room=self.room, rating=4, comment=f'Komentar {i}')
+            RoomReport.objects.create(user=other, room=room, keterangan=f'Laporan {i}')
+        self.seeded = size
+
+    def assertConstantQueries(self, url, user=None):
+        self.seeded = 0
+        if user:
+            self.client.force_login(user)
+        self.seed(self.SIZES[0])
+        # Warm-up: isi cache ContentType/permission dsb.
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        baseline = len(ctx.captured_queries)
+        for size in self.SIZES[1:]:
+            self.seed(size)
+            with self.subTest(url=url, size=size), self.assertNumQueries(baseline):
+                self.client.get(url)
+
+    # Public pages & APIs
+    def test_home(self):
+        self.assertConstantQueries(reverse('home'))
+
+    def test_rooms_list(self):
+        self.assertConstantQueries(reverse('rooms_list'))
+
+    def test_room_detail(self):
+        self.assertConstantQueries(reverse('room_detail', args=[self.room.pk]))
+
+    def test_room_comments_api(self):
+        self.assertConstantQueries(reverse('api_room_comments', args=[self.room.pk]))
+
+    def test_calendar_api(self):
+        now = timezone.localtime()
+        url = reverse('api_calendar_bookings', args=[self.room.pk]) + f'?year={now.year}&month={now.month}'
+        self.assertConstantQueries(url)
+
+    def test_booked_slots_api(self):
+        date_str = timezone.localtime().replace(day=1).strftime('%Y-%m-%d')
+        self.assertConstantQueries(reverse('api_booked_slots', args=[self.room.pk, date_str]))
+
+    # User pages & APIs
+    def test_dashboard(self):
+        self.assertConstantQueries(reverse('dashboard'), user=self.user)
+
+    def test_profile(self):
+        self.assertConstantQueries(reverse('profile'), user=self.user)
+
+    def test_wishlist_page(self):
+        self.assertConstantQueries(reverse('wishlist'), user=self.user)
+
+    def test_messages_page(self):
+        self.assertConstantQueries(reverse('messages'), user=self.user)
+
+    def test_check_auth_api(self):
+        self.assertConstantQueries(reverse('api_check_auth'), user=self.user)
+
+    def test_wishlist_list_api(self):
+        self.assertConstantQueries(reverse('api_wishlist_list'), user=self.user)
+
+    def test_messages_list_api(self):
+        self.assertConstantQueries(reverse('api_messages_list'), user=self.user)
+
+    def test_messages_poll_api(self):
+        self.assertConstantQueries(reverse('api_messages_poll'), user=self.user)
+
+    # Admin chat & dashboard
+    def test_admin_chat_list(self):
+        self.assertConstantQueries(reverse('admin:chat_list'), user=self.admin)
+
+    def test_admin_chat_conversations_poll(self):
+        self.assertConstantQueries(reverse('admin:chat_conversations_poll'), user=self.admin)
+
+    def test_admin_chat_detail(self):
+        self.assertConstantQueries(reverse('admin:chat_detail', args=[self.user.pk]), user=self.admin)
+
+    def test_admin_chat_poll(self):
+        self.assertConstantQueries(reverse('admin:chat_poll', args=[self.user.pk]), user=self.admin)
+
+    def test_admin_dashboard_stats(self):
+        self.assertConstantQueries(reverse('admin:admin_dashboard_stats'), user=self.admin)
+
+    # Admin changelists
+    def test_admin_booking_changelist(self):
+        self.assertConstantQueries(reverse('admin:core_booking_changelist'), user=self.admin)
+
+    def test_admin_wishlist_changelist(self):
+        self.assertConstantQueries(reverse('admin:core_wishlist_changelist'), user=self.admin)
+
+    def test_admin_roomcomment_changelist(self):
+        self.assertConstantQueries(reverse('admin:core_roomcomment_changelist'), user=self.admin)
+
+    def test_admin_roomreport_changelist(self):
+        self.assertConstantQueries(reverse('admin:core_roomreport_changelist'), user=self.admin)
+
+    def test_admin_activitylog_changelist(self):
+        self.assertConstantQueries(reverse('admin:core_activitylog_changelist'), user=self.admin)
+
+    def test_admin_user_changelist(self):
+        self.assertConstantQueries(reverse('admin:core_user_changelist'), user=self.admin)
+
+
+class ActivityLogBufferTests(TestCase):
+    """ActivityLog ditulis bulk di akhir request, lengkap dengan user & IP"""
+
+    def test_booking_cancel_logs_actor(self):
+        user = User.objects.create(username='mahasiswa', npm_nip='1001')
+        room = Room.objects.create(nomor_ruangan='Kelas 1', kapasitas=30)
+        start = timezone.now() + timedelta(days=1)
+        booking = Booking.objects.create(
+            user=user, room=room, tanggal_mulai=start, tanggal_selesai=start + timedelta(hours=1),
+        )
+        self.client.force_login(user)
+
+        response = self.client.post(
+            reverse('api_booking_cancel'),
+            data={'booking_id': booking.pk},
+            content_type='application/json',
+            REMOTE_ADDR='10.1.2.3',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        log = ActivityLog.objects.get(model_name='Booking', object_id=booking.pk, action='update')
+        self.assertEqual(log.user, user)
+        self.assertEqual(log.ip_address, '10.1.2.3')
+        self.assertEqual(log.changes['status'], {'old': 'Pending', 'new': 'Cancelled'})
+
+
+class DirtyFieldsTests(TestCase):
+    """Change tracking memakai snapshot from_db, tanpa SELECT sebelum save"""
+
+    def setUp(self):
+        user = User.objects.create(username='mahasiswa', npm_nip='1001')
+        self.room = Room.objects.create(nomor_ruangan='Kelas 1', kapasitas=30)
+        start = timezone.now() + timedelta(days=1)
+        self.booking = Booking.objects.create(
+            user=user, room=self.room, tanggal_mulai=start, tanggal_selesai=start + timedelta(hours=1),
+        )
+
+    def test_dirty_fields_after_load(self):
+        booking = Booking.objects.get(pk=self.booking.pk)
+        self.assertEqual(booking.get_dirty_fields(), {})
+        booking.status = Booking.Status.APPROVED
+        self.assertEqual(booking.get_dirty_fields(), {'status': ('Pending', 'Approved')})
+
+    def test_save_does_not_reload_instance(self):
+        booking = Booking.objects.get(pk=self.booking.pk)
+        booking.status = Booking.Status.APPROVED
+        with CaptureQueriesContext(connection) as ctx:
+            booking.save(update_fields=['status', 'updated_at'])
+        reloads = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT "core_booking"')]
+        self.assertEqual(reloads, [])
+        # Snapshot diperbarui setelah save
+        self.assertEqual(booking.get_dirty_fields(), {})
+
+    def test_room_changes_tracked_after_create(self):
+        self.room.kapasitas = 40
+        self.assertEqual(self.room.get_dirty_fields(), {'kapasitas': (30, 40)})
+
+
+class ActivityLogRetentionTests(TestCase):
+    """archive_activity_logs: arsip NDJSON.gz lalu hapus baris kedaluwarsa"""
+
+    def test_archives_then_deletes_expired_rows(self):
+        now = timezone.now()
+        logs = ActivityLog.objects.bulk_create([
+            ActivityLog(action='update', model_name='Room', object_id=i, object_repr=f'Room {i}')
+            for i in range(5)
+        ])
+        for i, log in enumerate(logs):
+            log.created_at = now - timedelta(days=400 if i < 3 else 10)
+        ActivityLog.objects.bulk_update(logs, ['created_at'])
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            call_command('archive_activity_logs', days=365, output_dir=output_dir, batch_size=2, stdout=io.StringIO())
+            files = os.listdir(output_dir)
+            self.assertEqual(len(files), 1)
+            self.assertTrue(files[0].endswith('.ndjson.gz'))
+            with gzip.open(os.path.join(output_dir, files[0]), 'rt', encoding='utf-8') as archive:
+                rows = [json.loads(line) for line in archive]
+
+        self.assertEqual(sorted(row['object_id'] for row in rows), [0, 1, 2])
+        self.assertEqual(sorted(ActivityLog.objects.values_list('object_id', flat=True)), [3, 4])
+
+    def test_dry_run_keeps_rows(self):
+        log = ActivityLog.objects.create(action='create', model_name='Room', object_id=1, object_repr='Room 1')
+        ActivityLog.objects.filter(pk=log.pk).update(created_at=timezone.now() - timedelta(days=400))
+
+        out = io.StringIO()
+        call_command('archive_activity_logs', days=365, dry_run=True, stdout=out)
+
+        self.assertIn('1 activity log', out.getvalue())
+        self.assertTrue(ActivityLog.objects.filter(pk=log.pk).exists())
+
+    @override_settings(ACTIVITY_LOG_ARCHIVE_DIR='')
+    def test_requires_archive_dir(self):
+        log = ActivityLog.objects.create(action='create', model_name='Room', object_id=1, object_repr='Room 1')
+        ActivityLog.objects.filter(pk=log.pk).update(created_at=timezone.now() - timedelta(days=400))
+
+        with self.assertRaisesMessage(CommandError, 'ACTIVITY_LOG_ARCHIVE_DIR'):
+            call_command('archive_activity_logs', days=365, stdout=io.StringIO())
+        self.assertTrue(ActivityLog.objects.filter(pk=log.pk).exists())
+
+    def test_skipped_while_another_process_runs(self):
+        log = ActivityLog.objects.create(action='create', model_name='Room', object_id=1, object_repr='Room 1')
+        ActivityLog.objects.filter(pk=log.pk).update(created_at=timezone.now() - timedelta(days=400))
+
+        out = io.StringIO()
+        with tempfile.TemporaryDirectory() as output_dir, locks.single_run('archive_activity_logs'):
+            call_command('archive_activity_logs', days=365, output_dir=output_dir, stdout=out)
+        self.assertIn('dilewati', out.getvalue())
+        self.assertTrue(ActivityLog.objects.filter(pk=log.pk).exists())
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class CursorPaginationTests(TestCase):
+    """Keyset pagination (created_at, id): halaman tetap kecil, tanpa duplikat/terlewat"""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', npm_nip='ADM', is_staff=True, is_superuser=True)
+        self.user = User.objects.create(username='mahasiswa', npm_nip='1001')
+        messages = Message.objects.bulk_create([
+            Message(sender=self.admin, receiver=self.user, content=f'Pesan {i}', message_type='admin_to_user')
+            for i in range(45)
+        ])
+        # Sebagian pesan punya created_at sama agar tie-breaker id ikut diuji
+        now = timezone.now()
+        for i, message in enumerate(messages):
+            message.created_at = now - timedelta(minutes=i // 3)
+        Message.objects.bulk_update(messages, ['created_at'])
+        self.client.force_login(self.user)
+
+    def collect(self, url, key):
+        ids, cursor, pages = [], None, 0
+        while True:
+            response = self.client.get(url, {'limit': 20, **({'cursor': cursor} if cursor else {})})
+            data = response.json()
+            self.assertLessEqual(len(data[key]), 20)
+            ids.extend(item['id'] for item in data[key])
+            pages += 1
+            cursor = data['next_cursor']
+            if not data['has_more']:
+                return ids, pages
+
+    def test_messages_list_pages(self):
+        ids, pages = self.collect(reverse('api_messages_list'), 'messages')
+        self.assertEqual(pages, 3)
+        self.assertEqual(len(ids), len(set(ids)))
+        expected = list(
+            Message.objects.filter(receiver=self.user).order_by('-created_at', '-pk').values_list('pk', flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_messages_history_pages(self):
+        ids, pages = self.collect(reverse('api_messages_history'), 'messages')
+        self.assertEqual(pages, 3)
+        self.assertEqual(sorted(ids), sorted(Message.objects.values_list('pk', flat=True)))
+
+    def test_messages_page_renders_latest_only(self):
+        from .views import CHAT_PAGE_SIZE
+        response = self.client.get(reverse('messages'))
+        self.assertEqual(len(response.context['conversation']), CHAT_PAGE_SIZE)
+        self.assertIsNotNone(response.context['older_cursor'])
+        latest = Message.objects.order_by('-created_at', '-pk').first()
+        self.assertEqual(response.context['conversation'][-1], latest)
+
+    def test_admin_chat_renders_latest_only(self):
+        from .views import CHAT_PAGE_SIZE
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin:chat_detail', args=[self.user.pk]))
+        self.assertEqual(len(response.context['messages_list']), CHAT_PAGE_SIZE)
+        self.assertIsNotNone(response.context['older_cursor'])
+        self.assertContains(response, 'Muat pesan sebelumnya')
+        latest = Message.objects.order_by('-created_at', '-pk').first()
+        self.assertEqual(response.context['messages_list'][-1], latest)
+
+    def test_admin_chat_history_pages(self):
+        self.client.force_login(self.admin)
+        ids, pages = self.collect(reverse('admin:chat_history', args=[self.user.pk]), 'messages')
+        self.assertEqual(pages, 3)
+        expected = list(Message.objects.order_by('-created_at', '-pk').values_list('pk', flat=True))
+        self.assertEqual(ids, expected)
+        response = self.client.get(reverse('admin:chat_history', args=[self.user.pk]), {'cursor': 'bukan-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('api_messages_list'), {'cursor': 'bukan-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PendingBookingBadgeTests(TestCase):
+    """Badge sidebar admin: di-cache, di-reset oleh signals & bulk action"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='mahasiswa', npm_nip='1001')
+        self.room = Room.objects.create(nomor_ruangan='Kelas 1', kapasitas=30)
+
+    def create_booking(self):
+        start = timezone.now() + timedelta(days=1)
+        return Booking.objects.create(
+            user=self.user, room=self.room, tanggal_mulai=start, tanggal_selesai=start + timedelta(hours=1),
+        )
+
+    def test_count_is_cached(self):
+        self.create_booking()
+        self.assertEqual(get_pending_booking_count(None), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_pending_booking_count(None), 1)
+
+    def test_invalidated_on_create_and_status_change(self):
+        self.assertEqual(get_pending_booking_count(None), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = self.create_booking()
+        self.assertEqual(get_pending_booking_count(None), 1)
+
+        booking = Booking.objects.get(pk=booking.pk)
+        booking.status = Booking.Status.APPROVED
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        self.assertEqual(get_pending_booking_count(None), 0)
+
+    def test_paginator_falls_back_to_exact_count(self):
+        self.create_booking()
+        paginator = EstimatedCountPaginator(Booking.objects.all(), 25)
+        self.assertEqual(paginator.count, 1)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class SearchTests(TestCase):
+    """core.search: prefix, aksen, typo & ranking (FTS5 di SQLite, pg_trgm di PostgreSQL)"""
+
+    def setUp(self):
+        self.lab = Room.objects.create(
+            nomor_ruangan='Laboratorium Komputer', tipe_ruangan='Lab', kapasitas=40,
+            fasilitas='Proyektor\nAC\nKomputer',
+        )
+        self.aula = Room.objects.create(
+            nomor_ruangan='Aula Séminar', tipe_ruangan='Aula', kapasitas=300,
+            fasilitas='Sound System\nProyektor', deskripsi='Untuk seminar dan wisuda',
+        )
+        self.kelas = Room.objects.create(nomor_ruangan='Kelas 101', kapasitas=30, fasilitas='Whiteboard')
+        self.user = User.objects.create(username='budi', first_name='Budi', last_name='Santoso', npm_nip='2021010123')
+
+    def names(self, term):
+        return [room.nomor_ruangan for room in search.search(Room.objects.all(), term)]
+
+    def test_prefix_and_accent(self):
+        self.assertEqual(self.names('semi'), ['Aula Séminar'])
+        self.assertEqual(self.names('séminar'), ['Aula Séminar'])
+
+    def test_typo(self):
+        self.assertEqual(self.names('laboratorim'), ['Laboratorium Komputer'])
+
+    def test_name_ranks_above_body(self):
+        # 'komputer' ada di nama Lab; 'proyektor' hanya di fasilitas keduanya
+        self.assertEqual(self.names('komputer')[0], 'Laboratorium Komputer')
+        self.assertCountEqual(self.names('proyektor'), ['Laboratorium Komputer', 'Aula Séminar'])
+
+    def test_document_updated_on_save(self):
+        self.kelas.nomor_ruangan = 'Studio Musik'
+        self.kelas.save()
+        self.assertEqual(self.names('musik'), ['Studio Musik'])
+        self.assertEqual(self.names('101'), [])
+
+    def test_public_api(self):
+        response = self.client.get(reverse('api_rooms_search'), {'q': 'proyektr'})
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertCountEqual([r['id'] for r in data['results']], [self.lab.id, self.aula.id])
+        self.assertEqual(self.client.get(reverse('api_rooms_search'), {'q': 'a'}).status_code, 400)
+
+    def test_admin_user_search_by_npm(self):
+        admin = User.objects.create(username='admin', npm_nip='ADM', is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:core_user_changelist'), {'q': '20210101'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.user])
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class RoomsApiTests(TestCase):
+    """/api/rooms/: filter server-side, pagination, ETag & cache per parameter"""
+
+    def setUp(self):
+        cache.clear()
+        self.kelas = Room.objects.create(nomor_ruangan='Kelas 101', kapasitas=30, fasilitas='Proyektor\nAC')
+        self.lab = Room.objects.create(
+            nomor_ruangan='Lab Komputer', tipe_ruangan='Lab', kapasitas=40, fasilitas='Komputer\nAC',
+        )
+        self.aula = Room.objects.create(
+            nomor_ruangan='Aula Utama', tipe_ruangan='Aula', kapasitas=300,
+            fasilitas='Sound System', status='maintenance',
+        )
+        Room.objects.create(nomor_ruangan='Gudang', kapasitas=5, is_active=False)
+
+    def get(self, **params):
+        return self.client.get(reverse('api_rooms'), params)
+
+    def names(self, **params):
+        return [room['name'] for room in self.get(**params).json()['results']]
+
+    def test_filters(self):
+        self.assertEqual(self.names(), ['Aula Utama', 'Kelas 101', 'Lab Komputer'])
+        self.assertEqual(self.names(tipe='lab,Aula'), ['Aula Utama', 'Lab Komputer'])
+        self.assertEqual(self.names(min_capacity=35, max_capacity=100), ['Lab Komputer'])
+        self.assertEqual(self.names(status='available'), ['Kelas 101', 'Lab Komputer'])
+        self.assertEqual(self.names(fasilitas='ac,komputer'), ['Lab Komputer'])
+        self.assertEqual(self.names(ordering='-capacity'), ['Aula Utama', 'Lab Komputer', 'Kelas 101'])
+
+    def test_invalid_params(self):
+        self.assertEqual(self.get(tipe='gudang').status_code, 400)
+        self.assertEqual(self.get(min_capacity='banyak').status_code, 400)
+        self.assertEqual(self.get(ordering='harga').status_code, 400)
+
+    def test_pagination(self):
+        first = self.get(limit=2).json()
+        self.assertEqual((first['count'], first['num_pages'], first['has_next']), (3, 2, True))
+        second = self.get(limit=2, page=2).json()
+        self.assertEqual([r['name'] for r in second['results']], ['Lab Komputer'])
+        self.assertFalse(second['has_next'])
+        self.assertEqual(self.get(limit=2, page=5).json()['results'], [])
+
+    def test_conditional_get(self):
+        response = self.get(tipe='lab')
+        etag = response['ETag']
+        self.assertEqual(self.client.get(
+            reverse('api_rooms'), {'tipe': 'lab'}, HTTP_IF_NONE_MATCH=etag,
+        ).status_code, 304)
+        # Parameter lain -> ETag lain
+        self.assertNotEqual(self.get(tipe='aula')['ETag'], etag)
+
+        self.lab.kapasitas = 45
+        self.lab.save()
+        response = self.client.get(reverse('api_rooms'), {'tipe': 'lab'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['capacity'], 45)
+
+    def test_rating_update_changes_etag(self):
+        etag = self.get()['ETag']
+        user = User.objects.create(username='mahasiswa', npm_nip='1001')
+        RoomComment.objects.create(user=user, room=self.kelas, rating=4, comment='Oke', is_approved=True)
+        self.kelas.update_average_rating()
+        self.assertNotEqual(self.get()['ETag'], etag)
+
+    def test_cached_payload(self):
+        self.get(tipe='kelas')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.get(tipe='kelas')
+        self.assertEqual(response.json()['results'][0]['name'], 'Kelas 101')
+        # Hanya query agregat untuk versi ETag
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_rooms_list_page_does_not_inline_rooms(self):
+        response = self.client.get(reverse('rooms_list'))
+        self.assertNotContains(response, 'Lab Komputer')
+        self.assertContains(response, reverse('api_rooms'))
+
+    def test_home_filters_through_api(self):
+        # Grid beranda dipotong 12 ruangan; tab & pencarian harus lewat API, bukan DOM
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, reverse('api_rooms'))
+        self.assertContains(response, 'function roomCardHtml')
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class HomeCacheTests(TestCase):
+    """Beranda: fragment ber-versi + cache halaman untuk pengunjung anonim"""
+
+    def setUp(self):
+        cache.clear()
+        self.room = Room.objects.create(nomor_ruangan='Lab Komputer', tipe_ruangan='Lab', kapasitas=40)
+        Testimonial.objects.create(nama='Budi', role='Mahasiswa', content='Sangat membantu')
+
+    def test_anonymous_served_without_queries(self):
+        self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('home'))
+        self.assertEqual(len(ctx.captured_queries), 0, [q['sql'] for q in ctx.captured_queries])
+        self.assertContains(response, 'Lab Komputer')
+        self.assertContains(response, 'Sangat membantu')
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_room_save_bumps_version(self):
+        self.client.get(reverse('home'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.nomor_ruangan = 'Lab Jaringan'
+            self.room.save()
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Lab Jaringan')
+        self.assertNotContains(response, 'Lab Komputer')
+
+    def test_testimonial_save_bumps_version(self):
+        self.client.get(reverse('home'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Testimonial.objects.create(nama='Sari', role='Dosen', content='Proses cepat')
+        self.assertContains(self.client.get(reverse('home')), 'Proses cepat')
+
+    def test_authenticated_uses_fragments_only(self):
+        user = User.objects.create(username='mahasiswa', npm_nip='1001')
+        self.client.get(reverse('home'))
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('home'))
+        # Halaman dirender ulang (status login), tapi ruangan & testimoni dari fragment cache
+        self.assertContains(response, 'Lab Komputer')
+        tables = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('core_room', tables)
+        self.assertNotIn('core_testimonial', tables)
+
+
+@override_settings(STORAGES=TEST_STORAGES, ROOM_THUMBNAIL_WIDTHS=(320, 640, 1280))
+class RoomThumbnailTests(TestCase):
+    """core.images: thumbnail WebP/JPEG untuk foto upload & eksternal"""
+
+    def image_bytes(self, size=(2000, 1000), mode='RGB', fmt='PNG'):
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new(mode, size, 'red').save(buffer, fmt)
+        return buffer.getvalue()
+
+    def test_upload_builds_derivatives_once(self):
+        from django.core.files.storage import default_storage
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+
+        with self.captureOnCommitCallbacks(execute=True):
+            room = Room.objects.create(
+                nomor_ruangan='Aula', kapasitas=100,
+                foto_ruangan=SimpleUploadedFile('aula.png', self.image_bytes(mode='RGBA')),
+            )
+        room.refresh_from_db()
+        self.assertEqual(sorted(images.current_files(room)), [320, 640, 1280])
+        with default_storage.open(images.current_files(room)[640]['webp']) as f:
+            self.assertEqual(Image.open(f).size, (640, 320))
+        self.assertIn('320w', room.foto_srcset_webp)
+        self.assertTrue(room.foto_thumbnail_url.endswith('-640.jpg'))
+
+        # Save tanpa ganti foto tidak membuat ulang
+        with mock.patch('core.images.render_derivatives') as render:
+            with self.captureOnCommitCallbacks(execute=True):
+                room.kapasitas = 120
+                room.save()
+        render.assert_not_called()
+
+    def test_small_image_not_upscaled(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        with self.captureOnCommitCallbacks(execute=True):
+            room = Room.objects.create(
+                nomor_ruangan='Kelas', kapasitas=30,
+                foto_ruangan=SimpleUploadedFile('kelas.jpg', self.image_bytes((200, 100), fmt='JPEG')),
+            )
+        room.refresh_from_db()
+        self.assertEqual(list(images.current_files(room)), [200])
+
+    def test_external_photo_built_by_job(self):
+        room = Room.objects.create(nomor_ruangan='Lab', kapasitas=40, foto_url='https://example.com/lab.jpg')
+        self.assertEqual(room.foto_thumbnail_url, 'https://example.com/lab.jpg')
+
+        with mock.patch('core.images.fetch_remote_image', return_value=self.image_bytes()) as fetch:
+            call_command('generate_room_thumbnails', stdout=io.StringIO())
+            call_command('generate_room_thumbnails', stdout=io.StringIO())
+        fetch.assert_called_once_with('https://example.com/lab.jpg')
+        room.refresh_from_db()
+        self.assertTrue(room.foto_thumbnail_url.endswith('-640.jpg'))
+
+        # Sumber berubah: derivatif lama diabaikan sampai job berikutnya
+        room.foto_url = 'https://example.com/lab-baru.jpg'
+        self.assertEqual(room.foto_thumbnail_url, 'https://example.com/lab-baru.jpg')
+        self.assertEqual(room.foto_srcset_webp, '')
+
+    @override_settings(ROOM_THUMBNAIL_SYNC_MINUTES=10, ROOM_THUMBNAIL_MAX_ATTEMPTS=2)
+    def test_failed_download_backs_off(self):
+        from datetime import timedelta
+        room = Room.objects.create(nomor_ruangan='Lab', kapasitas=40, foto_url='https://example.com/mati.jpg')
+        now = timezone.now()
+
+        with mock.patch('core.images.fetch_remote_image', side_effect=OSError('404')) as fetch:
+            self.assertEqual(images.sync_room_thumbnails(), (0, 1))
+            # Masih dalam backoff: tidak diunduh ulang
+            self.assertEqual(images.sync_room_thumbnails(), (0, 0))
+            self.assertEqual(fetch.call_count, 1)
+            room.refresh_from_db()
+            failure = room.foto_thumbnails['failure']
+            self.assertEqual(failure['attempts'], 1)
+            self.assertEqual(failure['retry_at'][:16], (now + timedelta(minutes=10)).isoformat()[:16])
+
+            with mock.patch('core.images.timezone.now', return_value=now + timedelta(minutes=11)):
+                self.assertEqual(images.sync_room_thumbnails(), (0, 1))
+            # MAX_ATTEMPTS tercapai: berhenti mencoba
+            with mock.patch('core.images.timezone.now', return_value=now + timedelta(days=2)):
+                self.assertEqual(images.sync_room_thumbnails(), (0, 0))
+            self.assertEqual(fetch.call_count, 2)
+
+        # Sumber diganti: dicoba lagi, catatan gagal dihapus setelah berhasil
+        Room.objects.filter(pk=room.pk).update(foto_url='https://example.com/lab.jpg')
+        with mock.patch('core.images.fetch_remote_image', return_value=self.image_bytes()):
+            self.assertEqual(images.sync_room_thumbnails(), (1, 0))
+        room.refresh_from_db()
+        self.assertNotIn('failure', room.foto_thumbnails)
+
+    def test_sync_runs_in_one_process(self):
+        from . import scheduler
+        Room.objects.create(nomor_ruangan='Lab', kapasitas=40, foto_url='https://example.com/lab.jpg')
+        cache.clear()
+        with mock.patch('core.images.fetch_remote_image') as fetch:
+            with locks.single_run('room_thumbnail_sync'):
+                scheduler.run_room_thumbnail_sync()
+                out = io.StringIO()
+                call_command('generate_room_thumbnails', stdout=out)
+        fetch.assert_not_called()
+        self.assertIn('dilewati', out.getvalue())
+
+
+class RoomListFieldsTests(TestCase):
+    """fasilitas/peraturan/larangan disimpan sebagai list + tag fasilitas"""
+
+    def setUp(self):
+        self.room = Room.objects.create(
+            nomor_ruangan='Lab Komputer', kapasitas=40,
+            fasilitas='AC\n Proyektor 4K \n\nWiFi', peraturan='Jaga kebersihan', larangan='Merokok\nMakan',
+        )
+
+    def test_lists_computed_on_save(self):
+        room = Room.objects.get(pk=self.room.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(room.fasilitas_list, ['AC', 'Proyektor 4K', 'WiFi'])
+            self.assertEqual(room.peraturan_list, ['Jaga kebersihan'])
+            self.assertEqual(room.larangan_list, ['Merokok', 'Makan'])
+
+        room.larangan = ''
+        room.save(update_fields=['larangan'])
+        self.assertEqual(Room.objects.get(pk=room.pk).larangan_list, [])
+
+    def test_facility_tags(self):
+        self.assertCountEqual(
+            self.room.facilities.values_list('slug', flat=True), ['ac', 'proyektor-4k', 'wifi'],
+        )
+        self.room.fasilitas = 'AC\nWhiteboard'
+        self.room.save()
+        self.assertCountEqual(self.room.facilities.values_list('slug', flat=True), ['ac', 'whiteboard'])
+        # Tag dipakai bersama antar ruangan
+        other = Room.objects.create(nomor_ruangan='Kelas 101', kapasitas=30, fasilitas='ac')
+        self.assertEqual(Facility.objects.filter(slug='ac').count(), 1)
+        self.assertEqual(other.facilities.get().name, 'AC')
+
+    def test_save_without_facility_change_skips_sync(self):
+        room = Room.objects.get(pk=self.room.pk)
+        room.kapasitas = 45
+        with CaptureQueriesContext(connection) as ctx:
+            room.save()
+        self.assertFalse(any('core_facility' in q['sql'] or 'core_room_facilities' in q['sql']
+                             for q in ctx.captured_queries))
+
+    def test_api_filters_by_tag_prefix(self):
+        cache.clear()
+        response = self.client.get(reverse('api_rooms'), {'fasilitas': 'proyektor'})
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Lab Komputer'])
+        response = self.client.get(reverse('api_rooms'), {'fasilitas': 'proyektor,whiteboard'})
+        self.assertEqual(response.json()['results'], [])
+
+
+class ThrottledSessionTests(TestCase):
+    """Session hanya disimpan ulang sekali per SESSION_REFRESH_INTERVAL; polling tidak menulis"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='mahasiswa', npm_nip='1001')
+        self.client.force_login(self.user)
+
+    def session_writes(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in ctx.captured_queries
+                if 'django_session' in q['sql'] and not q['sql'].startswith('SELECT')]
+
+    def test_refresh_throttled(self):
+        url = reverse('api_wishlist_list')
+        self.assertTrue(self.session_writes(url))  # Penyegaran pertama
+        self.assertFalse(self.session_writes(url))
+        self.assertFalse(self.session_writes(url))
+
+    @override_settings(SESSION_REFRESH_INTERVAL=0)
+    def test_polling_endpoints_opt_out(self):
+        self.assertFalse(self.session_writes(reverse('api_messages_poll') + '?last_id=0'))
+        self.assertFalse(self.session_writes(reverse('api_check_auth')))
+        self.assertTrue(self.session_writes(reverse('api_wishlist_list')))
+
+    def test_session_changes_still_saved(self):
+        self.client.post(reverse('api_logout'))
+        self.assertEqual(self.client.get(reverse('api_check_auth')).json()['authenticated'], False)
+
+
+class UserCountersTests(TestCase):
+    """core.counters: badge per user diperbarui signals, dihitung ulang saat miss"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='mahasiswa', npm_nip='1001')
+        self.admin = User.objects.create(username='admin', npm_nip='9001', is_staff=True)
+        self.room = Room.objects.create(nomor_ruangan='Lab Komputer', kapasitas=40)
+
+    def counters(self):
+        return counters.get_counters(self.user.id)
+
+    def test_incremental_updates(self):
+        self.assertEqual(self.counters(), {'unread_messages': 0, 'wishlist': 0, 'pending_bookings': 0})
+        start = timezone.now() + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            message = Message.objects.create(sender=self.admin, receiver=self.user, content='Halo')
+            wishlist = Wishlist.objects.create(user=self.user, room=self.room)
+            booking = Booking.objects.create(
+                user=self.user, room=self.room, tanggal_mulai=start, tanggal_selesai=start + timedelta(hours=1),
+            )
+        self.assertEqual(self.counters(), {'unread_messages': 1, 'wishlist': 1, 'pending_bookings': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.status = Booking.Status.APPROVED
+            booking.save()
+            wishlist.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counters(), {'unread_messages': 1, 'wishlist': 0, 'pending_bookings': 0})
+
+        # Hapus pesan: counter di-invalidate lalu dihitung ulang dari watermark
+        with self.captureOnCommitCallbacks(execute=True):
+            message.delete()
+        self.assertEqual(self.counters()['unread_messages'], 0)
+
+    def test_check_auth_reads_cache(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('api_check_auth'))
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(reverse('api_check_auth')).json()
+        self.assertEqual(data['user']['wishlist_count'], 0)
+        self.assertFalse([q['sql'] for q in ctx.captured_queries if 'COUNT(' in q['sql']])
+
+    def test_mark_read_updates_counter(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(sender=self.admin, receiver=self.user, content='Halo')
+        self.assertEqual(self.counters()['unread_messages'], 1)
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('api_messages_poll'), {'last_id': 0})
+        self.assertEqual(self.counters()['unread_messages'], 0)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class ConversationReadStateTests(TestCase):
+    """Status baca chat lewat watermark, bukan UPDATE is_read per pesan"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='mahasiswa', npm_nip='1001')
+        self.admin = User.objects.create(username='admin', npm_nip='9001', is_staff=True)
+
+    def send(self, sender, receiver, content='Halo'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Message.objects.create(sender=sender, receiver=receiver, content=content)
+
+    def test_user_reads_admin_messages(self):
+        first = self.send(self.admin, self.user)
+        self.send(self.admin, self.user)
+        self.assertEqual(ConversationReadState.unread_count(self.user.id), 2)
+
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            data = self.client.get(reverse('api_messages_poll'), {'last_id': 0}).json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(counters.get_counters(self.user.id)['unread_messages'], 0)
+
+        # Poll tanpa pesan baru tidak menulis apa pun
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('api_messages_poll'), {'last_id': data['messages'][-1]['id']})
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')])
+
+        history = self.client.get(reverse('api_messages_list')).json()
+        self.assertTrue(all(msg['is_read'] for msg in history['messages']))
+        self.assertEqual(ConversationReadState.watermarks(self.user.id)['user'], history['messages'][0]['id'])
+        self.assertGreater(history['messages'][0]['id'], first.id)
+
+    def test_admin_reads_user_messages(self):
+        self.send(self.user, self.admin)
+        self.send(self.user, self.admin)
+        self.assertEqual(counters.get_counters(self.admin.id)['unread_messages'], 2)
+
+        self.client.force_login(self.admin)
+        conversations = self.client.get(reverse('admin:chat_conversations_poll')).json()['conversations']
+        self.assertEqual(conversations[0]['unread_count'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('admin:chat_detail', args=[self.user.pk]))
+        self.assertEqual(counters.get_counters(self.admin.id)['unread_messages'], 0)
+        conversations = self.client.get(reverse('admin:chat_conversations_poll')).json()['conversations']
+        self.assertEqual(conversations[0]['unread_count'], 0)
+
+        # Pesan baru di atas watermark terhitung lagi
+        self.send(self.user, self.admin)
+        self.assertEqual(ConversationReadState.unread_count(self.admin.id, is_admin=True), 1)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class AdminChangelistTests(TestCase):
+    """Changelist admin: jumlah query dipatok, kolom panjang tidak ikut di-SELECT"""
+
+    # Termasuk query session/auth & badge sidebar; naikkan hanya jika memang disengaja.
+    # Tanpa REDIS_URL session dibaca dari DB (engine db), bukan dari cache
+    EXPECTED_QUERIES = {
+        'user': 6, 'room': 5, 'booking': 8, 'wishlist': 4, 'testimonial': 5,
+        'feedback': 4, 'activitylog': 4, 'roomcomment': 6, 'roomreport': 5, 'bookingseries': 4,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            username='admin', npm_nip='9001', role=User.Role.ADMIN, is_staff=True, is_superuser=True,
+        )
+        start = timezone.now() + timedelta(days=1)
+        for i in range(30):
+            user = User.objects.create(username=f'user{i}', npm_nip=f'1{i:04d}', first_name=f'User{i}')
+            room = Room.objects.create(nomor_ruangan=f'Kelas {i}', kapasitas=30, deskripsi='x' * 2000)
+            Booking.objects.create(
+                user=user, room=room,
+                tanggal_mulai=start + timedelta(hours=i), tanggal_selesai=start + timedelta(hours=i, minutes=30),
+            )
+            Wishlist.objects.create(user=user, room=room)
+            RoomComment.objects.create(user=user, room=room, rating=5, comment=f'Komentar {i}')
+            RoomReport.objects.create(user=user, room=room, keterangan=f'Laporan {i}')
+            Testimonial.objects.create(nama=f'Alumni {i}', role='Alumni', content='Bagus', rating=5)
+            Feedback.objects.create(category='saran', subject=f'Saran {i}', message='Tambah AC')
+        series = BookingSeries.objects.create(
+            user=user, room=room, tanggal_mulai=start, tanggal_selesai=start + timedelta(hours=1),
+            until=(start + timedelta(weeks=4)).date(),
+        )
+        Booking.objects.filter(room=room).update(series=series)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+        self.client.get(reverse('admin:core_room_changelist'))  # Warm-up ContentType/permission
+
+    def test_query_counts_pinned(self):
+        for model, expected in self.EXPECTED_QUERIES.items():
+            with self.subTest(model=model):
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.client.get(reverse(f'admin:core_{model}_changelist'))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(ctx.captured_queries), expected)
+
+    def test_long_columns_deferred(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('admin:core_booking_changelist'))
+        rows_query = next(q['sql'] for q in ctx.captured_queries if 'LIMIT 25' in q['sql'])
+        self.assertIn('"core_user"."npm_nip"', rows_query)
+        for column in ('"core_room"."deskripsi"', '"core_user"."password"', 'search_document'):
+            self.assertNotIn(column, rows_query)
+
+    def test_actions_use_full_rows(self):
+        booking = Booking.objects.first()
+        with mock.patch('core.export_utils.generate_bookings_excel') as export:
+            export.return_value = HttpResponse()
+            self.client.post(reverse('admin:core_booking_changelist'), {
+                'action': 'export_bookings_to_excel', '_selected_action': [booking.pk],
+            })
+        exported = list(export.call_args.args[0])
+        self.assertEqual(exported[0].get_deferred_fields(), set())
+
+
+class StorageUrlTests(TestCase):
+    """core.storage_urls: storage.url() dipanggil sekali per (storage, nama, versi)"""
+
+    def setUp(self):
+        storage_urls.clear()
+        self.storage = mock.Mock(base_url='/media/')
+        self.storage.url.side_effect = lambda name: f'/media/{name}'
+
+    def test_memoized_per_name(self):
+        for _ in range(3):
+            self.assertEqual(storage_urls.storage_url(self.storage, 'a.pdf'), '/media/a.pdf')
+        self.assertEqual(storage_urls.storage_url(self.storage, 'b.pdf'), '/media/b.pdf')
+        self.assertEqual(self.storage.url.call_count, 2)
+        self.assertIsNone(storage_urls.storage_url(self.storage, ''))
+
+    def test_version_and_timeout(self):
+        storage_urls.storage_url(self.storage, 'a.pdf')
+        with self.settings(STORAGE_URL_CACHE_VERSION='2'):
+            storage_urls.storage_url(self.storage, 'a.pdf')
+        self.assertEqual(self.storage.url.call_count, 2)
+
+        with mock.patch('core.storage_urls.time.monotonic', return_value=time.monotonic() + 4000):
+            storage_urls.storage_url(self.storage, 'a.pdf')
+        self.assertEqual(self.storage.url.call_count, 3)
+
+    @override_settings(STORAGE_URL_CACHE_SIZE=2)
+    def test_size_bounded(self):
+        for name in ('a', 'b', 'c', 'a'):
+            storage_urls.storage_url(self.storage, name)
+        self.assertEqual(self.storage.url.call_count, 4)
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_poll_resolves_each_attachment_once(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        user = User.objects.create(username='mahasiswa', npm_nip='1001')
+        admin = User.objects.create(username='admin', npm_nip='9001', is_staff=True)
+        Message.objects.create(
+            sender=admin, receiver=user, content='Lampiran', attachment=SimpleUploadedFile('jadwal.pdf', b'%PDF-1.4'),
+        )
+        self.client.force_login(user)
+        with mock.patch.object(InMemoryStorage, 'url', autospec=True, side_effect=lambda self, name: f'/m/{name}') as url:
+            for _ in range(3):
+                data = self.client.get(reverse('api_messages_poll'), {'last_id': 0}).json()
+        self.assertTrue(data['messages'][0]['attachment_url'].startswith('/m/message_attachments/'))
+        self.assertEqual(url.call_count, 1)
+
+
+@override_settings(STORAGES=TEST_STORAGES, DEFERRED_UPLOADS=True, UPLOAD_WORKERS=0)
+class DeferredUploadTests(TestCase):
+    """core.uploads: file di-stage lokal, upload ke storage selesai setelah response"""
+
+    def setUp(self):
+        self.staging_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.staging_dir.cleanup)
+        override = self.settings(UPLOAD_STAGING_DIR=self.staging_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create(username='dosen', npm_nip='1001', role=User.Role.DOSEN)
+        self.admin = User.objects.create(username='admin', npm_nip='9001', is_superuser=True, is_staff=True)
+        self.room = Room.objects.create(nomor_ruangan='Aula', kapasitas=100)
+        self.client.force_login(self.user)
+
+    def staged_files(self):
+        return [name for _, _, files in os.walk(self.staging_dir.name) for name in files]
+
+    def test_booking_document_uploaded_after_commit(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        start = timezone.localtime() + timedelta(days=2)
+        with mock.patch('core.uploads.submit') as submit:
+            self.client.post(reverse('room_detail', args=[self.room.pk]), {
+                'nama_lengkap': 'Dosen', 'jumlah_tamu': 10,
+                'tanggal_mulai': start.strftime('%Y-%m-%dT%H:%M'),
+                'tanggal_selesai': (start + timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M'),
+                'dokumen_pendukung': SimpleUploadedFile('surat.pdf', b'%PDF-1.4 surat'),
+            })
+        # Response dikirim sebelum upload ke storage
+        booking = Booking.objects.get()
+        upload = FileUpload.objects.get()
+        self.assertFalse(booking.dokumen_pendukung)
+        self.assertEqual((upload.content_object, upload.status), (booking, FileUpload.Status.PENDING))
+        self.assertEqual(len(self.staged_files()), 1)
+
+        self.assertTrue(uploads.complete_upload(upload.pk))
+        booking.refresh_from_db()
+        upload.refresh_from_db()
+        self.assertTrue(booking.dokumen_pendukung.name.startswith('dokumen_booking/surat'))
+        self.assertEqual(booking.dokumen_pendukung.read(), b'%PDF-1.4 surat')
+        self.assertEqual(upload.status, FileUpload.Status.DONE)
+        self.assertEqual(self.staged_files(), [])
+        self.assertFalse(uploads.complete_upload(upload.pk))  # Tidak diproses dua kali
+
+    def test_message_attachment_inline_worker(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        with self.captureOnCommitCallbacks(execute=True):
+            data = self.client.post(reverse('api_send_message'), {
+                'content': 'Jadwal', 'attachment': SimpleUploadedFile('jadwal.pdf', pdf_bytes(1)),
+            }).json()
+        self.assertTrue(data['data']['attachment_pending'])
+        self.assertFalse(data['data']['is_image'])
+        message = Message.objects.get(pk=data['data']['id'])
+        self.assertTrue(message.attachment.name.startswith('message_attachments/jadwal'))
+        self.assertEqual(message.uploads.get().page_count, 1)
+
+    def test_poll_holds_messages_until_attachment_uploaded(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        with mock.patch('core.uploads.submit'):
+            with self.captureOnCommitCallbacks(execute=True):
+                with_attachment = Message.objects.create(sender=self.admin, receiver=self.user, content='Jadwal')
+                upload = uploads.defer_upload(with_attachment, 'attachment', SimpleUploadedFile('jadwal.pdf', pdf_bytes(1)))
+            Message.objects.create(sender=self.admin, receiver=self.user, content='Cek lampiran')
+        poll_url = reverse('api_messages_poll')
+
+        # Poll id > last_id tidak boleh melewati pesan yang lampirannya belum ada
+        self.assertEqual(self.client.get(poll_url, {'last_id': 0}).json()['messages'], [])
+
+        uploads.complete_upload(upload.pk)
+        polled = self.client.get(poll_url, {'last_id': 0}).json()['messages']
+        self.assertEqual([msg['content'] for msg in polled], ['Jadwal', 'Cek lampiran'])
+        self.assertIn('message_attachments/jadwal', polled[0]['attachment_url'])
+        self.assertFalse(polled[0]['attachment_pending'])
+
+        self.client.force_login(self.admin)
+        admin_polled = self.client.get(reverse('admin:chat_poll', args=[self.user.pk]), {'last_id': 0}).json()
+        self.assertEqual(admin_polled['messages'][0]['attachment_filename'], polled[0]['attachment_filename'])
+
+    def test_poll_delivers_stuck_upload_after_hold(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        message = Message.objects.create(sender=self.admin, receiver=self.user, content='Jadwal')
+        upload = uploads.defer_upload(message, 'attachment', SimpleUploadedFile('jadwal.pdf', pdf_bytes(1)))
+        FileUpload.objects.filter(pk=upload.pk).update(created_at=timezone.now() - timedelta(hours=1))
+
+        polled = self.client.get(reverse('api_messages_poll'), {'last_id': 0}).json()['messages']
+        self.assertEqual(len(polled), 1)
+        self.assertTrue(polled[0]['attachment_pending'])
+
+    def test_failed_upload_retried_then_marked_failed(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        message = Message.objects.create(sender=self.user, receiver=self.admin, content='Lampiran')
+        upload = uploads.defer_upload(message, 'attachment', SimpleUploadedFile('a.pdf', b'%PDF-1.4'))
+        with self.settings(UPLOAD_MAX_ATTEMPTS=2), \
+                mock.patch.object(InMemoryStorage, 'save', side_effect=OSError('storage down')):
+            self.assertFalse(uploads.complete_upload(upload.pk))
+            upload.refresh_from_db()
+            self.assertEqual((upload.status, upload.attempts), (FileUpload.Status.PENDING, 1))
+            FileUpload.objects.filter(pk=upload.pk).update(created_at=timezone.now() - timedelta(hours=1))
+            self.assertEqual(uploads.retry_pending_uploads(), (0, 1))
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, FileUpload.Status.FAILED)
+        self.assertIn('storage down', upload.error)
+
+        # Record dihapus: file staging ikut dibuang
+        message.delete()
+        self.assertEqual(self.staged_files(), [])
+
+
+def pdf_bytes(pages=3):
+    kids = ' '.join(f'{n + 3} 0 R' for n in range(pages))
+    return (
+        b'%PDF-1.4\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n'
+        + f'2 0 obj << /Type /Pages /Kids [{kids}] /Count {pages} >> endobj\n'.encode()
+        + b'trailer << /Root 1 0 R >>\n%%EOF\n'
+    )
+
+
+@override_settings(STORAGES=TEST_STORAGES, DEFERRED_UPLOADS=False, UPLOAD_WORKERS=0)
+class DocumentInspectionTests(TestCase):
+    """core.documents: isi file diperiksa oleh worker upload"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='dosen', npm_nip='1001', role=User.Role.DOSEN)
+        self.admin = User.objects.create(username='admin', npm_nip='9001', is_superuser=True, is_staff=True)
+        self.room = Room.objects.create(nomor_ruangan='Aula', kapasitas=100)
+
+    def test_sniff_type(self):
+        docx = io.BytesIO()
+        with zipfile.ZipFile(docx, 'w') as archive:
+            archive.writestr('word/document.xml', '<w:document/>')
+        cases = [
+            (pdf_bytes(), 'pdf'), (docx.getvalue(), 'docx'),
+            (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1....', 'ole'), (b'MZ\x90\x00', 'exe'),
+            (b'  <!DOCTYPE html><script>', 'html'), (b'RIFF\x00\x00\x00\x00WEBPVP8 ', 'webp'), (b'hello', ''),
+        ]
+        for data, expected in cases:
+            self.assertEqual(documents.sniff_type(io.BytesIO(data)), expected)
+        self.assertIsNone(documents.check_type('surat.docx', 'docx'))
+        self.assertIsNone(documents.check_type('catatan.txt', ''))
+        self.assertIn('.pdf', documents.check_type('surat.pdf', 'png'))
+        self.assertIn('tidak diizinkan', documents.check_type('setup.txt', 'exe'))
+
+    def test_pdf_page_count(self):
+        self.assertEqual(documents.pdf_page_count(pdf_bytes(3)), 3)
+        # PDF 1.5+: node /Pages di dalam object stream terkompresi
+        compressed = (
+            b'%PDF-1.5\n5 0 obj << /Type /ObjStm /Filter /FlateDecode >>\nstream\n'
+            + zlib.compress(b'<< /Type /Pages /Kids [6 0 R] /Count 12 >>') + b'\nendstream\nendobj\n'
+        )
+        self.assertEqual(documents.pdf_page_count(compressed), 12)
+        self.assertIsNone(documents.pdf_page_count(b'%PDF-1.4 rusak'))
+
+    def test_pdf_page_count_bounded(self):
+        # Zip bomb: /Count di luar MAX_INFLATE byte pertama tidak pernah di-inflate
+        bomb = (
+            b'%PDF-1.5\nstream\n'
+            + zlib.compress(b' ' * (documents.MAX_INFLATE + 1) + b'<< /Type /Pages /Count 7 >>')
+            + b'\nendstream\n'
+        )
+        self.assertIsNone(documents.pdf_page_count(bomb))
+        # Hanya MAX_STREAMS stream pertama yang dicoba
+        junk = b'stream\n' + zlib.compress(b'kosong') + b'\nendstream\n'
+        late = b'stream\n' + zlib.compress(b'<< /Type /Pages /Count 9 >>') + b'\nendstream\n'
+        self.assertEqual(documents.pdf_page_count(b'%PDF-1.5\n' + junk * 3 + late), 9)
+        self.assertIsNone(documents.pdf_page_count(b'%PDF-1.5\n' + junk * documents.MAX_STREAMS + late))
+
+    @override_settings(DOCUMENT_PREVIEW_WIDTH=600)
+    def test_preview_scale_bounded(self):
+        self.assertEqual(documents.preview_scale(600, 800), 1)
+        self.assertEqual(documents.preview_scale(1, 1), documents.MAX_RENDER_SCALE)
+        width, height = 150, 100000
+        scale = documents.preview_scale(width, height)
+        self.assertLessEqual(width * height * scale ** 2, documents.MAX_RENDER_PIXELS * 1.0001)
+        self.assertIsNone(documents.preview_scale(0, 800))
+
+    def send_attachment(self, name, data):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('api_send_message'), {
+                'content': 'Lampiran', 'attachment': SimpleUploadedFile(name, data),
+            })
+        return Message.objects.get(pk=response.json()['data']['id']), FileUpload.objects.get()
+
+    def test_image_attachment_gets_preview(self):
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGBA', (1200, 600), 'blue').save(buffer, 'PNG')
+        message, upload = self.send_attachment('denah.png', buffer.getvalue())
+        self.assertTrue(message.attachment)
+        self.assertEqual((upload.status, upload.detected_type), (FileUpload.Status.DONE, 'png'))
+        with upload.preview.open('rb') as preview, Image.open(preview) as image:
+            self.assertEqual((image.format, image.width), ('JPEG', 240))
+
+    def test_disguised_file_rejected_and_removed(self):
+        from django.core.files.storage import default_storage
+        message, upload = self.send_attachment('surat.pdf', b'<html><script>alert(1)</script></html>')
+        self.assertEqual(upload.status, FileUpload.Status.REJECTED)
+        self.assertIn('terdeteksi: html', upload.error)
+        self.assertFalse(message.attachment)
+        self.assertEqual(default_storage.listdir('message_attachments')[1], [])
+
+    def test_booking_admin_shows_page_count(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        start = timezone.now() + timedelta(days=1)
+        booking = Booking.objects.create(
+            user=self.user, room=self.room, tanggal_mulai=start, tanggal_selesai=start + timedelta(hours=2),
+            dokumen_pendukung=SimpleUploadedFile('surat.pdf', pdf_bytes(4)),
+        )
+        upload = uploads.track_upload(booking, 'dokumen_pendukung', booking.dokumen_pendukung)
+        self.assertTrue(uploads.complete_upload(upload.pk))
+        upload.refresh_from_db()
+        self.assertEqual((upload.detected_type, upload.page_count), ('pdf', 4))
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin:core_booking_changelist'))
+        self.assertContains(response, '📄 Download (4 hlm)')
+
+
+@override_settings(STORAGES=TEST_STORAGES, DEFERRED_UPLOADS=False, UPLOAD_WORKERS=0)
+class BookingSeriesTests(TestCase):
+    """Peminjaman berulang: ekspansi kejadian, conflict check sekaligus, bulk_create"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='dosen', npm_nip='1001', role=User.Role.DOSEN)
+        self.room = Room.objects.create(nomor_ruangan='Kelas A', kapasitas=40)
+        today = timezone.localtime().date()
+        monday = today + timedelta(days=7 - today.weekday())
+        self.first_start = timezone.make_aware(datetime.combine(monday, datetime.min.time())) + timedelta(hours=8)
+
+    def week(self, n, hours=0):
+        return self.first_start + timedelta(weeks=n, hours=hours)
+
+    def make_series(self, **kwargs):
+        fields = {
+            'user': self.user, 'room': self.room, 'tanggal_mulai': self.week(0),
+            'tanggal_selesai': self.week(0, hours=2), 'until': self.week(5).date(),
+        }
+        return BookingSeries(**{**fields, **kwargs})
+
+    def booking(self, start, end, status=Booking.Status.APPROVED):
+        return Booking.objects.create(user=self.user, room=self.room, tanggal_mulai=start, tanggal_selesai=end, status=status)
+
+    def test_occurrences(self):
+        weekly = self.make_series(exceptions=[self.week(2).date().isoformat()])
+        self.assertEqual(
+            [start for start, _ in weekly.occurrences()],
+            [self.week(n) for n in (0, 1, 3, 4, 5)],
+        )
+        self.assertTrue(all(end - start == timedelta(hours=2) for start, end in weekly.occurrences()))
+        biweekly = self.make_series(frequency=BookingSeries.Frequency.BIWEEKLY)
+        self.assertEqual([start for start, _ in biweekly.occurrences()], [self.week(0), self.week(2), self.week(4)])
+
+    def test_find_conflicts_single_query(self):
+        intervals = self.make_series().occurrences()
+        overlap = self.booking(self.week(1, hours=1), self.week(1, hours=3))
+        spanning = self.booking(self.week(3, hours=-24), self.week(4, hours=9), status=Booking.Status.PENDING)
+        self.booking(self.week(2, hours=2), self.week(2, hours=4))  # Bersebelahan, tidak bentrok
+        self.booking(self.week(5), self.week(5, hours=2), status=Booking.Status.REJECTED)
+        with self.assertNumQueries(1):
+            conflicts = Booking.find_conflicts(self.room, intervals)
+        self.assertEqual(conflicts, {1: overlap, 3: spanning, 4: spanning})
+
+    def post_series(self, **extra):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        self.client.force_login(self.user)
+        return self.client.post(reverse('room_detail', args=[self.room.pk]), {
+            'nama_lengkap': 'Dosen', 'jumlah_tamu': 30,
+            'tanggal_mulai': timezone.localtime(self.week(0)).strftime('%Y-%m-%dT%H:%M'),
+            'tanggal_selesai': timezone.localtime(self.week(0, hours=2)).strftime('%Y-%m-%dT%H:%M'),
+            'ulangi': 'weekly', 'ulangi_sampai': self.week(5).date().isoformat(),
+            'dokumen_pendukung': SimpleUploadedFile('surat.pdf', pdf_bytes(2)),
+            **extra,
+        })
+
+    def test_conflicts_reported_per_occurrence(self):
+        self.booking(self.week(2, hours=1), self.week(2, hours=3))
+        response = self.post_series()
+        self.assertEqual(response.status_code, 200)
+        conflicts = response.context['form_data']['series_conflicts']
+        self.assertEqual(len(conflicts), 1)
+        self.assertEqual(conflicts[0]['conflict'], '09:00-11:00')
+        self.assertFalse(BookingSeries.objects.exists())
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_series_created_in_bulk(self):
+        from django.core.files.storage import default_storage
+        self.booking(self.week(2, hours=1), self.week(2, hours=3))
+        self.assertEqual(counters.get_counters(self.user.pk)['pending_bookings'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post_series(lewati_bentrok='on', tanggal_dikecualikan=self.week(4).date().isoformat())
+        self.assertRedirects(response, reverse('home'))
+
+        series = BookingSeries.objects.get()
+        self.assertEqual(series.exceptions, [self.week(4).date().isoformat()])
+        self.assertEqual(
+            list(series.bookings.order_by('tanggal_mulai').values_list('tanggal_mulai', 'jumlah_tamu', 'status')),
+            [(self.week(n), 30, Booking.Status.PENDING) for n in (0, 1, 3, 5)],
+        )
+        # Dokumen disimpan sekali untuk series dan diperiksa worker
+        self.assertEqual(len(default_storage.listdir('dokumen_booking')[1]), 1)
+        self.assertEqual(series.uploads.get().page_count, 2)
+        self.assertEqual(counters.get_counters(self.user.pk)['pending_bookings'], 4)
+        log = ActivityLog.objects.get(model_name='BookingSeries')
+        self.assertEqual(log.changes['bookings'], 4)
+        self.assertEqual(log.changes['skipped'], [self.week(2).date().isoformat()])
+
+    def test_series_validation(self):
+        response = self.post_series(ulangi_sampai=self.week(40).date().isoformat())
+        self.assertContains(response, 'Maksimal 26 kejadian')
+        response = self.post_series(tanggal_dikecualikan='besok')
+        self.assertContains(response, 'YYYY-MM-DD')
+        self.assertFalse(Booking.objects.exists())
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class ScheduleImportTests(TestCase):
+    """core.schedule_import: lookup ter-cache, sort-and-sweep, bulk_create per batch"""
+
+    HEADER = 'ruangan,npm_nip,tanggal,jam_mulai,jam_selesai,jumlah_tamu,keperluan\n'
+
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', npm_nip='9001', is_staff=True, is_superuser=True)
+        self.dosen = User.objects.create(username='dosen', npm_nip='1001', role=User.Role.DOSEN)
+        self.room = Room.objects.create(nomor_ruangan='Kelas A', kapasitas=40)
+        Room.objects.create(nomor_ruangan='Lab B', kapasitas=20)
+        self.day = timezone.localtime().date() + timedelta(days=10)
+        start = timezone.make_aware(datetime.combine(self.day, datetime.min.time())) + timedelta(hours=13)
+        self.existing = Booking.objects.create(
+            user=self.dosen, room=self.room, tanggal_mulai=start, tanggal_selesai=start + timedelta(hours=2),
+            status=Booking.Status.APPROVED,
+        )
+
+    def csv_file(self, lines):
+        return io.BytesIO((self.HEADER + ''.join(line + '\n' for line in lines)).encode())
+
+    def run_import(self, lines, **kwargs):
+        return schedule_import.import_schedule(self.csv_file(lines), 'jadwal.csv', **kwargs)
+
+    def test_rows_validated_and_created(self):
+        d = self.day.isoformat()
+        result = self.run_import([
+            f'Kelas A,1001,{d},07:30,09:10,35,Kalkulus',
+            f'kelas a,1001,{d},09:00,10:00,10,Overlap baris 2',
+            f'Kelas A,1001,{d},14:00,15:00,10,Bentrok database',
+            f'Lab B,1001,{d},07:30,09:10,25,Melebihi kapasitas',
+            f'Aula Z,1001,{d},07:30,09:10,10,Ruangan salah',
+            f'Lab B,9999,{d},07:30,09:10,10,User salah',
+            f'Lab B,1001,{d},10:00,09:00,10,Jam terbalik',
+            f'Lab B,1001,{self.day:%d/%m/%Y},10.00,11.40,,Format lain',
+        ])
+        self.assertEqual((result.total, result.created), (8, 2))
+        self.assertEqual([(row, message.split(' ')[0]) for row, _, message in result.errors], [
+            (3, 'Bentrok'), (4, 'Bentrok'), (5, 'Jumlah'), (6, 'Ruangan'), (7, 'User'), (8, 'Jam'),
+        ])
+        self.assertIn('baris 2 di file', result.errors[0][2])
+        self.assertIn(f'booking #{self.existing.pk}', result.errors[1][2])
+        self.assertEqual(
+            list(Booking.objects.exclude(pk=self.existing.pk).order_by('tanggal_mulai')
+                 .values_list('room__nomor_ruangan', 'keperluan', 'jumlah_tamu', 'status')),
+            [('Kelas A', 'Kalkulus', 35, 'Approved'), ('Lab B', 'Format lain', 1, 'Approved')],
+        )
+
+    def test_query_count_independent_of_rows(self):
+        def lines(count):
+            first = timezone.make_aware(datetime.combine(self.day, datetime.min.time())) + timedelta(days=1)
+            return [
+                f'Lab B,1001,{(first + timedelta(days=i)):%Y-%m-%d},08:00,09:00,10,Kuliah {i}' for i in range(count)
+            ]
+        with self.settings(SCHEDULE_IMPORT_BATCH_SIZE=1000):
+            with CaptureQueriesContext(connection) as small:
+                self.run_import(lines(3))
+            Booking.objects.exclude(pk=self.existing.pk).delete()
+            with CaptureQueriesContext(connection) as large:
+                self.assertEqual(self.run_import(lines(60)).created, 60)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_xlsx_and_dry_run(self):
+        from openpyxl import Workbook
+        from datetime import time as dt_time
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Ruangan', 'NPM NIP', 'Tanggal', 'Jam Mulai', 'Jam Selesai'])
+        sheet.append(['Lab B', 1001, self.day, dt_time(8, 0), dt_time(9, 40)])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        buffer.seek(0)
+        result = schedule_import.import_schedule(buffer, 'jadwal.xlsx', dry_run=True)
+        self.assertEqual((result.total, result.valid, result.created, result.errors), (1, 1, 0, []))
+        self.assertEqual(Booking.objects.count(), 1)
+
+        with self.assertRaisesMessage(schedule_import.ScheduleImportError, 'Kolom wajib tidak ada: jam_selesai'):
+            schedule_import.import_schedule(io.BytesIO(b'ruangan,npm_nip,tanggal,jam_mulai\n'), 'jadwal.csv')
+
+    def test_non_utf8_csv_rejected(self):
+        data = (self.HEADER + f'Lab B,1001,{self.day},08:00,09:00,10,Pengantar Espa\u00f1ol\n').encode('cp1252')
+        with self.assertRaisesMessage(schedule_import.ScheduleImportError, 'UTF-8'):
+            schedule_import.import_schedule(io.BytesIO(data), 'jadwal.csv')
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_rooms_locked_during_import(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.run_import([f'Lab B,1001,{self.day},08:00,09:00,10,Praktikum'])
+        sql = [query['sql'] for query in ctx.captured_queries]
+        # Kunci ruangan (FOR UPDATE di PostgreSQL) diambil sebelum cek bentrok, dalam transaksi yang sama
+        lock = next(i for i, q in enumerate(sql) if q.startswith('SELECT "core_room"."id" AS "pk"'))
+        overlap_check = next(i for i, q in enumerate(sql) if q.startswith('SELECT') and 'FROM "core_booking"' in q)
+        insert = next(i for i, q in enumerate(sql) if q.startswith('INSERT INTO "core_booking"'))
+        savepoint = next(i for i, q in enumerate(sql) if q.startswith('SAVEPOINT'))
+        self.assertLess(savepoint, lock)
+        self.assertLess(lock, overlap_check)
+        self.assertLess(overlap_check, insert)
+
+    def test_pending_import_updates_counters(self):
+        self.assertEqual(counters.get_counters(self.dosen.pk)['pending_bookings'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_import([f'Lab B,1001,{self.day},08:00,09:00,10,Praktikum'], status=Booking.Status.PENDING)
+        self.assertEqual(counters.get_counters(self.dosen.pk)['pending_bookings'], 1)
+
+    def test_admin_page_and_error_report(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from openpyxl import load_workbook
+        self.client.force_login(self.admin)
+        upload = SimpleUploadedFile('jadwal.csv', self.csv_file([
+            f'Lab B,1001,{self.day},08:00,09:00,10,Praktikum',
+            f'Lab B,1001,{self.day},08:30,09:30,10,Bentrok',
+        ]).getvalue())
+        response = self.client.post(reverse('admin:schedule_import'), {'file': upload, 'status': 'Approved'})
+        self.assertContains(response, 'Bentrok dengan baris 2 di file')
+        self.assertEqual(response.context['result'].created, 1)
+
+        report = self.client.get(reverse('admin:schedule_import_report', args=[response.context['report_token']]))
+        sheet = load_workbook(io.BytesIO(report.content)).active
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(rows[0][0], 'baris')
+        self.assertEqual((rows[1][0], rows[1][-1]), (3, 'Bentrok dengan baris 2 di file'))
+
+        self.client.force_login(self.dosen)
+        self.assertEqual(self.client.get(reverse('admin:schedule_import')).status_code, 302)
+
+    def test_command_writes_report(self):
+        path = os.path.join(tempfile.mkdtemp(), 'jadwal.csv')
+        with open(path, 'wb') as f:
+            f.write(self.csv_file([f'Aula Z,1001,{self.day},08:00,09:00,10,-']).getvalue())
+        out = io.StringIO()
+        call_command('import_schedule', path, '--report', path + '.errors.csv', stdout=out)
+        self.assertIn('0/1 booking dibuat', out.getvalue())
+        with open(path + '.errors.csv', encoding='utf-8-sig') as report:
+            self.assertIn('Ruangan tidak ditemukan: Aula Z', report.read())
+
+
+class SlotSuggestionTests(TestCase):
+    """Saran slot kosong terdekat saat booking bentrok"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='peminjam', npm_nip='2001')
+        self.room = Room.objects.create(nomor_ruangan='Kelas A', kapasitas=40)
+        tomorrow = timezone.localtime().date() + timedelta(days=2)
+        self.day = timezone.make_aware(datetime.combine(tomorrow, datetime.min.time()))
+
+    def at(self, hour, days=0):
+        return self.day + timedelta(days=days, hours=hour)
+
+    def booking(self, room, start, end, status=Booking.Status.APPROVED):
+        return Booking.objects.create(user=self.user, room=room, tanggal_mulai=start, tanggal_selesai=end, status=status)
+
+    def test_same_room_nearest_gap(self):
+        self.booking(self.room, self.at(10), self.at(12))
+        self.booking(self.room, self.at(13), self.at(14), status=Booking.Status.PENDING)
+        self.booking(self.room, self.at(12), self.at(13), status=Booking.Status.REJECTED)
+        with self.assertNumQueries(2):  # ruangan alternatif + booking semua kandidat
+            slots = suggestions.suggest_slots(self.room, self.at(10), self.at(12), k=3)
+        # Celah 08-10 pas di depan; celah 12-13 terlalu pendek; 14-21 mulai jam 14
+        self.assertEqual([(s['start'], s['end']) for s in slots], [
+            (self.at(8), self.at(10)), (self.at(14), self.at(16)), (self.at(10, days=-1), self.at(12, days=-1)),
+        ])
+        self.assertTrue(all(s['room'] == self.room for s in slots))
+
+    def test_alternative_room_same_time_ranks_first(self):
+        other = Room.objects.create(nomor_ruangan='Kelas B', kapasitas=40)
+        Room.objects.create(nomor_ruangan='Kelas Kecil', kapasitas=10)
+        Room.objects.create(nomor_ruangan='Lab Komputer', kapasitas=40, tipe_ruangan=Room.TipeRuangan.LAB)
+        Room.objects.create(nomor_ruangan='Kelas Rusak', kapasitas=40, status=Room.RoomStatus.MAINTENANCE)
+        self.booking(self.room, self.at(8), self.at(21))
+        slots = suggestions.suggest_slots(self.room, self.at(10), self.at(12), jumlah_tamu=30, k=10)
+        self.assertEqual(slots[0]['room'], other)
+        self.assertEqual(slots[0]['start'], self.at(10))
+        self.assertEqual({s['room'].nomor_ruangan for s in slots}, {'Kelas A', 'Kelas B'})
+
+    def test_past_windows_skipped(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        slots = suggestions.suggest_slots(self.room, yesterday, yesterday + timedelta(hours=1), k=10)
+        self.assertTrue(all(s['start'] >= yesterday for s in slots))
+
+    def test_api_returns_suggestions(self):
+        self.booking(self.room, self.at(10), self.at(12))
+        response = self.client.post(
+            '/api/bookings/check-conflict/',
+            data=json.dumps({
+                'room_id': self.room.pk,
+                'start_time': timezone.localtime(self.at(11)).strftime('%Y-%m-%dT%H:%M'),
+                'end_time': timezone.localtime(self.at(12)).strftime('%Y-%m-%dT%H:%M'),
+            }),
+            content_type='application/json',
+        )
+        data = response.json()
+        self.assertTrue(data['has_conflict'])
+        self.assertEqual(len(data['suggestions']), settings.BOOKING_SUGGESTION_COUNT)
+        first = data['suggestions'][0]
+        self.assertTrue(first['same_room'])
+        self.assertEqual((first['start_time'], first['end_time']), ('12:00', '13:00'))
+
+
+class MetricsEndpointTests(TestCase):
+    """/metrics hanya untuk staff atau pemegang METRICS_TOKEN"""
+
+    def test_anonymous_forbidden(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    def test_staff_allowed(self):
+        admin = User.objects.create(username='admin', npm_nip='9001', is_staff=True)
+        self.client.force_login(admin)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'smartspace_request_duration_seconds', response.content)
+
+    @override_settings(METRICS_TOKEN='rahasia')
+    def test_token_allowed(self):
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer rahasia')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer salah')
+        self.assertEqual(response.status_code, 403)
+        # Token di query string tidak diterima (tercatat di access log)
+        response = self.client.get('/metrics', {'token': 'rahasia'})
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,255 @@
+"""
+Deferred file uploads for SmartSpace UPY
+
+Dokumen booking (maks 5MB) dan lampiran chat (maks 10MB) sebelumnya
+di-upload ulang ke Cloudinary di dalam request, sehingga worker gunicorn
+(sync) tertahan selama upload berlangsung. Alurnya sekarang:
+
+1. Request body di-stream ke file sementara di UPLOAD_STAGING_DIR
+   (TemporaryFileUploadHandler, per chunk; tidak pernah utuh di memori).
+2. View menyimpan record dengan field file kosong lalu memanggil
+   defer_upload(): file dipindah (rename) ke area staging dan dicatat
+   sebagai FileUpload.
+3. Setelah commit, thread pool (UPLOAD_WORKERS) memeriksa isi file
+   (core.documents: magic bytes, jumlah halaman PDF, preview), lalu
+   meng-upload file ke storage field tersebut dan mengisi field-nya. File
+   yang isinya tidak valid ditolak dan tidak pernah sampai ke storage.
+   Upload yang tertinggal (restart, storage error) diulang oleh job
+   scheduler (retry_pending_uploads).
+
+Jika DEFERRED_UPLOADS mati (default tanpa Cloudinary: storage lokal sudah
+cepat), view menyimpan file langsung seperti sebelumnya; track_upload tetap
+mencatat FileUpload agar pemeriksaan isi berjalan di worker yang sama.
+File tidak valid dihapus dari storage dan field-nya dikosongkan.
+"""
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import documents
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def staging_storage():
+    return FileSystemStorage(location=settings.UPLOAD_STAGING_DIR)
+
+
+def defer_upload(instance, field_name, uploaded_file):
+    """
+    Stage `uploaded_file` untuk field `field_name` milik `instance` (sudah
+    tersimpan). Upload ke storage dijalankan setelah transaksi commit.
+    """
+    from .models import FileUpload
+
+    extension = os.path.splitext(uploaded_file.name)[1].lower()
+    # FileSystemStorage memindahkan TemporaryUploadedFile (rename), bukan menyalin
+    staged_name = staging_storage().save(
+        f'{instance._meta.model_name}/{uuid.uuid4().hex}{extension}', uploaded_file,
+    )
+    upload = FileUpload.objects.create(
+        content_object=instance,
+        field_name=field_name,
+        staged_name=staged_name,
+        original_name=os.path.basename(uploaded_file.name)[:255],
+        size=uploaded_file.size or 0,
+    )
+    transaction.on_commit(lambda: submit(upload.pk))
+    return upload
+
+
+def track_upload(instance, field_name, uploaded_file):
+    """
+    Catat file yang di-upload untuk field `field_name` dan jadwalkan
+    pemeriksaannya. Dengan DEFERRED_UPLOADS file di-stage (defer_upload);
+    selain itu file sudah tersimpan di field dan hanya diperiksa.
+    """
+    from .models import FileUpload
+
+    if settings.DEFERRED_UPLOADS:
+        return defer_upload(instance, field_name, uploaded_file)
+    upload = FileUpload.objects.create(
+        content_object=instance,
+        field_name=field_name,
+        original_name=os.path.basename(uploaded_file.name)[:255],
+        size=uploaded_file.size or 0,
+    )
+    transaction.on_commit(lambda: submit(upload.pk))
+    return upload
+
+
+# ============================================
+# WORKER
+# ============================================
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.UPLOAD_WORKERS, thread_name_prefix='upload')
+    return _executor
+
+
+def submit(upload_id):
+    """Jalankan complete_upload di thread pool (inline jika UPLOAD_WORKERS = 0)"""
+    if settings.UPLOAD_WORKERS <= 0:
+        return complete_upload(upload_id)
+    _get_executor().submit(_run_in_thread, upload_id)
+
+
+def _run_in_thread(upload_id):
+    close_old_connections()
+    try:
+        complete_upload(upload_id)
+    except Exception:
+        logger.exception(f'Upload {upload_id} gagal')
+    finally:
+        close_old_connections()
+
+
+def complete_upload(upload_id):
+    """Periksa file lalu upload ke storage field tujuan. Return True jika selesai."""
+    from .models import FileUpload
+
+    # Klaim baris agar worker lain / job retry tidak memproses upload yang sama;
+    # klaim yang lebih tua dari UPLOAD_RETRY_MINUTES dianggap worker-nya mati
+    now = timezone.now()
+    claimed = FileUpload.objects.filter(pk=upload_id, status=FileUpload.Status.PENDING).filter(
+        Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - timedelta(minutes=settings.UPLOAD_RETRY_MINUTES)),
+    ).update(attempts=F('attempts') + 1, claimed_at=now)
+    if not claimed:
+        return False
+    upload = FileUpload.objects.select_related('content_type').get(pk=upload_id)
+    model = upload.content_type.model_class()
+    staging = staging_storage()
+
+    try:
+        instance = model._base_manager.only('pk', upload.field_name).get(pk=upload.object_id)
+    except model.DoesNotExist:
+        # Record sudah dihapus sebelum upload selesai
+        upload.delete()
+        return False
+
+    field_file = getattr(instance, upload.field_name)
+    try:
+        # File staging (deferred) atau file yang sudah di storage (track_upload biasa)
+        source = staging.open(upload.staged_name, 'rb') if upload.staged_name else field_file.open('rb')
+        with source:
+            result = documents.inspect(source, upload.original_name)
+            if result['error']:
+                return _reject(upload, model, instance, field_file, result)
+            if upload.staged_name:
+                field_file.save(upload.original_name, File(source), save=False)
+                # update(), bukan save(): tidak memicu signals/activity log untuk perubahan teknis ini
+                model._base_manager.filter(pk=instance.pk).update(**{upload.field_name: field_file.name})
+    except Exception as e:
+        failed = upload.attempts >= settings.UPLOAD_MAX_ATTEMPTS
+        FileUpload.objects.filter(pk=upload.pk).update(
+            status=FileUpload.Status.FAILED if failed else FileUpload.Status.PENDING,
+            claimed_at=None,
+            error=str(e)[:2000],
+        )
+        logger.warning(f'Upload {upload.original_name} (#{upload.pk}) gagal, percobaan {upload.attempts}: {e}')
+        return False
+
+    preview_name = ''
+    if result['preview']:
+        try:
+            upload.preview.save(f'{upload.pk}.jpg', ContentFile(result['preview']), save=False)
+            preview_name = upload.preview.name
+        except Exception as e:
+            # Preview hanya pelengkap; upload tetap dianggap selesai
+            logger.warning(f'Preview upload #{upload.pk} gagal disimpan: {e}')
+
+    FileUpload.objects.filter(pk=upload.pk).update(
+        status=FileUpload.Status.DONE, error='', completed_at=timezone.now(),
+        detected_type=result['detected_type'], page_count=result['page_count'], preview=preview_name,
+    )
+    if upload.staged_name:
+        staging.delete(upload.staged_name)
+    return True
+
+
+def _reject(upload, model, instance, field_file, result):
+    """Isi file tidak valid: jangan sajikan dari storage"""
+    from .models import FileUpload
+
+    if upload.staged_name:
+        staging_storage().delete(upload.staged_name)
+    elif field_file.name:
+        field_file.storage.delete(field_file.name)
+        model._base_manager.filter(pk=instance.pk).update(**{upload.field_name: ''})
+    FileUpload.objects.filter(pk=upload.pk).update(
+        status=FileUpload.Status.REJECTED, error=result['error'], completed_at=timezone.now(),
+        detected_type=result['detected_type'],
+    )
+    logger.warning(f'Upload {upload.original_name} (#{upload.pk}) ditolak: {result["error"]}')
+    return False
+
+
+def retry_pending_uploads():
+    """Ulangi upload pending yang tertinggal; return (selesai, gagal)"""
+    from .models import FileUpload
+
+    # Upload baru masih antre di thread pool; beri waktu sebelum diambil alih
+    stale_before = timezone.now() - timedelta(minutes=settings.UPLOAD_RETRY_MINUTES)
+    pending = FileUpload.objects.filter(
+        status=FileUpload.Status.PENDING, created_at__lt=stale_before,
+    ).values_list('pk', flat=True)
+    done, failed = 0, 0
+    for upload_id in list(pending):
+        if complete_upload(upload_id):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
+
+
+def hold_back_pending(messages):
+    """
+    Potong daftar pesan (urut id) sebelum pesan pertama yang lampirannya masih
+    diproses worker.
+
+    Poll chat mengambil `id > last_id`, jadi pesan yang terkirim sebelum
+    upload selesai tidak akan pernah diambil ulang. Dengan ditahan, pesan
+    tersebut (dan setelahnya) dikirim pada poll berikutnya lengkap dengan
+    lampirannya. Upload yang tertahan lebih dari CHAT_ATTACHMENT_HOLD_SECONDS
+    tetap dikirim agar percakapan tidak macet; id-nya dikembalikan sebagai
+    pending.
+
+    Return (pesan yang boleh dikirim, set id pesan yang lampirannya pending).
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from .models import FileUpload, Message
+
+    if not messages:
+        return messages, set()
+    pending = FileUpload.objects.filter(
+        content_type=ContentType.objects.get_for_model(Message),
+        object_id__in=[msg.pk for msg in messages],
+        status=FileUpload.Status.PENDING,
+    ).values_list('object_id', 'created_at')
+    hold_after = timezone.now() - timedelta(seconds=settings.CHAT_ATTACHMENT_HOLD_SECONDS)
+    pending_ids, held_ids = set(), set()
+    for object_id, created_at in pending:
+        pending_ids.add(object_id)
+        if created_at > hold_after:
+            held_ids.add(object_id)
+    for index, msg in enumerate(messages):
+        if msg.pk in held_ids:
+            return messages[:index], pending_ids
+    return messages, pending_ids
@@ -37,6 +37,7 @@ urlpatterns = [
     path('api/messages/', views.api_messages_list, name='api_messages_list'),
     path('api/messages/count/', views.api_messages_count, name='api_messages_count'),
     path('api/messages/poll/', views.api_messages_poll, name='api_messages_poll'),
+    path('api/messages/history/', views.api_messages_history, name='api_messages_history'),
     path('api/messages/read/<int:message_id>/', views.api_message_read, name='api_message_read'),
     path('api/messages/send/', views.api_send_message, name='api_send_message'),
     
@@ -55,6 +56,10 @@ urlpatterns = [
     path('feedback/', views.feedback_page, name='feedback'),
     path('api/feedback/submit/', views.api_feedback_submit, name='api_feedback_submit'),
     
+    # Rooms API
+    path('api/rooms/', views.api_rooms, name='api_rooms'),
+    path('api/rooms/search/', views.api_rooms_search, name='api_rooms_search'),
+    
     # Room Comments API
     path('api/room/<int:room_id>/comments/', views.api_room_comments, name='api_room_comments'),
     path('api/room/<int:room_id>/comment/', views.api_submit_comment, name='api_submit_comment'),
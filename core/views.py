@@ -2,34 +2,40 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.db import IntegrityError
 from django.utils import timezone
-from .models import Room, Booking, User, RoomComment, RoomReport
+from django.urls import reverse
+from django.conf import settings
+from .models import Room, Booking, User, RoomComment, RoomReport, facility_slug
 from .email_utils import send_welcome_email, send_booking_submitted_email
+from .metrics import BOOKINGS_CREATED, BOOKING_CONFLICTS
+from .pagination import get_page_size, keyset_page
+from .caching import cache_page_for_anonymous, get_versions
+from .middleware import skip_session_refresh
+from . import counters, suggestions, uploads
 
 
+@cache_page_for_anonymous('rooms', 'testimonials')
 def home(request):
     """View untuk halaman utama - menampilkan daftar ruangan"""
     from .models import Testimonial
     
-    rooms = Room.objects.filter(is_active=True).order_by('nomor_ruangan')
+    # Queryset lazy: hanya dievaluasi jika fragment {% cache %} di home.html belum ada.
+    # Grid beranda hanya menampilkan 12 ruangan; daftar lengkap ada di /rooms/ (via /api/rooms/)
+    rooms = Room.objects.filter(is_active=True).order_by('nomor_ruangan')[:12]
     testimonials = Testimonial.objects.filter(is_active=True).order_by('order', '-created_at')
     
     context = {
         'rooms': rooms,
         'testimonials': testimonials,
+        'cache_versions': get_versions('rooms', 'testimonials'),
+        'home_cache_timeout': settings.HOME_CACHE_TIMEOUT,
     }
     
     return render(request, 'home.html', context)
 
 
 def rooms_list(request):
-    """View untuk halaman daftar semua ruangan"""
-    rooms = Room.objects.filter(is_active=True).order_by('nomor_ruangan')
-    
-    context = {
-        'rooms': rooms,
-    }
-    
-    return render(request, 'rooms_list.html', context)
+    """View untuk halaman daftar semua ruangan; grid dimuat bertahap dari /api/rooms/"""
+    return render(request, 'rooms_list.html')
 
 
 def room_detail(request, pk):
@@ -45,6 +51,11 @@ def room_detail(request, pk):
         tanggal_selesai = request.POST.get('tanggal_selesai', '')
         jumlah_tamu = request.POST.get('jumlah_tamu', '1')
         dokumen = request.FILES.get('dokumen_pendukung', None)
+        # Peminjaman berulang (opsional)
+        ulangi = request.POST.get('ulangi', '')
+        ulangi_sampai = request.POST.get('ulangi_sampai', '')
+        tanggal_dikecualikan = request.POST.get('tanggal_dikecualikan', '')
+        lewati_bentrok = request.POST.get('lewati_bentrok') == 'on'
         
         # Preserve form data in case of error
         form_data = {
@@ -52,6 +63,10 @@ def room_detail(request, pk):
             'tanggal_mulai': tanggal_mulai,
             'tanggal_selesai': tanggal_selesai,
             'jumlah_tamu': jumlah_tamu,
+            'ulangi': ulangi,
+            'ulangi_sampai': ulangi_sampai,
+            'tanggal_dikecualikan': tanggal_dikecualikan,
+            'lewati_bentrok': lewati_bentrok,
         }
         
         # Validasi sederhana
@@ -111,14 +126,55 @@ def room_detail(request, pk):
             except ValueError:
                 errors.append('Format tanggal tidak valid')
         
+        series = None
+        if ulangi:
+            series, series_errors = _build_booking_series(
+                request, room, ulangi, ulangi_sampai, tanggal_dikecualikan, dt_mulai, dt_selesai,
+            )
+            errors.extend(series_errors)
 
         if errors:
             for error in errors:
                 messages.error(request, error)
+        elif series is not None:
+            series.jumlah_tamu = jumlah_tamu_int
+            series.dokumen_pendukung = None if settings.DEFERRED_UPLOADS else dokumen
+            bookings, conflicts = series.create_bookings(skip_conflicts=lewati_bentrok)
+            skipped = [
+                {
+                    'date': timezone.localtime(start).strftime('%d %b %Y'),
+                    'time': f"{timezone.localtime(start):%H:%M}-{timezone.localtime(end):%H:%M}",
+                    'conflict': f"{timezone.localtime(conflict.tanggal_mulai):%H:%M}-"
+                                f"{timezone.localtime(conflict.tanggal_selesai):%H:%M}",
+                }
+                for start, end, conflict in conflicts
+            ]
+            if conflicts:
+                BOOKING_CONFLICTS.labels(source='room_detail_series').inc(len(conflicts))
+            if bookings:
+                uploads.track_upload(series, 'dokumen_pendukung', dokumen)
+                BOOKINGS_CREATED.labels(source='room_detail_series').inc(len(bookings))
+                skipped_note = (
+                    f' {len(skipped)} tanggal bentrok dilewati: ' + ', '.join(item['date'] for item in skipped) + '.'
+                    if skipped else ''
+                )
+                messages.success(
+                    request,
+                    f'{len(bookings)} peminjaman berulang untuk "{room.nomor_ruangan}" berhasil diajukan! '
+                    f'Status: Pending.{skipped_note}'
+                )
+                return redirect('home')
+            messages.error(
+                request,
+                f'{len(skipped)} jadwal bentrok dengan peminjaman lain. Pilih jam lain atau centang '
+                f'"Lewati tanggal yang bentrok".' if skipped else 'Tidak ada jadwal yang bisa dibuat.'
+            )
+            form_data['series_conflicts'] = skipped
         else:
             # Check for booking conflicts BEFORE creating
             conflict = Booking.check_conflict(room, dt_mulai, dt_selesai)
             if conflict:
+                BOOKING_CONFLICTS.labels(source='room_detail').inc()
                 from django.utils import timezone as tz
                 conflict_start = tz.localtime(conflict.tanggal_mulai).strftime('%H:%M')
                 conflict_end = tz.localtime(conflict.tanggal_selesai).strftime('%H:%M')
@@ -128,6 +184,10 @@ def room_detail(request, pk):
                     f'Maaf, jam {conflict_start}-{conflict_end} pada tanggal {conflict_date} '
                     f'sudah dibooking. Silakan pilih jam lain yang tersedia.'
                 )
+                # Slot kosong terdekat: ruangan ini (hari sama/sebelah) atau ruangan sejenis
+                form_data['suggestions'] = suggestions.serialize(
+                    suggestions.suggest_slots(room, dt_mulai, dt_selesai, jumlah_tamu_int), room
+                )
             else:
                 # Buat booking baru
                 # Cek apakah user login, jika tidak gunakan user pertama (untuk demo)
@@ -147,16 +207,19 @@ def room_detail(request, pk):
                         user.first_name = nama_lengkap
                         user.save()
                 
-                # Simpan booking
+                # Simpan booking; dengan DEFERRED_UPLOADS dokumen di-upload ke storage di background
                 booking = Booking.objects.create(
                     user=user,
                     room=room,
                     tanggal_mulai=dt_mulai,
                     tanggal_selesai=dt_selesai,
                     jumlah_tamu=jumlah_tamu_int,
-                    dokumen_pendukung=dokumen,
+                    dokumen_pendukung=None if settings.DEFERRED_UPLOADS else dokumen,
                     status='Pending'
                 )
+                # Isi dokumen diperiksa (dan di-upload jika deferred) oleh worker
+                uploads.track_upload(booking, 'dokumen_pendukung', dokumen)
+                BOOKINGS_CREATED.labels(source='room_detail').inc()
                 
                 messages.success(
                     request, 
@@ -173,6 +236,43 @@ def room_detail(request, pk):
     return render(request, 'room_detail.html', context)
 
 
+def _build_booking_series(request, room, frequency, until, exceptions, dt_mulai, dt_selesai):
+    """Validasi input peminjaman berulang; return (BookingSeries belum disimpan atau None, errors)"""
+    from datetime import date
+    from .models import BookingSeries
+    
+    errors = []
+    if not request.user.is_authenticated:
+        errors.append('Login terlebih dahulu untuk mengajukan peminjaman berulang')
+    if frequency not in BookingSeries.Frequency.values:
+        errors.append('Pilihan pengulangan tidak valid')
+    try:
+        until_date = date.fromisoformat(until)
+    except ValueError:
+        until_date = None
+        errors.append('Tanggal akhir pengulangan wajib diisi')
+    try:
+        skipped = sorted({date.fromisoformat(d.strip()).isoformat() for d in exceptions.split(',') if d.strip()})
+    except ValueError:
+        skipped = []
+        errors.append('Format tanggal yang dikecualikan harus YYYY-MM-DD, dipisah koma')
+    if errors or dt_mulai is None or dt_selesai is None:
+        return None, errors
+    
+    if timezone.localtime(dt_mulai).date() != timezone.localtime(dt_selesai).date():
+        errors.append('Peminjaman berulang harus selesai di hari yang sama')
+    if until_date < timezone.localtime(dt_mulai).date():
+        errors.append('Tanggal akhir pengulangan harus setelah tanggal mulai')
+    
+    series = BookingSeries(
+        user=request.user, room=room, frequency=frequency,
+        tanggal_mulai=dt_mulai, tanggal_selesai=dt_selesai, until=until_date, exceptions=skipped,
+    )
+    if not errors and len(series.occurrences()) > settings.BOOKING_SERIES_MAX_OCCURRENCES:
+        errors.append(f'Maksimal {settings.BOOKING_SERIES_MAX_OCCURRENCES} kejadian per peminjaman berulang')
+    return (None if errors else series), errors
+
+
 def report_room(request, pk):
     """View untuk melaporkan masalah ruangan"""
     room = get_object_or_404(Room, pk=pk)
@@ -211,21 +311,12 @@ def report_room(request, pk):
 
 def user_dashboard(request):
     """View untuk dashboard pengguna - menampilkan daftar peminjaman"""
-    # Debug: Print to terminal to confirm this code is running
-    print("=" * 50)
-    print("DASHBOARD VIEW CALLED")
-    print(f"User authenticated: {request.user.is_authenticated}")
-    print(f"User: {request.user}")
-    print(f"Database engine: {Booking.objects.db}")
-    print("=" * 50)
-    
     # Redirect to home with login required if not authenticated
     if not request.user.is_authenticated:
-        print(">>> REDIRECTING: User not authenticated!")
         return redirect('/?login=required')
     
     # Get bookings for authenticated user only
-    bookings = Booking.objects.filter(user=request.user).order_by('-created_at')
+    bookings = Booking.objects.filter(user=request.user).select_related('room').order_by('-created_at')
     
     # Pre-compute formatted values to avoid template tag line-break issues
     # Use Django's localtime to convert to local timezone
@@ -424,12 +515,12 @@ def api_logout(request):
     return JsonResponse({'success': True, 'message': 'Logout berhasil'})
 
 
+@skip_session_refresh
 def api_check_auth(request):
     """API endpoint untuk cek status login"""
     if request.user.is_authenticated:
-        from .models import Message
-        unread_count = Message.objects.filter(receiver=request.user, is_read=False).count()
-        wishlist_count = request.user.wishlists.count()
+        # Satu baca cache; counter dijaga signals (core.counters)
+        user_counters = counters.get_counters(request.user.id)
         
         return JsonResponse({
             'authenticated': True,
@@ -443,8 +534,9 @@ def api_check_auth(request):
                 'angkatan': request.user.angkatan,
                 'nomor_hp': request.user.nomor_hp,
                 'role': request.user.role,
-                'unread_messages': unread_count,
-                'wishlist_count': wishlist_count
+                'unread_messages': user_counters['unread_messages'],
+                'wishlist_count': user_counters['wishlist'],
+                'pending_bookings': user_counters['pending_bookings'],
             }
         })
     return JsonResponse({'authenticated': False})
@@ -571,7 +663,8 @@ def reset_password_page(request, token):
 # ============================================
 # WISHLIST API
 # ============================================
-from .models import Wishlist, Message
+from .models import Wishlist, Message, ConversationReadState, is_image_name
+
 
 @csrf_exempt
 def api_wishlist_toggle(request):
@@ -599,14 +692,14 @@ def api_wishlist_toggle(request):
                 'success': True,
                 'action': 'removed',
                 'message': f'{room.nomor_ruangan} dihapus dari wishlist',
-                'wishlist_count': request.user.wishlists.count()
+                'wishlist_count': counters.get_counters(request.user.id)['wishlist']
             })
         
         return JsonResponse({
             'success': True,
             'action': 'added',
             'message': f'{room.nomor_ruangan} ditambahkan ke wishlist',
-            'wishlist_count': request.user.wishlists.count()
+            'wishlist_count': counters.get_counters(request.user.id)['wishlist']
         })
         
     except Room.DoesNotExist:
@@ -620,7 +713,14 @@ def api_wishlist_list(request):
     if not request.user.is_authenticated:
         return JsonResponse({'success': False, 'message': 'Login required'}, status=401)
     
-    wishlists = Wishlist.objects.filter(user=request.user).select_related('room')
+    try:
+        wishlists, next_cursor = keyset_page(
+            Wishlist.objects.filter(user=request.user).select_related('room'),
+            cursor=request.GET.get('cursor'),
+            limit=get_page_size(request),
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Cursor tidak valid'}, status=400)
     
     items = []
     for w in wishlists:
@@ -636,7 +736,9 @@ def api_wishlist_list(request):
     return JsonResponse({
         'success': True,
         'count': len(items),
-        'items': items
+        'items': items,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
     })
 
 
@@ -734,13 +836,27 @@ def api_profile_get(request):
 # ============================================
 # MESSAGES API
 # ============================================
+def mark_conversation_read(user, message_id):
+    """Majukan watermark baca user sampai message_id (satu UPDATE bersyarat)"""
+    if ConversationReadState.mark_read(user.id, ConversationReadState.Side.USER, message_id):
+        counters.invalidate([user.id], 'unread_messages')
+
+
 def api_messages_list(request):
     """Get user's messages"""
     if not request.user.is_authenticated:
         return JsonResponse({'success': False, 'message': 'Login required'}, status=401)
     
-    messages = Message.objects.filter(receiver=request.user).select_related('sender')
+    try:
+        messages, next_cursor = keyset_page(
+            Message.objects.filter(receiver=request.user).select_related('sender'),
+            cursor=request.GET.get('cursor'),
+            limit=get_page_size(request),
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Cursor tidak valid'}, status=400)
     
+    ConversationReadState.annotate_is_read(messages, request.user.id)
     items = []
     for msg in messages:
         items.append({
@@ -755,39 +871,42 @@ def api_messages_list(request):
     return JsonResponse({
         'success': True,
         'count': len(items),
-        'unread_count': Message.objects.filter(receiver=request.user, is_read=False).count(),
-        'messages': items
+        'unread_count': counters.get_counters(request.user.id)['unread_messages'],
+        'messages': items,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
     })
 
 
 @csrf_exempt
 def api_message_read(request, message_id):
-    """Mark message as read"""
+    """Mark message (dan semua pesan sebelumnya di percakapan) as read"""
     if not request.user.is_authenticated:
         return JsonResponse({'success': False, 'message': 'Login required'}, status=401)
     
     try:
-        message = Message.objects.get(pk=message_id, receiver=request.user)
-        message.is_read = True
-        message.save()
+        message = Message.objects.only('id').get(pk=message_id, receiver=request.user)
+        mark_conversation_read(request.user, message.id)
         
         return JsonResponse({
             'success': True,
-            'unread_count': Message.objects.filter(receiver=request.user, is_read=False).count()
+            'unread_count': counters.get_counters(request.user.id)['unread_messages']
         })
     except Message.DoesNotExist:
         return JsonResponse({'success': False, 'message': 'Message not found'}, status=404)
 
 
+@skip_session_refresh
 def api_messages_count(request):
     """Get unread message count"""
     if not request.user.is_authenticated:
         return JsonResponse({'count': 0})
     
-    count = Message.objects.filter(receiver=request.user, is_read=False).count()
+    count = counters.get_counters(request.user.id)['unread_messages']
     return JsonResponse({'count': count})
 
 
+@skip_session_refresh
 def api_messages_poll(request):
     """Poll for new messages - returns messages after a given ID"""
     if not request.user.is_authenticated:
@@ -810,17 +929,15 @@ def api_messages_poll(request):
         return JsonResponse({'success': True, 'messages': [], 'count': 0})
     
     # Get new messages between user and ANY admin
-    new_messages = Message.objects.filter(
+    new_messages = list(Message.objects.filter(
         Q(sender_id__in=all_admin_ids, receiver=user) |
         Q(sender=user, receiver_id__in=all_admin_ids)
-    ).filter(id__gt=last_id).select_related('sender').order_by('created_at')
+    ).filter(id__gt=last_id).select_related('sender').order_by('created_at'))
+    # Pesan yang lampirannya masih di-upload dikirim pada poll berikutnya
+    new_messages, pending_ids = uploads.hold_back_pending(new_messages)
     
-    # Mark incoming messages from any admin as read
-    Message.objects.filter(
-        sender_id__in=all_admin_ids,
-        receiver=user,
-        is_read=False
-    ).update(is_read=True)
+    # Mark incoming messages from any admin as read; tanpa pesan baru tidak ada write
+    mark_conversation_read(user, max((msg.id for msg in new_messages), default=0))
     
     messages_data = []
     for msg in new_messages:
@@ -830,7 +947,9 @@ def api_messages_poll(request):
             'is_from_admin': msg.sender_id in all_admin_ids,
             'is_from_user': msg.sender == user,
             'time': msg.created_at.strftime('%d %b, %H:%M'),
-            'attachment_url': msg.attachment.url if msg.attachment else None,
+            'attachment_url': msg.attachment_url,
+            'attachment_pending': msg.id in pending_ids,
+            'attachment_filename': msg.attachment_filename,
             'is_image': msg.is_image if hasattr(msg, 'is_image') else False
         })
     
@@ -851,25 +970,25 @@ def profile_page(request):
     
     user = request.user
     
-    # Get booking statistics
-    bookings = Booking.objects.filter(user=user)
-    total_bookings = bookings.count()
-    pending_bookings = bookings.filter(status='Pending').count()
-    approved_bookings = bookings.filter(status='Approved').count()
-    rejected_bookings = bookings.filter(status='Rejected').count()
+    # Get booking statistics (satu query agregat)
+    from django.db.models import Count, Q
+    stats = Booking.objects.filter(user=user).aggregate(
+        total=Count('id'),
+        approved=Count('id', filter=Q(status='Approved')),
+        rejected=Count('id', filter=Q(status='Rejected')),
+    )
     
-    # Get wishlist and message counts
-    wishlist_count = user.wishlists.count()
-    unread_messages = Message.objects.filter(receiver=user, is_read=False).count()
+    # Pending, wishlist & pesan belum dibaca dari counter cache
+    user_counters = counters.get_counters(user.id)
     
     context = {
         'user': user,
-        'total_bookings': total_bookings,
-        'pending_bookings': pending_bookings,
-        'approved_bookings': approved_bookings,
-        'rejected_bookings': rejected_bookings,
-        'wishlist_count': wishlist_count,
-        'unread_messages': unread_messages,
+        'total_bookings': stats['total'],
+        'pending_bookings': user_counters['pending_bookings'],
+        'approved_bookings': stats['approved'],
+        'rejected_bookings': stats['rejected'],
+        'wishlist_count': user_counters['wishlist'],
+        'unread_messages': user_counters['unread_messages'],
     }
     
     return render(request, 'profile.html', context)
@@ -884,6 +1003,18 @@ def wishlist_page(request):
     return render(request, 'wishlist.html', {'wishlists': wishlists})
 
 
+CHAT_PAGE_SIZE = 30
+
+
+def get_conversation_messages(user, all_admin_ids):
+    """Semua pesan antara user dan admin mana pun (dua arah)"""
+    from django.db.models import Q
+    return Message.objects.filter(
+        Q(sender=user, receiver_id__in=all_admin_ids) |
+        Q(sender_id__in=all_admin_ids, receiver=user)
+    )
+
+
 def messages_page(request):
     """Messages page view - Chat with Admin"""
     if not request.user.is_authenticated:
@@ -900,38 +1031,72 @@ def messages_page(request):
     if not admin_user:
         admin_user = User.objects.filter(role='Admin').first()
     
-    # Get all messages between this user and ANY admin (both directions)
+    # Hanya halaman terbaru yang dirender; pesan lama dimuat lewat api_messages_history
+    conversation = []
+    older_cursor = None
     if all_admin_ids:
-        conversation = Message.objects.filter(
-            Q(sender=request.user, receiver_id__in=all_admin_ids) |
-            Q(sender_id__in=all_admin_ids, receiver=request.user)
-        ).select_related('sender', 'receiver').order_by('created_at')
-        
-        # Mark admin messages as read
-        Message.objects.filter(
-            sender_id__in=all_admin_ids, 
-            receiver=request.user, 
-            is_read=False
-        ).update(is_read=True)
-    else:
-        conversation = Message.objects.none()
-    
-    unread_count = Message.objects.filter(
-        receiver=request.user, 
-        is_read=False
-    ).count()
-    
-    # Get conversation message IDs as JSON for JavaScript
-    conversation_ids_json = json.dumps([msg.id for msg in conversation])
+        latest, older_cursor = keyset_page(
+            get_conversation_messages(request.user, all_admin_ids).select_related('sender'),
+            limit=CHAT_PAGE_SIZE,
+        )
+        conversation = latest[::-1]  # Oldest first for chat display
+        
+        # Mark admin messages as read (pesan terbaru ada di halaman ini)
+        mark_conversation_read(request.user, max((msg.id for msg in conversation), default=0))
+        ConversationReadState.annotate_is_read(conversation, request.user.id)
+    
+    unread_count = counters.get_counters(request.user.id)['unread_messages']
     
     return render(request, 'messages.html', {
         'conversation': conversation,
-        'conversation_ids_json': conversation_ids_json,
+        'last_message_id': max((msg.id for msg in conversation), default=0),
+        'older_cursor': older_cursor,
         'admin_user': admin_user,
         'unread_count': unread_count
     })
 
 
+def api_messages_history(request):
+    """Load older chat messages (keyset pagination, terbaru duluan)"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'success': False, 'message': 'Login required'}, status=401)
+    
+    from django.db.models import Q
+    all_admin_ids = list(User.objects.filter(
+        Q(is_superuser=True) | Q(role='Admin') | Q(is_staff=True)
+    ).values_list('id', flat=True))
+    if not all_admin_ids:
+        return JsonResponse({'success': True, 'messages': [], 'next_cursor': None, 'has_more': False})
+    
+    try:
+        history, next_cursor = keyset_page(
+            get_conversation_messages(request.user, all_admin_ids),
+            cursor=request.GET.get('cursor'),
+            limit=get_page_size(request, default=CHAT_PAGE_SIZE),
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Cursor tidak valid'}, status=400)
+    
+    ConversationReadState.annotate_is_read(history, request.user.id)
+    messages_data = [{
+        'id': msg.id,
+        'content': msg.content,
+        'is_from_user': msg.sender_id == request.user.id,
+        'is_read': msg.is_read,
+        'time': timezone.localtime(msg.created_at).strftime('%d %b, %H:%M'),
+        'attachment_url': msg.attachment_url,
+        'attachment_filename': msg.attachment_filename if msg.attachment else None,
+        'is_image': msg.is_image,
+    } for msg in history]
+    
+    return JsonResponse({
+        'success': True,
+        'messages': messages_data,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    })
+
+
 @csrf_exempt
 def api_send_message(request):
     """API endpoint for user to send message to admin"""
@@ -977,15 +1142,17 @@ def api_send_message(request):
                     'message': 'Ukuran file maksimal 10MB'
                 }, status=400)
         
-        # Create message
+        # Create message; lampiran di-upload di background jika DEFERRED_UPLOADS
+        deferred = bool(attachment) and settings.DEFERRED_UPLOADS
         message = Message.objects.create(
             sender=request.user,
             receiver=admin_user,
             content=content or 'Mengirim lampiran',
             message_type='user_to_admin',
-            attachment=attachment,
-            is_read=False
+            attachment=None if deferred else attachment
         )
+        if attachment:
+            uploads.track_upload(message, 'attachment', attachment)
         
         response_data = {
             'success': True,
@@ -994,9 +1161,10 @@ def api_send_message(request):
                 'id': message.id,
                 'content': message.content,
                 'created_at': message.created_at.isoformat(),
-                'attachment_url': message.attachment.url if message.attachment else None,
-                'is_image': message.is_image,
-                'attachment_filename': message.attachment_filename
+                'attachment_url': message.attachment_url,
+                'attachment_pending': deferred,
+                'is_image': is_image_name(attachment.name) if attachment else False,
+                'attachment_filename': message.attachment_filename or (attachment.name if attachment else None)
             }
         }
         
@@ -1011,8 +1179,6 @@ def api_send_message(request):
 @csrf_exempt
 def api_booking_cancel(request):
     """API endpoint to cancel a pending booking"""
-    print("DEBUG: cancel request received")
-    
     if not request.user.is_authenticated:
         return JsonResponse({'success': False, 'message': 'Login required'}, status=401)
     
@@ -1022,7 +1188,6 @@ def api_booking_cancel(request):
     try:
         data = json.loads(request.body)
         booking_id = data.get('booking_id')
-        print(f"DEBUG: attempting to cancel booking_id={booking_id} for user={request.user}")
         
         if not booking_id:
             return JsonResponse({'success': False, 'message': 'booking_id required'}, status=400)
@@ -1032,7 +1197,6 @@ def api_booking_cancel(request):
         
         # Can only cancel pending bookings
         if booking.status != 'Pending':
-            print(f"DEBUG: booking status is {booking.status}, cannot cancel")
             return JsonResponse({
                 'success': False, 
                 'message': f'Tidak dapat membatalkan peminjaman dengan status "{booking.status}"'
@@ -1042,7 +1206,6 @@ def api_booking_cancel(request):
         room_name = booking.room.nomor_ruangan
         booking.status = 'Cancelled'
         booking.save()
-        print(f"DEBUG: booking {booking_id} cancelled successfully")
         
         return JsonResponse({
             'success': True,
@@ -1050,10 +1213,8 @@ def api_booking_cancel(request):
         })
         
     except Booking.DoesNotExist:
-        print("DEBUG: booking not found")
         return JsonResponse({'success': False, 'message': 'Peminjaman tidak ditemukan'}, status=404)
     except Exception as e:
-        print(f"DEBUG: exception in cancel: {str(e)}")
         return JsonResponse({'success': False, 'message': str(e)}, status=500)
 
 
@@ -1137,7 +1298,7 @@ def api_calendar_bookings(request, room_id):
         return JsonResponse({'success': False, 'message': 'Invalid year or month'}, status=400)
     
     # Get bookings for this room in this month
-    bookings = Booking.get_approved_bookings_for_room(room, year, month)
+    bookings = Booking.get_approved_bookings_for_room(room, year, month).select_related('user')
     
     booking_data = []
     for booking in bookings:
@@ -1239,6 +1400,10 @@ def api_check_booking_conflict(request):
         room_id = data.get('room_id')
         start_time = data.get('start_time')
         end_time = data.get('end_time')
+        try:
+            jumlah_tamu = max(int(data.get('jumlah_tamu') or 1), 1)
+        except (TypeError, ValueError):
+            jumlah_tamu = 1
         
         if not all([room_id, start_time, end_time]):
             return JsonResponse({
@@ -1270,6 +1435,7 @@ def api_check_booking_conflict(request):
         conflict = Booking.check_conflict(room, dt_start, dt_end)
         
         if conflict:
+            BOOKING_CONFLICTS.labels(source='api_check_conflict').inc()
             from django.utils import timezone as tz
             local_start = tz.localtime(conflict.tanggal_mulai)
             local_end = tz.localtime(conflict.tanggal_selesai)
@@ -1285,6 +1451,9 @@ def api_check_booking_conflict(request):
                     'date': local_start.strftime('%d %b %Y'),
                     'user': conflict.user.get_full_name() or conflict.user.username
                 },
+                'suggestions': suggestions.serialize(
+                    suggestions.suggest_slots(room, dt_start, dt_end, jumlah_tamu), room
+                ),
                 'message': f"Jam {local_start.strftime('%H:%M')}-{local_end.strftime('%H:%M')} sudah dibooking untuk '{conflict.keperluan[:30]}'. Pilih jam lain yang tersedia."
             })
         
@@ -1412,7 +1581,14 @@ def api_room_comments(request, room_id):
     """API endpoint untuk get komentar ruangan"""
     try:
         room = get_object_or_404(Room, pk=room_id)
-        comments = room.comments.filter(is_approved=True).select_related('user')
+        try:
+            comments, next_cursor = keyset_page(
+                room.comments.filter(is_approved=True).select_related('user'),
+                cursor=request.GET.get('cursor'),
+                limit=get_page_size(request),
+            )
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'Cursor tidak valid'}, status=400)
         
         comments_data = [{
             'id': c.id,
@@ -1426,8 +1602,210 @@ def api_room_comments(request, room_id):
         return JsonResponse({
             'success': True,
             'comments': comments_data,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
             'average_rating': float(room.average_rating),
             'total_reviews': room.total_reviews
         })
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)}, status=500)
+
+
+# ============================================
+# ROOMS LIST API
+# ============================================
+ROOMS_API_ORDERING = {
+    'name': ('nomor_ruangan',),
+    '-name': ('-nomor_ruangan',),
+    'capacity': ('kapasitas', 'nomor_ruangan'),
+    '-capacity': ('-kapasitas', 'nomor_ruangan'),
+    'rating': ('average_rating', 'nomor_ruangan'),
+    '-rating': ('-average_rating', '-total_reviews', 'nomor_ruangan'),
+    'newest': ('-created_at', '-pk'),
+}
+
+
+def _split_param(request, name):
+    """'Lab,kelas' -> ['kelas', 'lab'] (urut & unik agar cache key stabil)"""
+    return sorted({v.strip() for v in request.GET.get(name, '').split(',') if v.strip()})
+
+
+def _choice_param(request, name, choices, label):
+    by_lower = {value.lower(): value for value in choices}
+    values = []
+    for value in _split_param(request, name):
+        if value.lower() not in by_lower:
+            raise ValueError(f'{label} tidak dikenal: {value}')
+        values.append(by_lower[value.lower()])
+    return values
+
+
+def _int_param(request, name, default=None, minimum=0):
+    value = request.GET.get(name, '').strip()
+    if not value:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f'{name} harus berupa angka')
+    if number < minimum:
+        raise ValueError(f'{name} minimal {minimum}')
+    return number
+
+
+def parse_rooms_api_params(request):
+    """Normalisasi query string /api/rooms/; raise ValueError untuk nilai yang tidak valid"""
+    query = request.GET.get('q', '').strip()
+    ordering = request.GET.get('ordering', '').strip() or ('relevance' if query else 'name')
+    if ordering not in ROOMS_API_ORDERING and not (query and ordering == 'relevance'):
+        raise ValueError(f'Urutan tidak dikenal: {ordering}')
+    
+    return {
+        'tipe': _choice_param(request, 'tipe', Room.TipeRuangan.values, 'Tipe ruangan'),
+        'status': _choice_param(request, 'status', Room.RoomStatus.values, 'Status'),
+        'fasilitas': sorted({facility_slug(f) for f in _split_param(request, 'fasilitas')} - {''}),
+        'min_capacity': _int_param(request, 'min_capacity'),
+        'max_capacity': _int_param(request, 'max_capacity'),
+        'q': query,
+        'ordering': ordering,
+        'page': _int_param(request, 'page', default=1, minimum=1),
+        'limit': get_page_size(request, default=12, maximum=48),
+    }
+
+
+def filter_rooms(params):
+    """Queryset ruangan aktif sesuai parameter dari parse_rooms_api_params"""
+    from . import search
+    
+    rooms = Room.objects.filter(is_active=True)
+    if params['tipe']:
+        rooms = rooms.filter(tipe_ruangan__in=params['tipe'])
+    if params['status']:
+        rooms = rooms.filter(status__in=params['status'])
+    if params['min_capacity'] is not None:
+        rooms = rooms.filter(kapasitas__gte=params['min_capacity'])
+    if params['max_capacity'] is not None:
+        rooms = rooms.filter(kapasitas__lte=params['max_capacity'])
+    # Prefix pada slug tag (ber-index): 'proyektor' juga cocok dengan 'Proyektor 4K'
+    for slug in params['fasilitas']:
+        rooms = rooms.filter(pk__in=Room.facilities.through.objects.filter(
+            facility__slug__startswith=slug,
+        ).values('room_id'))
+    
+    if params['q']:
+        rooms = search.search(rooms, params['q'])
+    if params['ordering'] != 'relevance':
+        rooms = rooms.order_by(*ROOMS_API_ORDERING[params['ordering']])
+    return rooms
+
+
+def rooms_api_etag(params):
+    """
+    ETag = versi data ruangan (MAX(updated_at) + jumlah baris, 1 query agregat)
+    + hash parameter. Berubah setiap ada ruangan yang disimpan/dihapus.
+    """
+    import hashlib
+    from django.db.models import Count, Max
+    
+    version = Room.objects.aggregate(latest=Max('updated_at'), total=Count('id'))
+    latest = version['latest'].isoformat() if version['latest'] else '-'
+    raw = json.dumps([latest, version['total'], params], sort_keys=True)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def serialize_room_card(room):
+    fasilitas = room.fasilitas_list
+    return {
+        'id': room.id,
+        'name': room.nomor_ruangan,
+        'type': room.tipe_ruangan,
+        'type_label': room.get_tipe_ruangan_display(),
+        'capacity': room.kapasitas,
+        'status': room.status,
+        'status_label': room.get_status_display(),
+        'rating': float(room.average_rating),
+        'total_reviews': room.total_reviews,
+        'photo_url': room.foto_thumbnail_url,
+        'photo_srcset': room.foto_srcset_webp,
+        'fasilitas': fasilitas[:3],
+        'fasilitas_count': len(fasilitas),
+        'url': reverse('room_detail', args=[room.id]),
+    }
+
+
+def api_rooms(request):
+    """
+    Daftar ruangan aktif dengan filter server-side & pagination.
+    
+    Query: tipe, status, fasilitas (dipisah koma), min_capacity, max_capacity,
+    q, ordering, page, limit. Mendukung conditional GET (If-None-Match) dan
+    payload di-cache per set parameter + versi data.
+    """
+    from django.core.cache import cache
+    from django.core.paginator import Paginator
+    from django.utils.cache import get_conditional_response, patch_cache_control
+    
+    try:
+        params = parse_rooms_api_params(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    
+    version = rooms_api_etag(params)
+    etag = f'"{version}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        # Versi data ada di dalam key, jadi tidak perlu invalidasi eksplisit
+        cache_key = f'rooms_api:{version}'
+        payload = cache.get(cache_key)
+        if payload is None:
+            paginator = Paginator(filter_rooms(params), params['limit'])
+            if params['page'] <= paginator.num_pages:
+                page = paginator.page(params['page'])
+                results, has_next = [serialize_room_card(room) for room in page], page.has_next()
+            else:
+                results, has_next = [], False
+            payload = {
+                'success': True,
+                'count': paginator.count,
+                'page': params['page'],
+                'num_pages': paginator.num_pages,
+                'has_next': has_next,
+                'results': results,
+            }
+            cache.set(cache_key, payload, settings.ROOMS_API_CACHE_TIMEOUT)
+        response = JsonResponse(payload)
+    
+    response['ETag'] = etag
+    # Browser selalu revalidasi; jawaban 304 tidak membawa body
+    patch_cache_control(response, max_age=0, must_revalidate=True)
+    return response
+
+
+# ============================================
+# ROOM SEARCH API
+# ============================================
+def api_rooms_search(request):
+    """Public room search (nama, fasilitas, deskripsi) diurutkan berdasarkan relevansi"""
+    from . import search
+    
+    query = request.GET.get('q', '').strip()
+    if len(query) < 2:
+        return JsonResponse({'success': False, 'message': 'Kata kunci minimal 2 karakter'}, status=400)
+    
+    limit = get_page_size(request, default=10, maximum=50)
+    rooms = search.search(Room.objects.filter(is_active=True), query)[:limit]
+    
+    return JsonResponse({
+        'success': True,
+        'query': query,
+        'results': [{
+            'id': room.id,
+            'name': room.nomor_ruangan,
+            'type': room.get_tipe_ruangan_display(),
+            'capacity': room.kapasitas,
+            'status': room.status,
+            'rating': float(room.average_rating),
+            'url': reverse('room_detail', args=[room.id]),
+            'score': round(room.search_rank, 4),
+        } for room in rooms]
+    })
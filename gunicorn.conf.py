@@ -0,0 +1,28 @@
+"""
+Gunicorn configuration for SmartSpace UPY
+Dibaca otomatis oleh `gunicorn smartspaceupy.wsgi` (Procfile / railway.toml).
+
+Menyiapkan direktori multiprocess prometheus_client agar /metrics
+menggabungkan metrik dari semua worker.
+"""
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), 'smartspace-metrics'),
+)
+
+
+def on_starting(server):
+    """Hapus file metrik sisa proses sebelumnya"""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Tandai worker mati agar gauge livesum tidak menghitungnya lagi"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
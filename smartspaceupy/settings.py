@@ -50,6 +50,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # Trigram & full-text search lookups (lihat core.search)
     'cloudinary',
     'cloudinary_storage',
     'axes',  # Rate limiting for login
@@ -123,6 +124,11 @@ UNFOLD = {
                         "link": reverse_lazy("admin:core_booking_changelist"),
                         "badge": "core.admin_views.get_pending_booking_count",
                     },
+                    {
+                        "title": "Import Jadwal",
+                        "icon": "upload_file",
+                        "link": "/smartspace-panel-upy/import/schedule/",
+                    },
                     {
                         "title": "Wishlist",
                         "icon": "favorite",
@@ -206,12 +212,15 @@ UNFOLD = {
 }
 
 MIDDLEWARE = [
+    'core.middleware.RequestProfilingMiddleware',  # Opt-in, see PROFILING_ENABLED
+    'core.middleware.MetricsMiddleware',  # Prometheus request metrics
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Static files for production
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.ThrottledSessionMiddleware',  # SessionMiddleware + refresh expiry ber-interval
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ActivityLogMiddleware',  # Buffered audit log with acting user & IP
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'axes.middleware.AxesMiddleware',  # Rate limiting for login
@@ -258,6 +267,24 @@ else:
     }
 
 
+# Cache - Redis jika REDIS_URL di-set (dibagi antar worker), selain itu local memory per proses
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -340,6 +367,44 @@ else:
         },
     }
 
+# URL storage (Cloudinary menandatangani URL di Python) di-memo per proses - core.storage_urls.
+# Bump versi jika domain/cloud storage berubah; timeout < masa berlaku URL bertanda tangan
+STORAGE_URL_CACHE_TIMEOUT = int(os.getenv('STORAGE_URL_CACHE_TIMEOUT', '3600'))
+STORAGE_URL_CACHE_SIZE = int(os.getenv('STORAGE_URL_CACHE_SIZE', '10000'))
+STORAGE_URL_CACHE_VERSION = os.getenv('STORAGE_URL_CACHE_VERSION', '1')
+
+# Upload dokumen booking & lampiran chat: body di-stream ke file sementara (bukan memori),
+# lalu upload ke storage (Cloudinary) diselesaikan thread pool di luar request - core.uploads.
+# Default aktif hanya dengan Cloudinary; storage lokal cukup cepat untuk disimpan langsung
+FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
+DEFERRED_UPLOADS = os.getenv(
+    'DEFERRED_UPLOADS', 'True' if os.getenv('CLOUDINARY_CLOUD_NAME') else 'False'
+).lower() in ('true', '1', 'yes')
+UPLOAD_STAGING_DIR = os.getenv('UPLOAD_STAGING_DIR', str(BASE_DIR / 'upload_staging'))
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '2'))  # 0 = upload di dalam request (test/dev)
+UPLOAD_MAX_ATTEMPTS = int(os.getenv('UPLOAD_MAX_ATTEMPTS', '5'))
+# Upload pending yang lebih tua dari ini diulang oleh job scheduler
+UPLOAD_RETRY_MINUTES = int(os.getenv('UPLOAD_RETRY_MINUTES', '5'))
+# Poll chat menahan pesan yang lampirannya masih di-upload (maks sekian detik, lalu dikirim tanpa lampiran)
+CHAT_ATTACHMENT_HOLD_SECONDS = int(os.getenv('CHAT_ATTACHMENT_HOLD_SECONDS', '120'))
+# Lebar preview dokumen/gambar untuk admin (core.documents; preview PDF butuh pypdfium2)
+DOCUMENT_PREVIEW_WIDTH = int(os.getenv('DOCUMENT_PREVIEW_WIDTH', '240'))
+
+# Peminjaman berulang (BookingSeries): batas kejadian per pengajuan (~1 semester mingguan)
+BOOKING_SERIES_MAX_OCCURRENCES = int(os.getenv('BOOKING_SERIES_MAX_OCCURRENCES', '26'))
+
+# Saran slot kosong saat booking bentrok (core.suggestions): jam operasional ruangan
+# (sama dengan batas time picker), jumlah saran, dan rentang hari sebelum/sesudah
+BOOKING_OPEN_TIME = os.getenv('BOOKING_OPEN_TIME', '08:00')
+BOOKING_CLOSE_TIME = os.getenv('BOOKING_CLOSE_TIME', '21:00')
+BOOKING_SUGGESTION_COUNT = int(os.getenv('BOOKING_SUGGESTION_COUNT', '3'))
+BOOKING_SUGGESTION_DAYS = int(os.getenv('BOOKING_SUGGESTION_DAYS', '1'))
+
+# Import jadwal CSV/XLSX (core.schedule_import): ukuran batch lookup user & bulk_create;
+# laporan error untuk halaman admin disimpan di cache selama SCHEDULE_IMPORT_REPORT_TIMEOUT detik
+SCHEDULE_IMPORT_BATCH_SIZE = int(os.getenv('SCHEDULE_IMPORT_BATCH_SIZE', '500'))
+SCHEDULE_IMPORT_REPORT_TIMEOUT = int(os.getenv('SCHEDULE_IMPORT_REPORT_TIMEOUT', '3600'))
+
 # Custom User Model
 AUTH_USER_MODEL = 'core.User'
 
@@ -357,7 +422,13 @@ EMAIL_FROM_NAME = 'SmartSpace UPY'
 # Session Configuration - Expire on browser close
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True  # Session berakhir saat browser ditutup
 SESSION_COOKIE_AGE = 86400  # 24 jam (fallback jika browser tidak ditutup)
-SESSION_SAVE_EVERY_REQUEST = True  # Refresh session setiap request
+# Session dibaca dari cache (DB sebagai sumber utama) hanya jika cache-nya bersama (Redis):
+# dengan LocMemCache per proses, logout/flush di satu worker tidak terlihat worker lain.
+# Expiry diperpanjang oleh core.middleware.ThrottledSessionMiddleware paling sering sekali
+# per interval, bukan setiap request (polling chat tidak lagi menulis django_session tiap 3 detik)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db' if REDIS_URL else 'django.contrib.sessions.backends.db'
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_INTERVAL = int(os.getenv('SESSION_REFRESH_INTERVAL', '300'))  # detik
 
 # Authentication Backends (required for django-axes)
 AUTHENTICATION_BACKENDS = [
@@ -373,3 +444,61 @@ AXES_LOCKOUT_PARAMETERS = ['ip_address']  # Lock by IP only
 
 # Custom Admin URL (used by middleware)
 ADMIN_URL = 'smartspace-panel-upy/'
+
+# Request Profiling (opt-in) - structured timing logs + cProfile dumps for slow requests
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() in ('true', '1', 'yes')
+PROFILING_SLOW_MS = int(os.getenv('PROFILING_SLOW_MS', '500'))  # Threshold request lambat (ms)
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0.1'))  # Porsi request yang di-cProfile
+PROFILING_DUMP_DIR = os.getenv('PROFILING_DUMP_DIR', str(BASE_DIR / 'profiles'))
+
+# Prometheus Metrics - /metrics accessible to staff or with this bearer token
+# Set PROMETHEUS_MULTIPROC_DIR (lihat gunicorn.conf.py) agar metrik digabung antar worker
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Admin - changelist di atas threshold memakai estimasi planner PostgreSQL, bukan COUNT(*)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.getenv('ADMIN_ESTIMATED_COUNT_THRESHOLD', '10000'))
+# Badge sidebar di-invalidate oleh signals; timeout membatasi data basi antar worker tanpa Redis
+ADMIN_BADGE_CACHE_TIMEOUT = int(os.getenv('ADMIN_BADGE_CACHE_TIMEOUT', '300'))
+# /api/rooms/ payload cache; key memuat versi data (MAX updated_at) sehingga timeout hanya membatasi memori
+ROOMS_API_CACHE_TIMEOUT = int(os.getenv('ROOMS_API_CACHE_TIMEOUT', '600'))
+# Beranda: fragment ruangan/testimoni + halaman penuh untuk pengunjung anonim.
+# Key memuat versi yang di-bump oleh signals Room/Testimonial (core.caching)
+HOME_CACHE_TIMEOUT = int(os.getenv('HOME_CACHE_TIMEOUT', '3600'))
+
+# Room photo thumbnails (core.images) - WebP + JPEG per lebar, dibuat dengan Pillow
+ROOM_THUMBNAIL_WIDTHS = tuple(
+    int(w) for w in os.getenv('ROOM_THUMBNAIL_WIDTHS', '320,640,1280').split(',') if w.strip()
+)
+# Foto dari URL eksternal / Google Drive diunduh oleh job scheduler setiap N menit
+ROOM_THUMBNAIL_SYNC_MINUTES = int(os.getenv('ROOM_THUMBNAIL_SYNC_MINUTES', '10'))
+# Foto yang gagal diunduh dicoba ulang dengan backoff, berhenti setelah N percobaan
+ROOM_THUMBNAIL_MAX_ATTEMPTS = int(os.getenv('ROOM_THUMBNAIL_MAX_ATTEMPTS', '5'))
+ROOM_PHOTO_DOWNLOAD_TIMEOUT = int(os.getenv('ROOM_PHOTO_DOWNLOAD_TIMEOUT', '15'))
+ROOM_PHOTO_MAX_DOWNLOAD_BYTES = int(os.getenv('ROOM_PHOTO_MAX_DOWNLOAD_BYTES', str(10 * 1024 * 1024)))
+
+# Counter badge per user (pesan belum dibaca, wishlist, booking Pending) - core.counters.
+# Diperbarui incremental oleh signals; timeout membatasi selisih dari update di luar signals.
+# Tanpa Redis cache-nya per proses dan increment hanya terjadi di worker yang menulis,
+# jadi timeout dibuat beberapa detik saja agar badge di worker lain tidak basi lama
+USER_COUNTERS_TIMEOUT = int(os.getenv('USER_COUNTERS_TIMEOUT', '3600' if REDIS_URL else '5'))
+
+# Activity Log - entries are buffered per request and bulk-written at the end.
+# Background flush moves the INSERT off the response path (entries kept in memory up to the interval)
+ACTIVITY_LOG_BACKGROUND_FLUSH = os.getenv('ACTIVITY_LOG_BACKGROUND_FLUSH', 'False').lower() in ('true', '1', 'yes')
+ACTIVITY_LOG_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_LOG_FLUSH_INTERVAL', '2'))  # detik
+# Retention (opt-in) - rows older than this are archived to NDJSON.gz and deleted daily (0 = keep forever).
+# ARCHIVE_DIR wajib diisi dengan volume persisten: disk container Railway hilang setiap redeploy.
+# Job harian hanya aktif jika keduanya diisi; bisa juga via cron: python manage.py archive_activity_logs
+ACTIVITY_LOG_RETENTION_DAYS = int(os.getenv('ACTIVITY_LOG_RETENTION_DAYS', '0'))
+ACTIVITY_LOG_ARCHIVE_DIR = os.getenv('ACTIVITY_LOG_ARCHIVE_DIR', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
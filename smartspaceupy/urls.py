@@ -20,11 +20,12 @@ from django.conf import settings
 from django.conf.urls.static import static
 from core.admin_views import (
     chat_list_view, chat_detail_view, chat_send_view, chat_delete_view, 
-    chat_delete_conversation_view, chat_poll_view, chat_pin_view, 
+    chat_delete_conversation_view, chat_poll_view, chat_history_view, chat_pin_view, 
     chat_conversations_poll_view, admin_shortcuts_view, admin_dashboard_stats,
     export_users_excel, export_bookings_excel, export_bookings_pdf,
-    export_dashboard_excel, export_dashboard_pdf
+    export_dashboard_excel, export_dashboard_pdf, schedule_import_view, schedule_import_report_view
 )
+from core.metrics import metrics_view
 
 # Add custom admin URLs to admin.site
 admin.site.get_urls_original = admin.site.get_urls
@@ -37,6 +38,7 @@ def custom_admin_urls():
         path('chat/poll/', chat_conversations_poll_view, name='chat_conversations_poll'),
         path('chat/<int:user_id>/', chat_detail_view, name='chat_detail'),
         path('chat/<int:user_id>/poll/', chat_poll_view, name='chat_poll'),
+        path('chat/<int:user_id>/history/', chat_history_view, name='chat_history'),
         path('chat/send/', chat_send_view, name='chat_send'),
         path('chat/delete/', chat_delete_view, name='chat_delete'),
         path('chat/delete-conversation/', chat_delete_conversation_view, name='chat_delete_conversation'),
@@ -47,6 +49,9 @@ def custom_admin_urls():
         path('export/bookings/pdf/', export_bookings_pdf, name='export_bookings_pdf'),
         path('export/dashboard/excel/', export_dashboard_excel, name='export_dashboard_excel'),
         path('export/dashboard/pdf/', export_dashboard_pdf, name='export_dashboard_pdf'),
+        # Import jadwal (CSV/XLSX)
+        path('import/schedule/', schedule_import_view, name='schedule_import'),
+        path('import/schedule/report/<str:token>/', schedule_import_report_view, name='schedule_import_report'),
     ]
     return custom_urls + admin.site.get_urls_original()
 
@@ -55,6 +60,7 @@ admin.site.get_urls = custom_admin_urls
 
 urlpatterns = [
     path('smartspace-panel-upy/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('', include('core.urls')),
 ]
 